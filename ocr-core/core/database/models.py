@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, Integer, String, ForeignKey, TIMESTAMP, Text, func, UniqueConstraint, Date, Numeric
+from sqlalchemy import JSON, Column, Integer, String, ForeignKey, TIMESTAMP, Text, func, UniqueConstraint, Date, Numeric, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
@@ -127,3 +127,67 @@ class AppSetting(Base):
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String, unique=True, index=True, nullable=False)
     value = Column(JSON, nullable=False)
+
+# --- INGEST RED (trajni red obrade uploada, vidi core/ingest.py i core/worker.py) ---
+class IngestQueueJob(Base):
+    __tablename__ = "ingest_jobs"
+    job_id = Column(String(32), primary_key=True)
+    skipped = Column(JSON, nullable=False, default=list)  # fileovi preskočeni pri uploadu (duplikati, greške)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+class IngestQueueItem(Base):
+    __tablename__ = "ingest_queue"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(32), nullable=False, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="SET NULL"), nullable=True)
+    filename = Column(String(255), nullable=False)  # originalno ime filea
+    file_path = Column(String(500), nullable=False)
+    file_hash = Column(String(64), nullable=False)
+    document_type = Column(String(50), nullable=False)  # tip odabran pri uploadu
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued | running | done | failed | dead
+    stage = Column(String(20), nullable=False, default="stored")  # zadnji checkpoint: stored | ocr | saved | done
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(TIMESTAMP, server_default=func.now(), nullable=False, index=True)
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(TIMESTAMP, nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    checkpoint = Column(JSON, nullable=True)  # OCR + klasifikacija zadnjeg pokušaja – nastavak na bilo kojem workeru
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+# --- CACHE AI KLASIFIKACIJE (vidi core/ml/classification_cache.py) ---
+class ClassificationCacheEntry(Base):
+    __tablename__ = "classification_cache"
+    __table_args__ = (UniqueConstraint("text_hash", "model_version", name="uq_classification_text_model"),)
+    id = Column(Integer, primary_key=True, index=True)
+    text_hash = Column(String(64), nullable=False)  # sha256 normaliziranog OCR teksta
+    model_version = Column(String(100), nullable=False, index=True)
+    best_label = Column(String(50), nullable=True)
+    best_score = Column(Float, nullable=True)
+    parsed_fields = Column(JSON, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+# --- CACHE ODGOVORA REGISTARA: Sudreg po OIB-u, VIES po VAT-u (vidi core/registry_cache.py) ---
+class RegistryLookup(Base):
+    __tablename__ = "registry_lookups"
+    __table_args__ = (UniqueConstraint("source", "lookup_key", name="uq_registry_source_key"),)
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(20), nullable=False)  # sudreg | vies
+    lookup_key = Column(String(30), nullable=False)  # OIB ili VAT (s prefiksom države)
+    found = Column(Boolean, nullable=False)  # False = negativan odgovor (nije pronađen / nevažeći VAT)
+    payload = Column(JSON, nullable=True)
+    fetched_at = Column(TIMESTAMP, nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+
+# --- LOKALNI SNAPSHOT SUDREGA: OIB -> naziv/adresa (vidi modules/sudreg_api/snapshot.py) ---
+class RegistrySnapshotEntry(Base):
+    __tablename__ = "registry_snapshot"
+    oib = Column(String(11), primary_key=True)
+    naziv = Column(String(500), nullable=True)
+    skraceni_naziv = Column(String(255), nullable=True)
+    ulica_i_broj = Column(String(255), nullable=True)
+    mjesto = Column(String(100), nullable=True)
+    postanski_broj = Column(String(10), nullable=True)
+    imported_at = Column(TIMESTAMP, nullable=False, index=True)
@@ -0,0 +1,243 @@
+"""
+Pozadinsko obogaćivanje partnera: adresa/naziv iz Sudrega (snapshot -> registry cache -> API) i VIES odgovor.
+
+Partneri iz MDB uvoza (map_row_to_partner) i iz dokumenata (sync_partner_from_document) često nemaju adresu
+ni vies_response, pa ih upload obogaćuje usput, s vanjskim pozivima unutar requesta. Ovaj job ih prolazi
+unaprijed:
+
+    python -m core.enrichment --workers 4 --batch 100     # ili POST /api/system/enrichment/run
+
+Partneri se čitaju po id-u u batchevima, razrješavaju paralelno (kvote drže token bucketi Sudreg i VIES
+klijenta), a rezultati batcha i checkpoint (AppSetting "partner_enrichment") commitaju se zajedno.
+Prekinut job nastavlja od zadnjeg batcha; završen prolaz vraća checkpoint na početak, pa sljedeći prolaz
+ponovno pokušava partnere kod kojih vanjski servis nije odgovorio.
+"""
+import os
+import re
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import String, cast, or_
+
+from core.database.connection import SessionMain, engine_main
+from core.database.models import AppSetting, Base, Partner
+from core.utils.address import format_address
+from core.vies_api.client import vies_client
+from modules.sudreg_api.client import sudreg_client
+
+logger = logging.getLogger(__name__)
+
+ENRICH_WORKERS = int(os.environ.get("ENRICH_WORKERS", "4"))
+ENRICH_BATCH = int(os.environ.get("ENRICH_BATCH", "100"))
+CHECKPOINT_KEY = "partner_enrichment"
+
+OIB_RE = re.compile(r"^\d{11}$")
+VAT_RE = re.compile(r"^[A-Z]{2}[0-9A-Z+*.]{2,12}$")
+
+_run_lock = threading.Lock()
+
+# ---------- CHECKPOINT ----------
+def load_checkpoint(db):
+    setting = db.query(AppSetting).filter(AppSetting.key == CHECKPOINT_KEY).first()
+    return dict(setting.value) if setting and isinstance(setting.value, dict) else {}
+
+def _save_checkpoint(db, value):
+    # Bez commita: checkpoint ide u istu transakciju kao i rezultati batcha
+    setting = db.query(AppSetting).filter(AppSetting.key == CHECKPOINT_KEY).first()
+    if setting:
+        setting.value = value
+    else:
+        db.add(AppSetting(key=CHECKPOINT_KEY, value=value))
+
+# ---------- ODABIR PARTNERA ----------
+def _missing_data_filter():
+    # vies_response može biti SQL NULL ili JSON null (upload sprema vies_response=None)
+    return or_(
+        Partner.adresa.is_(None),
+        Partner.adresa == "",
+        Partner.vies_response.is_(None),
+        cast(Partner.vies_response, String) == "null",
+    )
+
+def stream_partner_batches(db, after_id=0, batch_size=ENRICH_BATCH):
+    # Keyset paginacija po id-u: svaki partner najviše jednom po prolazu, bez OFFSET-a
+    while True:
+        batch = (
+            db.query(Partner)
+            .filter(Partner.id > after_id, _missing_data_filter())
+            .order_by(Partner.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return
+        # id se čita prije yielda: pozivatelj commita i odbacuje partnere iz sesije
+        after_id = batch[-1].id
+        yield batch
+
+# ---------- RAZRJEŠAVANJE (u threadovima, bez sesije) ----------
+def resolve_partner(partner):
+    """
+    partner: dict (id, naziv, oib, vat_id, adresa, vies_response).
+    -> {"id", "values": {stupac: nova vrijednost}, "error": poruka ili None}
+    """
+    key = (partner["oib"] or partner["vat_id"] or "").strip().upper().replace(" ", "")
+    values = {}
+    errors = []
+    needs_address = not (partner["adresa"] or "").strip()
+    needs_vies = not partner["vies_response"]
+
+    if OIB_RE.match(key):
+        country_code, vat = "HR", key
+        if needs_address:
+            try:
+                company, _ = sudreg_client.get_company_by_oib(key)
+                if company is not None:
+                    values["adresa"] = format_address(company.adresa) or None
+                    if not (partner["naziv"] or "").strip() and company.naziv:
+                        values["naziv"] = company.naziv[:255]
+            except Exception as e:
+                errors.append(f"Sudreg: {e}")
+    elif VAT_RE.match(key):
+        country_code, vat = key[:2], key[2:]
+    else:
+        return {"id": partner["id"], "values": {}, "error": f"Nepoznat format OIB-a/VAT-a: {key!r}"}
+
+    if needs_vies or (needs_address and "adresa" not in values):
+        vies_data = vies_client.call_vies_soap_api(country_code, vat)
+        if vies_data.get("error"):
+            # Greška (timeout, circuit open) se ne sprema – partner ostaje za sljedeći prolaz
+            errors.append(f"VIES: {vies_data['error']}")
+        else:
+            if needs_vies:
+                values["vies_response"] = vies_data
+            address = " ".join((vies_data.get("address") or "").split()).strip(" -")
+            if needs_address and "adresa" not in values and vies_data.get("valid") and address:
+                values["adresa"] = address[:255]
+            if not (partner["naziv"] or "").strip() and "naziv" not in values and vies_data.get("name"):
+                values["naziv"] = vies_data["name"][:255]
+
+    values = {k: v for k, v in values.items() if v}
+    return {"id": partner["id"], "values": values, "error": "; ".join(errors) or None}
+
+def _partner_snapshot(partner):
+    return {
+        "id": partner.id,
+        "naziv": partner.naziv,
+        "oib": partner.oib,
+        "vat_id": partner.vat_id,
+        "adresa": partner.adresa,
+        "vies_response": partner.vies_response,
+    }
+
+# ---------- JOB ----------
+def run_enrichment(db, workers=ENRICH_WORKERS, batch_size=ENRICH_BATCH, restart=False, stop=None, resolver=resolve_partner):
+    """
+    Jedan prolaz (ili nastavak prekinutog) kroz partnere kojima nedostaju podaci. Vraća statistiku prolaza.
+    stop: threading.Event – job staje nakon tekućeg batcha (checkpoint ostaje za nastavak).
+    """
+    checkpoint = {} if restart else load_checkpoint(db)
+    after_id = checkpoint.get("last_id", 0) if not checkpoint.get("completed_at") else 0
+    if after_id:
+        logger.info(f"Obogaćivanje partnera: nastavak nakon partnera {after_id}")
+    else:
+        checkpoint = {}
+    stats = {
+        "processed": checkpoint.get("processed", 0),
+        "enriched": checkpoint.get("enriched", 0),
+        "failed": checkpoint.get("failed", 0),
+    }
+    started = time.monotonic()
+    processed_now = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="enrich") as executor:
+        for batch in stream_partner_batches(db, after_id, batch_size):
+            results = list(executor.map(resolver, [_partner_snapshot(p) for p in batch]))
+            by_id = {p.id: p for p in batch}
+            last_id = batch[-1].id
+            for result in results:
+                partner = by_id[result["id"]]
+                for column, new_value in result["values"].items():
+                    setattr(partner, column, new_value)
+                stats["enriched"] += bool(result["values"])
+                if result["error"]:
+                    stats["failed"] += 1
+                    logger.info(f"Partner {partner.id} ({partner.oib}): {result['error']}")
+            stats["processed"] += len(batch)
+            processed_now += len(batch)
+            elapsed = time.monotonic() - started
+            value = {
+                **stats,
+                "last_id": last_id,
+                "updated_at": datetime.utcnow().isoformat(),
+                "partners_per_second": round(processed_now / elapsed, 2) if elapsed else None,
+                "completed_at": None,
+            }
+            _save_checkpoint(db, value)
+            db.commit()
+            # Partneri ovog batcha više ne trebaju biti u sesiji (prolaz može biti dug)
+            db.expunge_all()
+            logger.info(
+                f"Obogaćivanje partnera: {stats['processed']} obrađeno, {stats['enriched']} obogaćeno, "
+                f"{stats['failed']} s greškom ({value['partners_per_second']} partnera/s)"
+            )
+            if stop is not None and stop.is_set():
+                return {**value, "stopped": True}
+
+    elapsed = time.monotonic() - started
+    value = {
+        **stats,
+        "last_id": 0,
+        "updated_at": datetime.utcnow().isoformat(),
+        "partners_per_second": round(processed_now / elapsed, 2) if elapsed and processed_now else None,
+        "completed_at": datetime.utcnow().isoformat(),
+    }
+    _save_checkpoint(db, value)
+    db.commit()
+    return {**value, "stopped": False}
+
+def start_enrichment_thread(workers=ENRICH_WORKERS, batch_size=ENRICH_BATCH, restart=False):
+    """
+    Pokreće job u pozadinskoj niti API procesa. False ako job već radi u ovom procesu.
+    """
+    if not _run_lock.acquire(blocking=False):
+        return False
+
+    def target():
+        db = SessionMain()
+        try:
+            run_enrichment(db, workers=workers, batch_size=batch_size, restart=restart)
+        except Exception as e:
+            logger.error(f"Obogaćivanje partnera nije uspjelo: {e}", exc_info=True)
+        finally:
+            db.close()
+            _run_lock.release()
+
+    threading.Thread(target=target, name="partner-enrichment", daemon=True).start()
+    return True
+
+def is_running():
+    return _run_lock.locked()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Obogaćivanje partnera podacima iz Sudrega i VIES-a")
+    parser.add_argument("--workers", type=int, default=ENRICH_WORKERS, help="paralelnih razrješavanja")
+    parser.add_argument("--batch", type=int, default=ENRICH_BATCH, help="partnera po batchu (commit + checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="zanemari checkpoint i kreni od početka")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    Base.metadata.create_all(bind=engine_main)
+    db = SessionMain()
+    try:
+        stats = run_enrichment(db, workers=args.workers, batch_size=max(1, args.batch), restart=args.restart)
+    finally:
+        db.close()
+    logger.info(f"Obogaćivanje partnera završeno: {stats}")
+
+if __name__ == "__main__":
+    main()
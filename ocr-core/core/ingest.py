@@ -0,0 +1,402 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Broj fileova koji se obrađuju istovremeno (OCR stranica ionako ide u OCR pool)
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+# Koliko dugo (s) se završeni jobovi drže u memoriji za status/rezultat
+INGEST_JOB_TTL = int(os.environ.get("INGEST_JOB_TTL", "3600"))
+# document_type placeholder dokumenta dok ingest job još radi
+PROCESSING_DOCUMENT_TYPE = "U OBRADI"
+
+# ---------- INGEST JOB (batch uploadanih fileova) ----------
+class IngestJob:
+    """
+    Stanje jednog uploada u job modu. Stavke se obrađuju neovisno (paralelno u ingest poolu);
+    svaka promjena povećava version i budi čekače (SSE).
+    """
+
+    def __init__(self, items, skipped=None):
+        self.id = uuid.uuid4().hex
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.items = [
+            {"document_id": item["document_id"], "filename": item["filename"], "status": "queued", "result": None}
+            for item in items
+        ]
+        self.skipped = list(skipped or [])
+        self.version = 0
+        self._cond = threading.Condition()
+        if not self.items:
+            self.finished_at = self.created_at
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    @property
+    def status(self):
+        if self.finished:
+            failed = any(item["status"] == "failed" for item in self.items)
+            return "done_with_errors" if failed else "done"
+        if any(item["status"] != "queued" for item in self.items):
+            return "running"
+        return "queued"
+
+    def _update(self, index, status, result=None):
+        with self._cond:
+            self.items[index]["status"] = status
+            self.items[index]["result"] = result
+            if all(item["status"] in ("done", "failed") for item in self.items):
+                self.finished_at = datetime.utcnow()
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        # Blokira dok se job ne promijeni u odnosu na version (ili timeout); vraća trenutni version
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version or self.finished, timeout)
+            return self.version
+
+    def results(self):
+        return self.skipped + [item["result"] for item in self.items if item["result"] is not None]
+
+    def to_dict(self):
+        with self._cond:
+            done = sum(item["status"] in ("done", "failed") for item in self.items)
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "created_at": self.created_at.isoformat(),
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+                "total": len(self.items),
+                "completed": done,
+                "documents": [
+                    {"id": item["document_id"], "filename": item["filename"], "status": item["status"]}
+                    for item in self.items
+                ],
+                "skipped": self.skipped,
+            }
+
+# ---------- REGISTAR JOBOVA + POZADINSKI POOL ----------
+class IngestJobRegistry:
+    """
+    Jobovi u memoriji procesa (po uvicorn workeru) i ThreadPoolExecutor koji ih obrađuje.
+    process(item) je sinkrona obrada jedne stavke i vraća stavku rezultata ({"status": "OK" | "FAILED", ...}).
+    """
+
+    def __init__(self, workers=INGEST_WORKERS, ttl=INGEST_JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, items, process, skipped=None):
+        job = IngestJob(items, skipped)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        for index, item in enumerate(items):
+            self._executor.submit(self._run_item, job, index, item, process)
+        logger.info(f"Ingest job {job.id}: {len(items)} fileova u redu")
+        return job
+
+    def _run_item(self, job, index, item, process):
+        job._update(index, "running")
+        try:
+            result = process(item)
+        except Exception as e:
+            logger.error(f"Ingest job {job.id}, file {item.get('filename')}: {e}")
+            result = {"filename": item.get("filename"), "status": "FAILED", "error": str(e)}
+        job._update(index, "done" if result.get("status") == "OK" else "failed", result)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        now = datetime.utcnow()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and (now - job.finished_at).total_seconds() > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# ---------- TRAJNI RED U POSTGRESU (INGEST_BACKEND=queue) ----------
+# Upload samo upisuje stavke u ingest_queue; obradu rade zasebni procesi (python -m core.worker),
+# koji stavke preuzimaju sa SELECT ... FOR UPDATE SKIP LOCKED i drže ih pod "leaseom" (visibility timeout).
+INGEST_BACKEND = os.environ.get("INGEST_BACKEND", "thread")  # "thread" (u API procesu) | "queue"
+INGEST_VISIBILITY_TIMEOUT = int(os.environ.get("INGEST_VISIBILITY_TIMEOUT", "300"))
+INGEST_MAX_ATTEMPTS = int(os.environ.get("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_DELAY = int(os.environ.get("INGEST_RETRY_DELAY", "30"))
+
+def _queue_item_to_dict(row):
+    return {
+        "queue_id": row.id,
+        "job_id": row.job_id,
+        "document_id": row.document_id,
+        "filename": row.filename,
+        "file_path": row.file_path,
+        "file_hash": row.file_hash,
+        "document_type": row.document_type,
+        "attempts": row.attempts,
+        "checkpoint": row.checkpoint,
+    }
+
+def claimable_query(db, now):
+    # Stavke koje se mogu preuzeti; zaključane (drugi worker ih upravo preuzima) se preskaču
+    from sqlalchemy import or_, and_
+    from core.database.models import IngestQueueItem
+    return (
+        db.query(IngestQueueItem)
+        .filter(or_(
+            and_(IngestQueueItem.status == "queued", IngestQueueItem.available_at <= now),
+            and_(IngestQueueItem.status == "running", IngestQueueItem.locked_until < now),
+        ))
+        .order_by(IngestQueueItem.available_at, IngestQueueItem.id)
+        .with_for_update(skip_locked=True)
+    )
+
+def claim_next(db, worker_id, visibility_timeout=INGEST_VISIBILITY_TIMEOUT, on_dead=None):
+    """
+    Preuzima sljedeću stavku: queued kojoj je došao red, ili running kojoj je istekao lease (srušen worker).
+    Stavka kojoj su potrošeni pokušaji ide u "dead" (on_dead(stavka) za čišćenje). Vraća dict stavke ili None.
+    """
+    while True:
+        now = datetime.utcnow()
+        row = claimable_query(db, now).first()
+        if row is None:
+            db.commit()
+            return None
+        if row.attempts >= row.max_attempts:
+            row.status = "dead"
+            row.last_error = row.last_error or "Lease istekao nakon zadnjeg pokušaja"
+            row.locked_by = None
+            row.checkpoint = None
+            db.commit()
+            logger.error(f"Ingest red: stavka {row.id} ({row.filename}) je dead nakon {row.attempts} pokušaja")
+            if on_dead is not None:
+                on_dead(_queue_item_to_dict(row))
+            continue
+        row.status = "running"
+        row.attempts += 1
+        row.locked_by = worker_id
+        row.locked_until = now + timedelta(seconds=visibility_timeout)
+        db.commit()
+        return _queue_item_to_dict(row)
+
+def extend_lease(db, queue_id, worker_id, visibility_timeout=INGEST_VISIBILITY_TIMEOUT):
+    # Heartbeat dugog OCR-a; False ako je stavku u međuvremenu preuzeo netko drugi
+    from core.database.models import IngestQueueItem
+    updated = (
+        db.query(IngestQueueItem)
+        .filter(IngestQueueItem.id == queue_id, IngestQueueItem.locked_by == worker_id,
+                IngestQueueItem.status == "running")
+        .update({"locked_until": datetime.utcnow() + timedelta(seconds=visibility_timeout)})
+    )
+    db.commit()
+    return bool(updated)
+
+def set_stage(db, queue_id, stage, checkpoint=None):
+    # Checkpoint (OCR + klasifikacija) je u retku stavke, u istoj transakciji kao i stage –
+    # ponovni pokušaj ga nalazi i kad stavku preuzme worker na drugom stroju
+    from core.database.models import IngestQueueItem
+    values = {"stage": stage}
+    if checkpoint is not None:
+        values["checkpoint"] = checkpoint
+    db.query(IngestQueueItem).filter(IngestQueueItem.id == queue_id).update(values)
+    db.commit()
+
+def complete_item(db, queue_id, result):
+    from core.database.models import IngestQueueItem
+    db.query(IngestQueueItem).filter(IngestQueueItem.id == queue_id).update({
+        "status": "done", "stage": "done", "result": result, "locked_by": None, "locked_until": None,
+        "checkpoint": None,
+    })
+    db.commit()
+
+def fail_item(db, queue_id, error, result=None, retry_delay=INGEST_RETRY_DELAY):
+    """
+    Neuspjeli pokušaj: ponovno u red s eksponencijalnim odmakom, ili "dead" kad su pokušaji potrošeni.
+    Vraća novi status.
+    """
+    from core.database.models import IngestQueueItem
+    row = db.query(IngestQueueItem).filter(IngestQueueItem.id == queue_id).with_for_update().first()
+    if row is None:
+        return None
+    row.last_error = str(error)
+    row.result = result
+    row.locked_by = None
+    row.locked_until = None
+    if row.attempts >= row.max_attempts:
+        row.status = "dead"
+        row.checkpoint = None
+    else:
+        row.status = "queued"
+        row.available_at = datetime.utcnow() + timedelta(seconds=retry_delay * 2 ** (row.attempts - 1))
+    db.commit()
+    return row.status
+
+def job_rows(db, job_id):
+    from core.database.models import IngestQueueItem
+    return db.query(IngestQueueItem).filter(IngestQueueItem.job_id == job_id).order_by(IngestQueueItem.id).all()
+
+class QueueIngestJob:
+    """
+    Pogled na job iz ingest_queue tablice – isto sučelje kao IngestJob (status, to_dict, SSE čekanje).
+    """
+
+    STATUS_MAP = {"queued": "queued", "running": "running", "done": "done", "failed": "failed", "dead": "failed"}
+
+    def __init__(self, job_id, rows, skipped=None, created_at=None):
+        self.id = job_id
+        self.skipped = list(skipped or [])
+        self.created_at = created_at
+        self._load(rows)
+
+    def _load(self, rows):
+        self.rows = [
+            {
+                "queue_id": row.id,
+                "document_id": row.document_id,
+                "filename": row.filename,
+                "status": self.STATUS_MAP.get(row.status, row.status),
+                "queue_status": row.status,
+                "stage": row.stage,
+                "attempts": row.attempts,
+                "last_error": row.last_error,
+                "result": row.result,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+            }
+            for row in rows
+        ]
+        self.version = hash(tuple((r["queue_id"], r["queue_status"], r["stage"], r["attempts"]) for r in self.rows))
+
+    @property
+    def finished(self):
+        return all(r["status"] in ("done", "failed") for r in self.rows)
+
+    @property
+    def status(self):
+        if self.finished:
+            return "done_with_errors" if any(r["status"] == "failed" for r in self.rows) else "done"
+        if any(r["status"] != "queued" or r["attempts"] for r in self.rows):
+            return "running"
+        return "queued"
+
+    def refresh(self):
+        from core.database.connection import SessionMain
+        db = SessionMain()
+        try:
+            self._load(job_rows(db, self.id))
+        finally:
+            db.close()
+
+    def wait_for_change(self, version, timeout, poll=1.0):
+        # Red je u bazi (drugi procesi) – nema notifikacije, pa se stanje provjerava svake sekunde
+        deadline = time.monotonic() + timeout
+        while self.version == version and not self.finished and time.monotonic() < deadline:
+            time.sleep(poll)
+            self.refresh()
+        return self.version
+
+    def results(self):
+        return self.skipped + [
+            r["result"] or {"filename": r["filename"], "status": "FAILED", "error": r["last_error"]}
+            for r in self.rows if r["status"] in ("done", "failed")
+        ]
+
+    def to_dict(self):
+        created = [r["created_at"] for r in self.rows if r["created_at"]]
+        updated = [r["updated_at"] for r in self.rows if r["updated_at"]]
+        created_at = self.created_at or (min(created) if created else None)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": created_at.isoformat() if created_at else None,
+            "finished_at": max(updated).isoformat() if self.finished and updated else None,
+            "total": len(self.rows),
+            "completed": sum(r["status"] in ("done", "failed") for r in self.rows),
+            "documents": [
+                {
+                    "id": r["document_id"], "filename": r["filename"], "status": r["status"],
+                    "stage": r["stage"], "attempts": r["attempts"], "error": r["last_error"],
+                }
+                for r in self.rows
+            ],
+            "skipped": self.skipped,
+        }
+
+class QueueIngestBackend:
+    """
+    Isto sučelje kao IngestJobRegistry, ali submit samo upisuje stavke u ingest_queue;
+    process se ne poziva ovdje nego u workerima (core/worker.py).
+    """
+
+    def __init__(self, max_attempts=INGEST_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+
+    def submit(self, items, process=None, skipped=None):
+        from core.database.connection import SessionMain
+        from core.database.models import IngestQueueItem, IngestQueueJob
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        db = SessionMain()
+        try:
+            # Job se upisuje i kad nema stavki (npr. svi fileovi su duplikati) – preskočeni su dio rezultata
+            db.add(IngestQueueJob(job_id=job_id, skipped=list(skipped or []), created_at=now))
+            rows = [
+                IngestQueueItem(
+                    job_id=job_id,
+                    document_id=item["document_id"],
+                    filename=item["filename"],
+                    file_path=item["file_path"],
+                    file_hash=item["file_hash"],
+                    document_type=item["document_type"],
+                    status="queued",
+                    stage="stored",
+                    attempts=0,
+                    max_attempts=self.max_attempts,
+                    available_at=now,
+                    created_at=now,
+                    updated_at=now,
+                )
+                for item in items
+            ]
+            db.add_all(rows)
+            db.commit()
+            logger.info(f"Ingest job {job_id}: {len(rows)} fileova upisano u ingest_queue")
+            return QueueIngestJob(job_id, rows, skipped, now)
+        finally:
+            db.close()
+
+    def get(self, job_id):
+        from core.database.connection import SessionMain
+        from core.database.models import IngestQueueJob
+        db = SessionMain()
+        try:
+            record = db.get(IngestQueueJob, job_id)
+            rows = job_rows(db, job_id)
+            if record is None and not rows:
+                return None
+            if record is None:
+                return QueueIngestJob(job_id, rows)
+            return QueueIngestJob(job_id, rows, record.skipped, record.created_at)
+        finally:
+            db.close()
+
+    def shutdown(self):
+        pass
+
+ingest_jobs = QueueIngestBackend() if INGEST_BACKEND == "queue" else IngestJobRegistry()
@@ -5,6 +5,7 @@ import logging
 from logging.handlers import TimedRotatingFileHandler
 import os
 import sys
+from datetime import datetime
 from core.routes import settings
 from core.routes import ml_metrics
 from fastapi import FastAPI, Query, Depends, Request
@@ -21,18 +22,22 @@ from core.init_app import load_module_routers
 from core.database.session import get_db
 from core.routes.admin import router as admin_router
 from core.routes.documents import router as documents_router
-from core.routes.upload import router as upload_router
+from core.routes.upload import router as upload_router, cleanup_stale_placeholders
 from core.routes.clients import router as clients_router
 from core.routes.annotations import router as annotations_router
 from core.routes import logs, client_info, partneri, clients, mail_accounts, mail_processing
 from modules.ocr_processing.routes import upload as upload_module
 from modules.sudreg_manual import router as sudreg_manual_router
+from modules.ocr_processing.workers.pool import shutdown_ocr_pool
+from core.utils.async_loop import shutdown_loop
+from core.ingest import ingest_jobs
 from core.routes.settings import router as settings_router
 from core.billing import api as billing_api
 from core.routes import regex_config
 from core.routes import finances
 from core.routes.uvoz_baza import router as uvoz_baza_router
 from core.routes import import_mapping
+from core.routes.system import router as system_router
 
 
 
@@ -93,6 +98,7 @@ app.include_router(regex_config.router, prefix="/api")
 app.include_router(finances.router, prefix="/api")
 app.include_router(uvoz_baza_router, prefix="/api")
 app.include_router(import_mapping.router)
+app.include_router(system_router)
 
 
 
@@ -103,6 +109,16 @@ load_module_routers(app)
 def on_startup():
     Base.metadata.create_all(bind=engine_main)
     os.makedirs("./backend/data/uploads/batch", exist_ok=True)
+    try:
+        cleanup_stale_placeholders(datetime.utcnow())
+    except Exception as e:
+        logging.warning(f"Čišćenje placeholder dokumenata nije uspjelo: {e}")
+
+@app.on_event("shutdown")
+def on_shutdown():
+    ingest_jobs.shutdown()
+    shutdown_ocr_pool()
+    shutdown_loop()
 
 @app.get("/")
 def root():
@@ -0,0 +1,148 @@
+"""
+Trajni cache AI klasifikacije (tablica classification_cache): ključ je (sha256 normaliziranog OCR teksta,
+verzija modela koju javlja model server), vrijednost best_label, best_score i parsed_fields.
+
+Isti tekst (duplikat skena, ponovni upload, reparse bez promjene OCR-a) ne ide ponovno na model server.
+Nova verzija modela znači novi ključ; retci starih verzija brišu se kad proces prvi put vidi novu verziju.
+Ako server ne javlja verziju, cache se ne koristi (ne bi se mogao invalidirati).
+"""
+import os
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.database.models import ClassificationCacheEntry
+from core.ml.model_client import classify_texts, get_model_version
+
+logger = logging.getLogger(__name__)
+
+CLASSIFY_CACHE_ENABLED = os.environ.get("CLASSIFY_CACHE_ENABLED", "1") == "1"
+QUERY_CHUNK = 500
+
+def normalize_text(text):
+    # Razlike u razmacima/prijelomima redova (različiti OCR prolazi istog skena) ne mijenjaju ključ
+    return unicodedata.normalize("NFC", " ".join((text or "").split()))
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class ClassificationCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pruned_version = None
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "pruned": 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def get_many(self, db, hashes, model_version):
+        found = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), QUERY_CHUNK):
+            rows = (
+                db.query(ClassificationCacheEntry)
+                .filter(
+                    ClassificationCacheEntry.model_version == model_version,
+                    ClassificationCacheEntry.text_hash.in_(hashes[i:i + QUERY_CHUNK]),
+                )
+                .all()
+            )
+            for row in rows:
+                found[row.text_hash] = {
+                    "best_label": row.best_label,
+                    "best_score": row.best_score,
+                    "parsed_fields": row.parsed_fields or {},
+                    "model_version": row.model_version,
+                    "cached": True,
+                }
+        self._count("hits", len(found))
+        self._count("misses", len(hashes) - len(found))
+        return found
+
+    def put_many(self, db, entries):
+        """
+        entries: [(text_hash, model_version, rezultat)]. Piše se u zasebnoj sesiji – commit cachea
+        ne smije commitati (ni rušiti) transakciju dokumenta pozivatelja.
+        """
+        if not entries:
+            return
+        with Session(bind=db.get_bind()) as session:
+            for h, version, result in entries:
+                session.add(ClassificationCacheEntry(
+                    text_hash=h,
+                    model_version=version,
+                    best_label=None if result.get("best_label") is None else str(result["best_label"]),
+                    best_score=result.get("best_score"),
+                    parsed_fields=result.get("parsed_fields") or {},
+                ))
+            try:
+                session.commit()
+                self._count("stores", len(entries))
+            except IntegrityError:
+                # Isti tekst je paralelno spremio drugi worker
+                session.rollback()
+
+    def prune(self, db, model_version):
+        # Jednom po verziji u procesu: retci drugih verzija se više nikad ne čitaju
+        with self._lock:
+            if self._pruned_version == model_version:
+                return
+            self._pruned_version = model_version
+        with Session(bind=db.get_bind()) as session:
+            deleted = (
+                session.query(ClassificationCacheEntry)
+                .filter(ClassificationCacheEntry.model_version != model_version)
+                .delete(synchronize_session=False)
+            )
+            session.commit()
+        if deleted:
+            logger.info(f"Classification cache: obrisano {deleted} rezultata starih verzija modela")
+            self._count("pruned", deleted)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+classification_cache = ClassificationCache() if CLASSIFY_CACHE_ENABLED else None
+
+def classify_cached(db, base_url, texts):
+    """
+    Klasifikacija više tekstova -> lista rezultata istim redom (dict, ili iznimka za neuspjeli tekst).
+    Pogoci iz cachea ne idu na server; isti tekst unutar poziva klasificira se jednom.
+    """
+    if not texts:
+        return []
+    model_version = get_model_version(base_url) if classification_cache is not None else None
+    if model_version is None:
+        return classify_texts(base_url, texts)
+
+    hashes = [text_hash(t) for t in texts]
+    try:
+        classification_cache.prune(db, model_version)
+        results = classification_cache.get_many(db, set(hashes), model_version)
+    except Exception as e:
+        logger.warning(f"Classification cache nedostupan: {e}")
+        return classify_texts(base_url, texts)
+
+    missing = {}
+    for h, text in zip(hashes, texts):
+        if h not in results:
+            missing.setdefault(h, text)
+    if missing:
+        fresh = classify_texts(base_url, list(missing.values()))
+        entries = []
+        for h, result in zip(missing, fresh):
+            results[h] = result
+            if isinstance(result, dict):
+                # Server je mogao promijeniti model između provjere verzije i klasifikacije
+                entries.append((h, str(result.get("model_version") or model_version), result))
+        try:
+            classification_cache.put_many(db, entries)
+        except Exception as e:
+            logger.warning(f"Classification cache: spremanje nije uspjelo: {e}")
+    return [results[h] for h in hashes]
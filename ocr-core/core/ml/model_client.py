@@ -0,0 +1,218 @@
+"""
+Klijent za model server (/classify): jedan pooled httpx klijent (keep-alive) i micro-batching.
+
+Istovremeni classify pozivi (ingest workeri, reparse) skupljaju se najviše MODEL_BATCH_WAIT sekundi
+ili do MODEL_BATCH_SIZE tekstova i šalju kao jedan POST /classify_batch {"texts": [...]} -> {"results": [...]}.
+Ako server nema batch endpoint (404/405/501), tekstovi idu pojedinačno na /classify, a batch se
+ponovno pokušava tek nakon MODEL_BATCH_RETRY sekundi.
+Kad je server nedostupan (connect greške, timeouti, 5xx), circuit breaker "model_server" se otvara i
+classify odmah podiže CircuitOpenError – pozivatelji nastavljaju bez AI rezultata umjesto da čekaju timeout.
+Verzija modela: GET /model_version ({"model_version": ...}) ili polje "model_version" u /classify odgovoru.
+"""
+import os
+import time
+import asyncio
+import logging
+
+import httpx
+
+from core.utils.circuit_breaker import get_breaker, CircuitOpenError
+from core.utils.async_loop import run_sync, on_shutdown
+
+logger = logging.getLogger(__name__)
+
+MODEL_BATCH_SIZE = int(os.environ.get("MODEL_BATCH_SIZE", "16"))
+MODEL_BATCH_WAIT = float(os.environ.get("MODEL_BATCH_WAIT", "0.02"))
+MODEL_MAX_IN_FLIGHT = int(os.environ.get("MODEL_MAX_IN_FLIGHT", "4"))
+MODEL_TIMEOUT = float(os.environ.get("MODEL_TIMEOUT", "15"))
+MODEL_CONNECT_TIMEOUT = float(os.environ.get("MODEL_CONNECT_TIMEOUT", "3"))
+MODEL_BATCH_RETRY = float(os.environ.get("MODEL_BATCH_RETRY", "300"))
+MODEL_VERSION_TTL = float(os.environ.get("MODEL_VERSION_TTL", "60"))
+
+NO_BATCH_STATUS = {404, 405, 501}
+
+def is_outage(error):
+    # Greške koje znače da server nije dostupan (ne npr. 422 za pojedini tekst)
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, OSError))
+
+# ---------- KLIJENT ----------
+class ModelServerClient:
+    """
+    Async klijent; svi pozivi idu kroz zajednički loop (core/utils/async_loop.py) jer su httpx klijent
+    i batchevi vezani uz loop.
+    """
+
+    def __init__(self, batch_size=MODEL_BATCH_SIZE, batch_wait=MODEL_BATCH_WAIT, max_in_flight=MODEL_MAX_IN_FLIGHT,
+                 timeout=MODEL_TIMEOUT, batch_retry=MODEL_BATCH_RETRY, breaker=None):
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.batch_retry = batch_retry
+        self._client = None
+        self._semaphore = None
+        self._pending = {}           # base_url -> [(text, future)]
+        self._flush_handles = {}     # base_url -> TimerHandle
+        self._no_batch_until = {}    # base_url -> monotonic vrijeme do kad se batch ne pokušava
+        self._versions = {}          # base_url -> (monotonic vrijeme provjere, verzija ili None)
+        self._seen_versions = {}     # base_url -> zadnja verzija iz /classify odgovora
+        self.breaker = breaker or get_breaker("model_server")
+        self._stats = {"items": 0, "batches": 0, "batch_requests": 0, "single_requests": 0, "errors": 0}
+
+    def _ensure_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=MODEL_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.max_in_flight * 2, max_keepalive_connections=self.max_in_flight),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def classify(self, base_url, text):
+        """
+        Rezultat /classify za jedan tekst ({"best_label", "best_score", "parsed_fields", ...}).
+        Greška servera se podiže kao iznimka (httpx.HTTPError, CircuitOpenError dok je breaker otvoren).
+        """
+        self._ensure_client()
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(base_url, [])
+        pending.append((text, future))
+        self._stats["items"] += 1
+        if len(pending) >= self.batch_size:
+            self._flush(base_url)
+        elif base_url not in self._flush_handles:
+            self._flush_handles[base_url] = asyncio.get_running_loop().call_later(
+                self.batch_wait, self._flush, base_url
+            )
+        return await future
+
+    async def classify_many(self, base_url, texts, return_exceptions=False):
+        # Redoslijed rezultata = redoslijed tekstova; batchanje radi classify
+        return await asyncio.gather(*(self.classify(base_url, t) for t in texts), return_exceptions=return_exceptions)
+
+    def _flush(self, base_url):
+        handle = self._flush_handles.pop(base_url, None)
+        if handle is not None:
+            handle.cancel()
+        items = self._pending.pop(base_url, [])
+        if items:
+            self._stats["batches"] += 1
+            asyncio.get_running_loop().create_task(self._send(base_url, items))
+
+    async def _send(self, base_url, items):
+        texts = [text for text, _ in items]
+        try:
+            async with self._semaphore:
+                # Provjera tek kad je red na batch: u half_open stanju ide samo jedan probni batch
+                self.breaker.check()
+                if len(items) > 1 and self._no_batch_until.get(base_url, 0) <= time.monotonic():
+                    results = await self._post_batch(base_url, texts)
+                else:
+                    results = None
+                if results is None:
+                    results = await asyncio.gather(
+                        *(self._post_single(base_url, text) for text in texts), return_exceptions=True
+                    )
+            outages = [r for r in results if isinstance(r, BaseException) and is_outage(r)]
+            if outages and len(outages) == len(results):
+                self.breaker.record_failure(outages[0])
+            else:
+                self.breaker.record_success()
+        except CircuitOpenError as e:
+            results = [e] * len(items)
+        except Exception as e:
+            if is_outage(e):
+                self.breaker.record_failure(e)
+            else:
+                self.breaker.record_success()
+            results = [e] * len(items)
+        for (_, future), result in zip(items, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                self._stats["errors"] += 1
+                future.set_exception(result)
+            else:
+                if isinstance(result, dict) and result.get("model_version"):
+                    self._seen_versions[base_url] = str(result["model_version"])
+                future.set_result(result)
+
+    async def model_version(self, base_url):
+        """
+        Verzija modela na serveru (cache MODEL_VERSION_TTL sekundi). None ako je server ne javlja.
+        Dok je server nedostupan vraća se zadnja poznata verzija.
+        """
+        self._ensure_client()
+        checked = self._versions.get(base_url)
+        if checked is not None and time.monotonic() - checked[0] < MODEL_VERSION_TTL:
+            return checked[1] or self._seen_versions.get(base_url)
+        version = checked[1] if checked else None
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            pass
+        else:
+            error = None
+            try:
+                response = await self._client.get(f"{base_url}/model_version")
+                if response.status_code >= 500:
+                    response.raise_for_status()
+                if response.status_code == 200:
+                    data = response.json()
+                    version = str(data.get("model_version") or data.get("version") or "") or None
+                elif response.status_code in NO_BATCH_STATUS:
+                    version = None
+            except Exception as e:
+                error = e
+                logger.warning(f"Model server {base_url}: verzija modela nije dohvaćena: {e}")
+            finally:
+                # Ishod se bilježi na svakom putu nakon check() – inače half_open proba ostaje zauzeta
+                if error is not None and is_outage(error):
+                    self.breaker.record_failure(error)
+                else:
+                    self.breaker.record_success()
+        self._versions[base_url] = (time.monotonic(), version)
+        return version or self._seen_versions.get(base_url)
+
+    async def _post_batch(self, base_url, texts):
+        # None = server nema batch endpoint (šalje se pojedinačno)
+        response = await self._client.post(f"{base_url}/classify_batch", json={"texts": texts})
+        if response.status_code in NO_BATCH_STATUS:
+            logger.info(f"Model server {base_url} nema /classify_batch – pojedinačni pozivi")
+            self._no_batch_until[base_url] = time.monotonic() + self.batch_retry
+            return None
+        response.raise_for_status()
+        self._stats["batch_requests"] += 1
+        results = response.json().get("results")
+        if not isinstance(results, list) or len(results) != len(texts):
+            raise ValueError("Model server: /classify_batch vratio neispravan broj rezultata")
+        return results
+
+    async def _post_single(self, base_url, text):
+        response = await self._client.post(f"{base_url}/classify", json={"text": text})
+        response.raise_for_status()
+        self._stats["single_requests"] += 1
+        return response.json()
+
+    def stats(self):
+        return dict(self._stats)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+model_client = ModelServerClient()
+on_shutdown(model_client.aclose)
+
+def classify_text(base_url, text):
+    # Sinkroni poziv (iz threada, ne iz event loopa)
+    return run_sync(model_client.classify(base_url, text))
+
+def get_model_version(base_url):
+    return run_sync(model_client.model_version(base_url))
+
+def classify_texts(base_url, texts):
+    # Sinkrono za više tekstova odjednom; neuspjeli tekst -> iznimka na njegovom mjestu u listi
+    return run_sync(model_client.classify_many(base_url, texts, return_exceptions=True))
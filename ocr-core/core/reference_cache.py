@@ -0,0 +1,167 @@
+"""
+Cache referentnih podataka u procesu: OIB-evi/HR VAT-ovi vlasnika (Client), partneri po OIB-u/VAT ID-u
+i AppSetting vrijednosti. Upload i reparse ih čitaju za svaki file, a mijenjaju se rijetko.
+
+Invalidacija: svaki ORM upis u Client/Partner/AppSetting (crud/settings.set_setting, deployment.upsert_client,
+partneri, import, upload) označi sesiju, a nakon commita se odbacuje pripadni dio cachea. Za partnere se
+odbacuju samo promijenjeni OIB-evi/VAT ID-evi – sljedeći lookup ih ponovno čita jednim upitom po ključu.
+Drugi procesi (ingest worker, više uvicorn workera) ne vide tuđe commitove – za njih vrijedi REFERENCE_CACHE_TTL.
+"""
+import os
+import time
+import threading
+
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import Session
+
+from core.database.models import AppSetting, Client, Partner
+
+REFERENCE_CACHE_TTL = float(os.environ.get("REFERENCE_CACHE_TTL", "60"))
+
+class PartnerRef:
+    """
+    Snapshot partnera iz cachea (nije vezan uz sesiju). Za upis treba db.get(Partner, ref.id).
+    """
+    __slots__ = ("id", "naziv", "oib", "vat_id", "adresa", "vies_response")
+
+    def __init__(self, partner):
+        for name in self.__slots__:
+            setattr(self, name, getattr(partner, name))
+
+class ReferenceCache:
+    KINDS = {Client: "owners", Partner: "partners", AppSetting: "settings"}
+
+    def __init__(self, ttl=REFERENCE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {}      # kind -> (loaded_at, value)
+        self._stale_partners = set()  # OIB/VAT ključevi promijenjeni nakon učitavanja mape partnera
+        self._stats = {"hits": 0, "loads": 0, "partner_misses": 0, "invalidations": 0}
+
+    def _get(self, db, kind, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(kind)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._stats["hits"] += 1
+                return entry[1]
+        value = loader(db)
+        with self._lock:
+            self._data[kind] = (now, value)
+            self._stats["loads"] += 1
+        return value
+
+    # ---------- LOADERI (jedan upit po vrsti) ----------
+    @staticmethod
+    def _load_owners(db):
+        oibs = frozenset(str(oib) for (oib,) in db.query(Client.oib).all() if oib)
+        return oibs, frozenset(f"HR{oib}" for oib in oibs)
+
+    @staticmethod
+    def _load_settings(db):
+        return {s.key: s.value for s in db.query(AppSetting).all()}
+
+    @staticmethod
+    def _load_partners(db):
+        # Duplikati: vrijedi partner s najmanjim id-em, a OIB ima prednost pred istim VAT ID-em
+        refs = [PartnerRef(partner) for partner in db.query(Partner).order_by(Partner.id).all()]
+        partners = {}
+        for ref in refs:
+            partners.setdefault(ref.oib, ref)
+        for ref in refs:
+            if ref.vat_id:
+                partners.setdefault(ref.vat_id, ref)
+        return partners
+
+    @staticmethod
+    def _load_partner(db, key):
+        rows = db.query(Partner).filter(or_(Partner.oib == key, Partner.vat_id == key)).order_by(Partner.id).all()
+        return next((p for p in rows if p.oib == key), None) or next(iter(rows), None)
+
+    # ---------- API ----------
+    def owner_identifiers(self, db):
+        """(frozenset OIB-eva, frozenset HR VAT-ova) svih klijenata (vlasnika)."""
+        return self._get(db, "owners", self._load_owners)
+
+    def setting(self, db, key, default=None):
+        return self._get(db, "settings", self._load_settings).get(key, default)
+
+    def partner(self, db, oib_or_vat):
+        """
+        Partner po OIB-u ili VAT ID-u: PartnerRef iz cachea, a ako ga nema, upit u bazu (novi partner
+        iz drugog procesa ili još necommitani u ovoj sesiji) – vraća ORM objekt ili None.
+        """
+        partners = self._get(db, "partners", self._load_partners)
+        with self._lock:
+            stale = oib_or_vat in self._stale_partners
+        ref = None if stale else partners.get(oib_or_vat)
+        if ref is not None:
+            return ref
+        with self._lock:
+            self._stats["partner_misses"] += 1
+        partner = self._load_partner(db, oib_or_vat)
+        if stale:
+            with self._lock:
+                self._stale_partners.discard(oib_or_vat)
+                if partner is None:
+                    partners.pop(oib_or_vat, None)
+                else:
+                    partners[oib_or_vat] = PartnerRef(partner)
+        return partner
+
+    def invalidate(self, *kinds):
+        with self._lock:
+            for kind in kinds or list(self._data):
+                if self._data.pop(kind, None) is not None:
+                    self._stats["invalidations"] += 1
+            if "partners" not in self._data:
+                self._stale_partners.clear()
+
+    def invalidate_partners(self, keys):
+        # Mapa partnera ostaje; samo se zadani ključevi pri sljedećem lookupu čitaju iz baze
+        with self._lock:
+            if "partners" in self._data and keys:
+                self._stale_partners.update(keys)
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "ttl": self.ttl, "loaded": sorted(self._data)}
+
+reference_cache = ReferenceCache()
+
+# ---------- INVALIDACIJA NAKON COMMITA ----------
+_INFO_KEY = "reference_cache_dirty"
+_PARTNER_KEYS = "reference_cache_partner_keys"
+
+def _partner_keys(partner):
+    # Trenutni i (ako su promijenjeni u ovom flushu) stari OIB i VAT ID
+    state = inspect(partner)
+    keys = set()
+    for name in ("oib", "vat_id"):
+        history = state.attrs[name].history
+        keys.update(v for v in (*history.added, *history.unchanged, *history.deleted) if v)
+    return keys
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        kind = ReferenceCache.KINDS.get(type(obj))
+        if kind == "partners":
+            session.info.setdefault(_PARTNER_KEYS, set()).update(_partner_keys(obj))
+        elif kind is not None:
+            session.info.setdefault(_INFO_KEY, set()).add(kind)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    kinds = session.info.pop(_INFO_KEY, None)
+    if kinds:
+        reference_cache.invalidate(*kinds)
+    partner_keys = session.info.pop(_PARTNER_KEYS, None)
+    if partner_keys:
+        reference_cache.invalidate_partners(partner_keys)
+
+@event.listens_for(Session, "after_rollback")
+def _clear_dirty(session):
+    session.info.pop(_INFO_KEY, None)
+    session.info.pop(_PARTNER_KEYS, None)
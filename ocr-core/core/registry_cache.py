@@ -0,0 +1,193 @@
+"""
+Cache odgovora vanjskih registara (Sudreg po OIB-u, VIES po VAT broju) s TTL-om i single-flightom.
+
+Redoslijed: memorija (LRU) -> tablica registry_lookups (dijele je svi procesi, preživi restart) -> API.
+Pozitivni odgovori vrijede positive_ttl, negativni (nije pronađen, nevažeći VAT) negative_ttl sekundi.
+Greške (timeout, 5xx, circuit open) se ne cachiraju. Istovremeni lookupi istog ključa u procesu čekaju
+jedan poziv prema API-ju (SingleFlight).
+"""
+import os
+import copy
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from core.database.connection import SessionMain
+from core.database.models import RegistryLookup
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_CACHE_MAX_ENTRIES = int(os.environ.get("REGISTRY_CACHE_MAX_ENTRIES", "10000"))
+SUDREG_CACHE_TTL = int(os.environ.get("SUDREG_CACHE_TTL", str(30 * 24 * 3600)))
+SUDREG_NEGATIVE_TTL = int(os.environ.get("SUDREG_NEGATIVE_TTL", str(24 * 3600)))
+VIES_CACHE_TTL = int(os.environ.get("VIES_CACHE_TTL", str(7 * 24 * 3600)))
+VIES_NEGATIVE_TTL = int(os.environ.get("VIES_NEGATIVE_TTL", str(24 * 3600)))
+
+class SingleFlight:
+    """
+    Istovremeni pozivi s istim ključem: prvi radi fn, ostali čekaju i dobiju isti rezultat (ili iznimku).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        # -> (rezultat, True ako je rezultat tuđeg poziva)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+        try:
+            call["result"] = fn()
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
+        return call["result"], False
+
+class RegistryCache:
+    def __init__(self, source, positive_ttl, negative_ttl, max_entries=REGISTRY_CACHE_MAX_ENTRIES,
+                 session_factory=SessionMain):
+        self.source = source
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # ključ -> (expires epoch, found, payload)
+        self._flight = SingleFlight()
+        self._stats = {
+            "lookups": 0, "hits_memory": 0, "hits_db": 0, "coalesced": 0,
+            "fetches": 0, "negative_hits": 0, "errors": 0,
+        }
+
+    def _count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    # ---------- MEMORIJA ----------
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key, expires, found, payload):
+        with self._lock:
+            self._memory[key] = (expires, found, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # ---------- BAZA ----------
+    def _db_get(self, key):
+        try:
+            with self.session_factory() as db:
+                row = (
+                    db.query(RegistryLookup)
+                    .filter(RegistryLookup.source == self.source, RegistryLookup.lookup_key == key)
+                    .first()
+                )
+                if row is None or row.expires_at <= datetime.utcnow():
+                    return None
+                expires = time.time() + (row.expires_at - datetime.utcnow()).total_seconds()
+                return expires, row.found, row.payload
+        except Exception as e:
+            logger.warning(f"Registry cache ({self.source}): čitanje iz baze nije uspjelo: {e}")
+            return None
+
+    def _db_put(self, key, found, payload, ttl):
+        now = datetime.utcnow()
+        try:
+            with self.session_factory() as db:
+                row = (
+                    db.query(RegistryLookup)
+                    .filter(RegistryLookup.source == self.source, RegistryLookup.lookup_key == key)
+                    .first()
+                )
+                if row is None:
+                    row = RegistryLookup(source=self.source, lookup_key=key)
+                    db.add(row)
+                row.found = found
+                row.payload = payload
+                row.fetched_at = now
+                row.expires_at = now + timedelta(seconds=ttl)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Isti ključ je paralelno spremio drugi proces
+                    db.rollback()
+        except Exception as e:
+            logger.warning(f"Registry cache ({self.source}): spremanje u bazu nije uspjelo: {e}")
+
+    # ---------- API ----------
+    def get(self, key, fetch):
+        """
+        fetch(key) -> (found, payload) poziva API; iznimka se prosljeđuje i ne cachira se.
+        Vraća (found, payload); payload je kopija (pozivatelj ga smije mijenjati).
+        """
+        self._count("lookups")
+        entry = self._memory_get(key)
+        if entry is not None:
+            self._count("hits_memory", *(() if entry[1] else ("negative_hits",)))
+            return entry[1], copy.deepcopy(entry[2])
+
+        def load():
+            entry = self._db_get(key)
+            if entry is not None:
+                self._count("hits_db", *(() if entry[1] else ("negative_hits",)))
+                self._memory_put(key, *entry)
+                return entry[1], entry[2]
+            self._count("fetches")
+            try:
+                found, payload = fetch(key)
+            except Exception:
+                self._count("errors")
+                raise
+            ttl = self.positive_ttl if found else self.negative_ttl
+            self._memory_put(key, time.time() + ttl, found, payload)
+            self._db_put(key, found, payload, ttl)
+            return found, payload
+
+        (found, payload), coalesced = self._flight.do(key, load)
+        if coalesced:
+            self._count("coalesced")
+        return found, copy.deepcopy(payload)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+            else:
+                self._memory.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._memory)
+        hits = stats["hits_memory"] + stats["hits_db"] + stats["coalesced"]
+        stats["hit_rate"] = round(hits / stats["lookups"], 4) if stats["lookups"] else None
+        return stats
+
+sudreg_cache = RegistryCache("sudreg", SUDREG_CACHE_TTL, SUDREG_NEGATIVE_TTL)
+vies_cache = RegistryCache("vies", VIES_CACHE_TTL, VIES_NEGATIVE_TTL)
@@ -1,4 +1,3 @@
-from io import BytesIO
 from fastapi import APIRouter, Depends, HTTPException, Body, Query, Path, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
@@ -17,11 +16,18 @@ from pydantic import BaseModel
 from core.parsers.dispatcher import dispatch_parser
 from core.utils.regex_common import detect_doc_type
 from pydantic import BaseModel
+from modules.ocr_processing.workers.layout import load_layout, layout_path_for
+from core.reference_cache import reference_cache
+from core.ml.classification_cache import classify_cached
+from core.utils.circuit_breaker import CircuitOpenError
+from core.ingest import PROCESSING_DOCUMENT_TYPE
 
-import requests  # Dodano za AI poziv
 
 router = APIRouter()
 
+# Obrisani dokumenti i placeholderi joba u obradi ne ulaze u popise, statistiku ni reparse
+HIDDEN_DOCUMENT_TYPES = ("OBRISANI DOKUMENT", PROCESSING_DOCUMENT_TYPE)
+
 UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "uploads"))
 ES_INDEX = "spineict_ocr"
 
@@ -79,6 +85,8 @@ def list_documents(
         query = query.filter(Document.document_type == document_type)
     if not include_deleted:
         query = query.filter(Document.document_type != "OBRISANI DOKUMENT")
+    if document_type != PROCESSING_DOCUMENT_TYPE:
+        query = query.filter(Document.document_type != PROCESSING_DOCUMENT_TYPE)
     if processed:
         query = query.filter(Document.ocrresult.isnot(None))
     if supplier_oib:
@@ -119,8 +127,8 @@ def list_documents(
 
 @router.get("/stats-info")
 def documents_stats(db: Session = Depends(get_db)):
-    total_docs = db.query(Document).filter(Document.document_type != "OBRISANI DOKUMENT").count()
-    processed_docs = db.query(Document).filter(Document.ocrresult.isnot(None), Document.document_type != "OBRISANI DOKUMENT").count()
+    total_docs = db.query(Document).filter(Document.document_type.notin_(HIDDEN_DOCUMENT_TYPES)).count()
+    processed_docs = db.query(Document).filter(Document.ocrresult.isnot(None), Document.document_type.notin_(HIDDEN_DOCUMENT_TYPES)).count()
     total_size_bytes = (
         sum(
             os.path.getsize(os.path.join(UPLOAD_DIR, f))
@@ -132,7 +140,7 @@ def documents_stats(db: Session = Depends(get_db)):
     total_size_mb = total_size_bytes / (1024 * 1024)
     usage = shutil.disk_usage(UPLOAD_DIR) if os.path.exists(UPLOAD_DIR) else None
     free_mb = usage.free / (1024 * 1024) if usage else 0
-    by_type_query = db.query(Document.document_type, func.count()).filter(Document.document_type != "OBRISANI DOKUMENT").group_by(Document.document_type).all()
+    by_type_query = db.query(Document.document_type, func.count()).filter(Document.document_type.notin_(HIDDEN_DOCUMENT_TYPES)).group_by(Document.document_type).all()
     by_type = {row[0]: row[1] for row in by_type_query if row[0]}
     return {
         "total_documents": total_docs,
@@ -146,7 +154,7 @@ def documents_stats(db: Session = Depends(get_db)):
 def top_partners(db: Session = Depends(get_db)):
     results = (
         db.query(Document.supplier_name_ocr, func.count(Document.id))
-        .filter(Document.document_type != "OBRISANI DOKUMENT")
+        .filter(Document.document_type.notin_(HIDDEN_DOCUMENT_TYPES))
         .group_by(Document.supplier_name_ocr)
         .order_by(func.count(Document.id).desc())
         .limit(10)
@@ -229,6 +237,41 @@ def get_document_file(document_id: int = Path(...), db: Session = Depends(get_db
     headers = {"Content-Disposition": f"inline; filename={doc.filename}"}
     return FileResponse(path=file_path, media_type="application/pdf", headers=headers)
 
+@router.get("/{document_id}/layout")
+def get_document_layout(
+    document_id: int = Path(...),
+    page: int | None = Query(None, ge=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Geometrija riječi (tekst, box [x0, y0, x1, y1] u PDF točkama, conf, linija) spremljena pri OCR-u,
+    za OcrTextTagger/PdfViewer – bez ponovnog OCR-a. Bez ?page vraća sve stranice.
+    """
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    if not doc or not doc.filename:
+        raise HTTPException(status_code=404, detail="Document not found")
+    layout_path = layout_path_for(os.path.join(UPLOAD_DIR, doc.filename))
+    if not os.path.isfile(layout_path):
+        raise HTTPException(status_code=404, detail="Layout za dokument nije spremljen")
+    with load_layout(layout_path) as layout:
+        if page is not None and page >= layout.page_count:
+            raise HTTPException(status_code=404, detail="Stranica ne postoji")
+        page_numbers = [page] if page is not None else range(layout.page_count)
+        pages = []
+        for n in page_numbers:
+            p = layout.page(n)
+            pages.append({
+                "page": p["page"],
+                "source": p["source"],
+                "width": p["width"],
+                "height": p["height"],
+                "words": p["words"],
+                "boxes": p["boxes"].tolist(),
+                "conf": p["conf"].tolist(),
+                "line": p["line"].tolist(),
+            })
+    return {"document_id": document_id, "page_count": layout.page_count, "pages": pages}
+
 @router.put("/{document_id}/update_type")
 def update_document_type(
     document_id: int,
@@ -285,6 +328,8 @@ def delete_document(document_id: int = Path(...), db: Session = Depends(get_db))
             file_path = os.path.join(UPLOAD_DIR, doc.filename)
             if os.path.isfile(file_path):
                 os.remove(file_path)
+            if os.path.isfile(layout_path_for(file_path)):
+                os.remove(layout_path_for(file_path))
         doc.document_type = "OBRISANI DOKUMENT"
         if not doc.annotation:
             doc.annotation = DocumentAnnotation(document_id=doc.id, annotations={})
@@ -337,6 +382,8 @@ def batch_delete_documents(
                 file_path = os.path.join(UPLOAD_DIR, doc.filename)
                 if os.path.isfile(file_path):
                     os.remove(file_path)
+                if os.path.isfile(layout_path_for(file_path)):
+                    os.remove(layout_path_for(file_path))
             doc.document_type = "OBRISANI DOKUMENT"
             if not doc.annotation:
                 doc.annotation = DocumentAnnotation(document_id=doc.id, annotations={})
@@ -373,20 +420,42 @@ def batch_delete_documents(
 async def read_pdf_meta(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Datoteka nije PDF")
-    contents = await file.read()
     try:
-        pdf_file_like = BytesIO(contents)
-        reader = PdfReader(pdf_file_like)
+        # UploadFile je već spooled na disk – PdfReader čita iz njega bez kopije cijelog filea u memoriju
+        reader = PdfReader(file.file)
         meta = reader.metadata or {}
         meta_dict = {k[1:]: v for k, v in meta.items()}
         return {"metadata": meta_dict}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Greška prilikom čitanja metapodataka: {e}")
 
+# Koliko dokumenata se klasificira odjednom (model_client ih šalje u batchevima)
+REPARSE_CLASSIFY_CHUNK = 256
+
+def classify_documents(db, model_server_url, docs):
+    """
+    AI klasifikacija više dokumenata odjednom -> {doc.id: rezultat}. Dokumenti bez OCR teksta i
+    neuspjele klasifikacije se izostavljaju (reparse tada radi samo s parserom).
+    Nepromijenjeni tekstovi dolaze iz classification cachea, bez poziva model servera.
+    """
+    docs = [d for d in docs if d.ocrresult and len(d.ocrresult.strip()) >= 10]
+    results = {}
+    circuit_open = 0
+    for doc, result in zip(docs, classify_cached(db, model_server_url, [d.ocrresult for d in docs])):
+        if isinstance(result, CircuitOpenError):
+            circuit_open += 1
+        elif isinstance(result, Exception):
+            logging.warning(f"AI classification failed for doc {doc.id}: {result}")
+        elif isinstance(result, dict):
+            results[doc.id] = result
+    if circuit_open:
+        logging.warning(f"AI classification skipped for {circuit_open} documents: model server unavailable (circuit open)")
+    return results
+
 @router.post("/reparse-all")
 def reparse_all_documents(db: Session = Depends(get_db)):
     logging.info("Start reparse_all_documents")
-    docs = db.query(Document).filter(Document.document_type != "OBRISANI DOKUMENT").all()
+    docs = db.query(Document).filter(Document.document_type.notin_(HIDDEN_DOCUMENT_TYPES)).all()
     updated = 0
     errors = []
 
@@ -402,28 +471,22 @@ def reparse_all_documents(db: Session = Depends(get_db)):
         "7": "NEPOZNATO",
     }
 
-    for doc in docs:
+    model_ip = reference_cache.setting(db, "model_server_ip") or "127.0.0.1"
+    model_port = reference_cache.setting(db, "model_server_port") or "9000"
+    model_server_url = f"http://{model_ip}:{model_port}"
+    classified = {}
+
+    for i, doc in enumerate(docs):
+        if i % REPARSE_CLASSIFY_CHUNK == 0:
+            classified = classify_documents(db, model_server_url, docs[i:i + REPARSE_CLASSIFY_CHUNK])
         logging.info(f"Parsing document id={doc.id} filename={doc.filename}")
         try:
             ocr_text = doc.ocrresult or ""
             if not ocr_text or len(ocr_text.strip()) < 10:
                 raise Exception("Prazan ili premali OCR tekst")
 
-            # --- AI CLASSIFICATION identično kao upload ---
-            ai_classify_result = {}
-            try:
-                from core.crud.settings import get_setting
-                model_ip_setting = get_setting(db, "model_server_ip")
-                model_port_setting = get_setting(db, "model_server_port")
-                model_ip = model_ip_setting.value if model_ip_setting else "127.0.0.1"
-                model_port = model_port_setting.value if model_port_setting else "9000"
-                model_server_url = f"http://{model_ip}:{model_port}"
-                payload = {"text": ocr_text}
-                resp = requests.post(f"{model_server_url}/classify", json=payload, timeout=15)
-                if resp.status_code == 200:
-                    ai_classify_result = resp.json()
-            except Exception as e:
-                logging.warning(f"AI classification failed for doc {doc.id}: {e}")
+            # --- AI CLASSIFICATION identično kao upload (unaprijed, po chunkovima) ---
+            ai_classify_result = classified.get(doc.id, {})
 
             ai_parsed = ai_classify_result.get("parsed_fields", {}) if isinstance(ai_classify_result, dict) else {}
             ai_label = ai_classify_result.get("best_label") if isinstance(ai_classify_result, dict) else None
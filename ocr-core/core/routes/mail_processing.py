@@ -16,6 +16,7 @@ from io import BytesIO
 from PIL import Image
 import traceback
 import httpx
+import hashlib
 
 router = APIRouter(prefix="/api/mail_processing", tags=["mail_processing"])
 
@@ -166,6 +167,7 @@ async def process_mail_batch(db: Session = Depends(get_db)):
         print(f"[ERROR] Ne mogu dohvatiti DMS server IP/port iz baze: {e}")
 
     upload_url = f"http://{dms_ip}:{dms_port}/api/upload/documents"
+    known_hashes_url = f"http://{dms_ip}:{dms_port}/api/upload/known-hashes"
     print(f"[LOG] Upload endpoint: {upload_url}")
 
     try:
@@ -210,7 +212,35 @@ async def process_mail_batch(db: Session = Depends(get_db)):
             if not attachment_filenames:
                 continue
 
-            for filename_original, part in attachment_filenames:
+            # Pitaj server koje priloge već ima (po sha256) – poznati se ne šalju ponovno
+            # Po indeksu priloga: mail može imati više priloga istog imena (npr. dva racun.pdf)
+            attachment_hashes = [
+                hashlib.sha256(part.get_payload(decode=True) or b"").hexdigest()
+                for _, part in attachment_filenames
+            ]
+            known = {}
+            try:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        known_hashes_url, json={"hashes": attachment_hashes}, timeout=15
+                    )
+                    if response.status_code == 200:
+                        known = response.json().get("known", {})
+            except Exception as e:
+                print(f"[WARNING] Provjera poznatih hasheva nije uspjela, šaljem sve priloge: {e}")
+
+            handled = False
+            for (filename_original, part), file_hash in zip(attachment_filenames, attachment_hashes):
+                if file_hash in known:
+                    result = {
+                        "status": "DUPLICATE",
+                        "existing_id": known[file_hash]["document_id"],
+                        "message": "Document with same content already exists.",
+                    }
+                    print(f"[LOG] Attachment '{filename_original}' već postoji (dokument {result['existing_id']}), ne šaljem")
+                    results.append({"uid": uid_str, "filename": filename_original, "result": result})
+                    handled = True
+                    continue
                 try:
                     attachment_content = part.get_payload(decode=True)
                     if not is_pdf_image_size_valid(attachment_content):
@@ -236,25 +266,29 @@ async def process_mail_batch(db: Session = Depends(get_db)):
                     print(traceback.format_exc())
                     continue
 
-                try:
-                    processed_entry = MailProcessed(
-                        mail_account_id=account.id,
-                        uid=uid_str,
-                        message_uid=uid_str,
-                        processed_at=datetime.now(timezone.utc),
-                        status="processed"
-                    )
-                    db.add(processed_entry)
-                    db.commit()
-                except IntegrityError:
-                    db.rollback()
-                    print(f"[WARNING] Mail UID {uid_str} već je obrađen (duplikat), preskačem unos u bazu.")
-                except Exception as e:
-                    print(f"[ERROR] Greška pri spremanju statusa obrađenog maila UID {uid_str}: {e}")
-                    print(traceback.format_exc())
-
                 print(f"[LOG] Mail UID {uid_str} attachment '{filename_original}' obrađen")
                 results.append({"uid": uid_str, "filename": filename_original, "result": result})
+                handled = True
+
+            # Mail se bilježi jednom, nakon svih priloga – i kad su svi prilozi već poznati (DUPLICATE)
+            if not handled:
+                continue
+            try:
+                processed_entry = MailProcessed(
+                    mail_account_id=account.id,
+                    uid=uid_str,
+                    message_uid=uid_str,
+                    processed_at=datetime.now(timezone.utc),
+                    status="processed"
+                )
+                db.add(processed_entry)
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                print(f"[WARNING] Mail UID {uid_str} već je obrađen (duplikat), preskačem unos u bazu.")
+            except Exception as e:
+                print(f"[ERROR] Greška pri spremanju statusa obrađenog maila UID {uid_str}: {e}")
+                print(traceback.format_exc())
 
         mail.logout()
         return {"success": True, "processed": len(results), "details": results}
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from core.database.connection import get_db
+
+from core.utils.circuit_breaker import all_breakers
+
+router = APIRouter(prefix="/api/system")
+
+# ---------- CIRCUIT BREAKERI (model server, Sudreg, VIES) ----------
+@router.get("/breakers")
+def get_breakers():
+    return {"breakers": [b.snapshot() for b in all_breakers()]}
+
+@router.post("/breakers/{name}/reset")
+def reset_breaker(name: str):
+    # Ručno zatvaranje (npr. nakon što je servis popravljen, bez čekanja reset_timeouta)
+    for breaker in all_breakers():
+        if breaker.name == name:
+            breaker.reset()
+            return breaker.snapshot()
+    raise HTTPException(status_code=404, detail=f"Breaker '{name}' ne postoji")
+
+# ---------- CACHEVI ----------
+@router.get("/caches")
+def get_caches():
+    # Statistika cacheva ovog procesa (OCR cache i page index su po procesu – ovdje za web proces)
+    from core.registry_cache import sudreg_cache, vies_cache
+    from core.reference_cache import reference_cache
+    from core.ml.classification_cache import classification_cache
+    from core.ml.model_client import model_client
+    from modules.ocr_processing.workers.cache import ocr_cache
+    from modules.ocr_processing.workers.page_index import page_index
+    from modules.sudreg_api.client import sudreg_client
+
+    return {
+        "sudreg": sudreg_cache.stats(),
+        "vies": vies_cache.stats(),
+        "sudreg_client": sudreg_client.stats(),
+        "reference": reference_cache.stats(),
+        "classification": classification_cache.stats() if classification_cache is not None else None,
+        "model_client": model_client.stats(),
+        "ocr": ocr_cache.stats() if ocr_cache is not None else None,
+        "page_index": page_index.stats() if page_index is not None else None,
+    }
+
+# ---------- OBOGAĆIVANJE PARTNERA (vidi core/enrichment.py) ----------
+@router.get("/enrichment")
+def get_enrichment(db: Session = Depends(get_db)):
+    from core.enrichment import is_running, load_checkpoint
+    return {"running": is_running(), "checkpoint": load_checkpoint(db)}
+
+@router.post("/enrichment/run")
+def run_enrichment_job(restart: bool = False):
+    from core.enrichment import start_enrichment_thread
+    if not start_enrichment_thread(restart=restart):
+        raise HTTPException(status_code=409, detail="Obogaćivanje partnera već radi")
+    return {"started": True}
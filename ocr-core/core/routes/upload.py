@@ -1,25 +1,35 @@
 import os
+import re
 import uuid
+import asyncio
 import json
 import logging
-import hashlib
-import warnings
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from pydantic import BaseModel
 
 from core.parsers.dispatcher import dispatch_parser
 from core.database.connection import SessionMain
-from core.database.models import Document, Partner, DocumentAnnotation, Client
+from core.database.models import Document, Partner, DocumentAnnotation, IngestQueueItem
 from core.parsers.supplier_extractor import extract_supplier_info
 from core.utils.regex_common import extract_all_vats, extract_all_oibs, extract_invoice_date, extract_due_date
 from core.routes.oibvalidator import is_valid_oib
 from core.deployment import get_owner_oib
-from modules.ocr_processing.workers.engine import perform_ocr
-from modules.sudreg_api.client import SudregClient
-from core.vies_api.client import ViesClient
+from core.reference_cache import reference_cache
+from core.ml.classification_cache import classify_cached
+from core.ingest import ingest_jobs, PROCESSING_DOCUMENT_TYPE
+from core.utils.storage import spool_upload, spool_stream, commit_spooled, discard_spooled
+from modules.ocr_processing.workers.engine import OcrPageStream
+from modules.ocr_processing.config import OCR_CLASSIFY_PAGES, OCR_HEADER_ONLY_TYPES, OCR_HEADER_PAGES
+from modules.ocr_processing.workers.layout import save_layout, layout_path_for
+from modules.sudreg_api.client import sudreg_client
+from core.vies_api.client import vies_client
+from core.utils.address import format_address
 from elasticsearch import Elasticsearch
 
 AI_LABEL_MAPPING: Dict[str, str] = {
@@ -33,7 +43,8 @@ AI_LABEL_MAPPING: Dict[str, str] = {
     "7": "NEPOZNATO",
 }
 
-from PIL.Image import DecompressionBombWarning
+from PIL.Image import DecompressionBombWarning, DecompressionBombError
+from modules.ocr_processing.workers.page_ocr import ImageTooLargeError
 from core.routes.settings import TRAINING_MODE_FLAG
 import tempfile
 import requests
@@ -52,20 +63,25 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "uploads"))
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-sudreg_client = SudregClient()
-vies_client = ViesClient()
+# Batch mod /documents: koliko dokumenata ide u jednu transakciju (1 = commit po dokumentu)
+UPLOAD_COMMIT_BATCH = max(1, int(os.environ.get("UPLOAD_COMMIT_BATCH", "1")))
+# Koliko fileova iz istog uploada je istovremeno u fazi OCR + klasifikacija
+UPLOAD_OCR_CONCURRENCY = max(1, int(os.environ.get("UPLOAD_OCR_CONCURRENCY", "2")))
 
-# --- NOVO: Dohvat svih owner OIB-eva i HR VAT-ova ---
+# --- NOVO: Dohvat svih owner OIB-eva i HR VAT-ova (iz reference cachea, frozenset) ---
 def get_all_owner_oibs_and_hrvats(db: Session):
-    oibs = set()
-    hrvats = set()
-    clients = db.query(Client).all()
-    for c in clients:
-        if getattr(c, "oib", None):
-            oib = str(c.oib)
-            oibs.add(oib)
-            hrvats.add(f"HR{oib}")
-    return oibs, hrvats
+    return reference_cache.owner_identifiers(db)
+
+def filter_owner_fields(parsed_data, all_owner_oibs, all_owner_hrvats):
+    # Vrati novi dict gdje su owner OIB/VAT zamijenjeni s None
+    if parsed_data.get("oib") in all_owner_oibs:
+        parsed_data["oib"] = None
+    if parsed_data.get("vat_number") and parsed_data["vat_number"].upper() in all_owner_hrvats:
+        parsed_data["vat_number"] = None
+    # Ako imaš i supplier_oib i on ti dolazi iz AI-a/parsera
+    if parsed_data.get("supplier_oib") in all_owner_oibs:
+        parsed_data["supplier_oib"] = None
+    return parsed_data
 
 def str_to_date(date_str: Optional[str]):
     if not date_str:
@@ -93,6 +109,30 @@ def determine_final_document_type(
         return "FAKTURA"
     return document_type or "OSTALO"
 
+def get_model_server_url(db: Session) -> str:
+    model_ip = model_port = None
+    try:
+        model_ip = reference_cache.setting(db, "model_server_ip")
+        model_port = reference_cache.setting(db, "model_server_port")
+    except Exception:
+        pass
+    return f"http://{model_ip or '127.0.0.1'}:{model_port or '9000'}"
+
+def classify_document_text(db: Session, text: str) -> Dict[str, Any]:
+    """
+    AI klasifikacija (model server /classify). Vraća {} ako server nije dostupan.
+    """
+    ai_classify_result: Dict[str, Any] = {}
+    try:
+        # Cache po hashu teksta i verziji modela; inače pooled klijent (istovremeni pozivi idu u batch)
+        ai_classify_result = classify_cached(db, get_model_server_url(db), [text])[0]
+        if isinstance(ai_classify_result, Exception):
+            raise ai_classify_result
+        logger.info(f"AI classification result: {ai_classify_result}")
+    except Exception as e:
+        logger.warning(f"AI classification failed: {e}")
+    return ai_classify_result if isinstance(ai_classify_result, dict) else {}
+
 def serialize_for_json(obj: Any) -> Any:
     from modules.sudreg_api.schemas import SudregCompany
     if isinstance(obj, SudregCompany):
@@ -108,18 +148,6 @@ def date_to_str(date_obj):
         return date_obj
     return date_obj.strftime("%d.%m.%Y")
 
-def format_address(address_obj):
-    if not address_obj:
-        return None
-    parts = []
-    if hasattr(address_obj, "ulica_i_broj") and address_obj.ulica_i_broj:
-        parts.append(address_obj.ulica_i_broj)
-    if hasattr(address_obj, "postanski_broj") and address_obj.postanski_broj:
-        parts.append(str(address_obj.postanski_broj))
-    if hasattr(address_obj, "mjesto") and address_obj.mjesto:
-        parts.append(address_obj.mjesto)
-    return ", ".join(parts)
-
 def index_to_elasticsearch(doc: Document):
     try:
         es.index(
@@ -181,7 +209,7 @@ def build_auto_annotation_dict(
         "ai_conflict": parsed_data.get("ai_conflict"),
     }
 
-def upsert_document_annotations(db: Session, doc_id: int, annotation_dict: Dict[str, Any]) -> None:
+def upsert_document_annotations(db: Session, doc_id: int, annotation_dict: Dict[str, Any], commit: bool = True) -> None:
     annotation = db.query(DocumentAnnotation).filter(DocumentAnnotation.document_id == doc_id).first()
     if not annotation:
         annotation = DocumentAnnotation(document_id=doc_id)
@@ -190,10 +218,11 @@ def upsert_document_annotations(db: Session, doc_id: int, annotation_dict: Dict[
         if hasattr(annotation, field):
             setattr(annotation, field, value)
     annotation.annotations = json.dumps(annotation_dict, ensure_ascii=False)
-    db.commit()
+    if commit:
+        db.commit()
     logger.info(f"Annotations auto-filled for document ID {doc_id}")
 
-def sync_annotations_to_document(db: Session, doc: Document, annotations: Dict[str, Any]):
+def sync_annotations_to_document(db: Session, doc: Document, annotations: Dict[str, Any], commit: bool = True):
     mapping = {
         "supplier_name": "supplier_name_ocr",
         "oib": "supplier_oib",
@@ -218,7 +247,8 @@ def sync_annotations_to_document(db: Session, doc: Document, annotations: Dict[s
             current_value = getattr(doc, doc_field)
             if current_value != new_value:
                 setattr(doc, doc_field, new_value)
-    db.commit()
+    if commit:
+        db.commit()
 
 def is_training_mode_enabled() -> bool:
     return TRAINING_MODE_FLAG.get("enabled", False)
@@ -237,511 +267,755 @@ def merge_doc_fields(parsed: dict, ann_data: dict = None) -> dict:
         "doc_number": get_value("invoice_number"),
     }
 
-# ... [IMPORTS + sve isto do @router.post("/documents")]
+# ... [IMPORTS + sve isto do # ---------- PIPELINE ZA JEDAN FILE (OCR -> klasifikacija -> parsiranje -> partner -> dokument) ----------
+def ocr_document_file(
+    db: Session,
+    file_path: str,
+    original_filename: str,
+    file_hash: str,
+    document_type: str,
+) -> Dict[str, Any]:
+    """
+    Prva faza obrade: OCR + AI klasifikacija -> {"ocr_result", "ai_classify_result"} (oblik checkpointa),
+    ili gotova FAILED stavka rezultata. Dok ostatak dokumenta još čeka OCR, tip se procjenjuje s prvih stranica
+    (header-only tipovi ne čekaju ostatak); klasifikacija koja ide dalje uvijek je iz cijelog obrađenog teksta.
+    """
+    unique_name = os.path.basename(file_path)
+    try:
+        # Prevelike slike zaustavlja OCR (ImageTooLargeError prije dekodiranja, DecompressionBombWarning
+        # kao greška u OCR workeru) – ovdje bez warnings filtera, koji su globalni i nisu thread-safe
+        with OcrPageStream(file_path, file_hash=file_hash) as ocr_stream:
+            ocr_result = None
+            header = None
+            if OCR_CLASSIFY_PAGES > 0 and OCR_HEADER_ONLY_TYPES and ocr_stream.has_pending_ocr():
+                # Tip s prvih stranica samo dok ostatak još čeka OCR: odlučuje smije li se OCR skratiti
+                header_text = ocr_stream.header_text(OCR_CLASSIFY_PAGES)
+                header_classify = classify_document_text(db, header_text)
+                header = (header_text, header_classify)
+                header_type = determine_final_document_type(
+                    document_type, header_classify.get("best_label"), header_text
+                )
+                if header_type in OCR_HEADER_ONLY_TYPES:
+                    ocr_result = ocr_stream.result(max_pages=OCR_HEADER_PAGES)
+            if ocr_result is None:
+                ocr_result = ocr_stream.result()
+        # Labela i parsed_fields iz cijelog obrađenog teksta, kao kod reparsea
+        if header is not None and header[0] == ocr_result["text"]:
+            ai_classify_result = header[1]
+        else:
+            ai_classify_result = classify_document_text(db, ocr_result["text"])
+        logger.info(
+            f"OCR successful for {unique_name}"
+            + (" (header pages only)" if ocr_result.get("partial") else "")
+        )
+    except (ImageTooLargeError, DecompressionBombWarning, DecompressionBombError) as bomb_warn:
+        logger.warning(
+            f"Skipping file {original_filename} due to image size warning: {bomb_warn}"
+        )
+        return {
+            "filename": original_filename,
+            "status": "FAILED",
+            "error": "Image too large (DecompressionBombWarning)",
+        }
+    except Exception as e:
+        logger.error(f"OCR error for {original_filename}: {e}")
+        return {
+            "filename": original_filename,
+            "status": "FAILED",
+            "error": f"OCR error: {str(e)}",
+        }
+    return {"ocr_result": ocr_result, "ai_classify_result": ai_classify_result}
 
-def filter_owner_fields(parsed_data, all_owner_oibs, all_owner_hrvats):
-    # Vrati novi dict gdje su owner OIB/VAT zamijenjeni s None
-    if parsed_data.get("oib") in all_owner_oibs:
-        parsed_data["oib"] = None
-    if parsed_data.get("vat_number") and parsed_data["vat_number"].upper() in all_owner_hrvats:
-        parsed_data["vat_number"] = None
-    # Ako imaš i supplier_oib i on ti dolazi iz AI-a/parsera
-    if parsed_data.get("supplier_oib") in all_owner_oibs:
-        parsed_data["supplier_oib"] = None
-    return parsed_data
+def process_document_file(
+    db: Session,
+    file_path: str,
+    original_filename: str,
+    file_hash: str,
+    document_type: str,
+    all_owner_oibs=None,
+    all_owner_hrvats=None,
+    doc: Optional[Document] = None,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    on_checkpoint=None,
+    commit: bool = True,
+) -> Dict[str, Any]:
+    """
+    Obrada jednog spremljenog filea; vraća stavku rezultata uploada (status "OK" ili "FAILED").
+    Sinkrono (OCR, model server, Sudreg/VIES, DB) – poziva se iz threada, ne iz event loopa.
+    doc: placeholder dokument iz ingest joba koji se popunjava umjesto kreiranja novog.
+    checkpoint: {"ocr_result", "ai_classify_result"} iz prethodnog pokušaja (ingest red) ili iz ocr_document_file
+    (faza uploada) – OCR se ne ponavlja.
+    on_checkpoint(stage, data): poziva se nakon OCR-a ("ocr") i nakon spremanja dokumenta ("saved").
+    commit: sve izmjene baze (partner, dokument, anotacije, ime filea) su jedna transakcija s jednim commitom
+    na kraju. S commit=False samo se flusha – commit i ES indeksiranje (index_committed) radi pozivatelj,
+    npr. batch upload koji commita više dokumenata odjednom.
+    """
+    unique_name = os.path.basename(file_path)
+    upload_time = doc.archived_at if doc is not None and doc.archived_at else datetime.utcnow()
+    if all_owner_oibs is None or all_owner_hrvats is None:
+        all_owner_oibs, all_owner_hrvats = get_all_owner_oibs_and_hrvats(db)
 
-@router.post("/documents")
-async def upload_documents(
-    files: List[UploadFile] = File(...),
-    document_type: str = Form(...),
-):
-    logger.info(
-        f"Starting upload process for {len(files)} files, document type: '{document_type}'"
+    # OCR + AI klasifikacija (preskače se ako je već napravljena – checkpoint ili faza uploada)
+    if checkpoint and checkpoint.get("ocr_result") is not None:
+        ocr_result = checkpoint["ocr_result"]
+        ai_classify_result = checkpoint.get("ai_classify_result") or {}
+    else:
+        ocr_stage = ocr_document_file(db, file_path, original_filename, file_hash, document_type)
+        if "status" in ocr_stage:
+            return ocr_stage
+        ocr_result, ai_classify_result = ocr_stage["ocr_result"], ocr_stage["ai_classify_result"]
+        if on_checkpoint is not None:
+            on_checkpoint("ocr", ocr_stage)
+    text = ocr_result["text"]
+
+    ai_parsed = (
+        ai_classify_result.get("parsed_fields", {})
+        if isinstance(ai_classify_result, dict)
+        else {}
+    )
+    ai_label = (
+        ai_classify_result.get("best_label")
+        if isinstance(ai_classify_result, dict)
+        else None
+    )
+    ai_score = (
+        ai_classify_result.get("best_score")
+        if isinstance(ai_classify_result, dict)
+        else None
     )
-    results: List[Dict[str, Any]] = []
-    db: Session = SessionMain()
 
-    try:
-        all_owner_oibs, all_owner_hrvats = get_all_owner_oibs_and_hrvats(db)
-        logger.info(f"All owner OIBs: {all_owner_oibs}")
-        logger.info(f"All owner HR VATs: {all_owner_hrvats}")
+    # --- OIB kandidat: SVI OIB iz clients isključeni ---
+    oib_candidates = [
+        x for x in extract_all_oibs(text)
+        if is_valid_oib(x) and x not in all_owner_oibs
+    ]
+    oib = oib_candidates[0] if oib_candidates else None
+    if not oib:
+        oib_ai = ai_parsed.get("oib") if isinstance(ai_parsed, dict) else None
+        if oib_ai and oib_ai not in all_owner_oibs:
+            oib = oib_ai
+        else:
+            oib = None
 
-        for file in files:
-            logger.info(f"Processing file: {file.filename}")
-            ext = os.path.splitext(file.filename)[1]
-
-            hasher = hashlib.sha256()
-            content_bytes = b""
-            while True:
-                chunk = await file.read(1024 * 1024)
-                if not chunk:
-                    break
-                hasher.update(chunk)
-                content_bytes += chunk
-            file_hash = hasher.hexdigest()
-            logger.info(f"File hash {file.filename}: {file_hash}")
-
-            existing_doc = db.query(Document).filter_by(hash=file_hash).first()
-            if existing_doc:
-                logger.warning(
-                    f"Duplicate document found: {file.filename} (hash: {file_hash}) - skipping"
-                )
-                results.append(
-                    {
-                        "filename": file.filename,
-                        "status": "DUPLICATE",
-                        "existing_id": existing_doc.id,
-                        "message": "Document with same content already exists.",
-                    }
-                )
-                continue
+    doc_number = (
+        ai_parsed.get("invoice_number") if isinstance(ai_parsed, dict) else None
+    )
 
-            unique_name = f"{uuid.uuid4().hex}{ext}"
-            file_path = os.path.join(UPLOAD_DIR, unique_name)
+    invoice_date_str = (
+        ai_parsed.get("date_issued") if isinstance(ai_parsed, dict) else None
+    ) or extract_invoice_date(text)
+    due_date_str = (
+        ai_parsed.get("due_date") if isinstance(ai_parsed, dict) else None
+    ) or extract_due_date(text)
+    invoice_date = str_to_date(invoice_date_str)
+    due_date = str_to_date(due_date_str)
 
-            try:
-                with open(file_path, "wb") as f:
-                    f.write(content_bytes)
-                logger.info(f"File saved as {unique_name}")
-            except Exception as e:
-                logger.error(f"Error saving file {file.filename}: {e}")
-                results.append(
-                    {
-                        "filename": file.filename,
-                        "status": "FAILED",
-                        "error": str(e),
-                    }
-                )
-                continue
+    # --- VAT kandidat: samo HR-VAT (HR{OIB}) isključeni ---
+    vat_ai = (
+        ai_parsed.get("vat_number") if isinstance(ai_parsed, dict) else None
+    )
+    vat_number = None
+    if vat_ai and vat_ai.upper() not in all_owner_hrvats:
+        vat_number = vat_ai
+    else:
+        all_vats = extract_all_vats(text)
+        filtered_vats = [
+            v for v in all_vats
+            if v.upper() not in all_owner_hrvats
+        ]
+        vat_number = filtered_vats[0] if filtered_vats else None
 
-            upload_time = datetime.utcnow()
+    text_lower = text.lower()
 
-            # OCR
-            try:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("error", DecompressionBombWarning)
-                    text = perform_ocr(file_path)
-                logger.info(f"OCR successful for {unique_name}")
-            except DecompressionBombWarning as bomb_warn:
-                logger.warning(
-                    f"Skipping file {file.filename} due to image size warning: {bomb_warn}"
-                )
-                results.append(
-                    {
-                        "filename": file.filename,
-                        "status": "FAILED",
-                        "error": "Image too large (DecompressionBombWarning)",
-                    }
-                )
-                continue
-            except Exception as e:
-                logger.error(f"OCR error for {file.filename}: {e}")
-                results.append(
-                    {
-                        "filename": file.filename,
-                        "status": "FAILED",
-                        "error": f"OCR error: {str(e)}",
-                    }
-                )
-                continue
+    final_document_type = determine_final_document_type(document_type, ai_label, text)
+
+    parser = dispatch_parser(final_document_type)
+    parser_output = parser(text)
 
-            # AI classification
-            ai_classify_result: Dict[str, Any] = {}
+    parsed_data: Dict[str, Any] = {}
+    if isinstance(ai_parsed, dict):
+        parsed_data.update({k: v for k, v in ai_parsed.items() if v is not None})
+
+    for k, v in parser_output.items():
+        if k not in parsed_data or parsed_data[k] in (None, '', [], {}):
+            parsed_data[k] = v
+
+    # --- DODANO: filtriraj owner OIB/VAT iz parsed_data ---
+    parsed_data = filter_owner_fields(parsed_data, all_owner_oibs, all_owner_hrvats)
+
+    ai_conflict = False
+    if document_type == "IRA":
+        ai_suggestion = AI_LABEL_MAPPING.get(ai_label, None)
+        ai_suggestion_score = ai_score
+        if ai_suggestion and ai_suggestion != "IRA":
+            ai_conflict = True
+        parsed_data["ai_suggestion"] = ai_suggestion
+        parsed_data["ai_score"] = ai_suggestion_score
+        parsed_data["ai_conflict"] = ai_conflict
+
+    amount_value: Optional[float] = None
+    for key in ("amount", "total", "iznos", "amount_total"):
+        if key in parsed_data and parsed_data[key]:
             try:
-                model_ip_setting = None
-                model_port_setting = None
-                try:
-                    from core.crud.settings import get_setting
-                    model_ip_setting = get_setting(db, "model_server_ip")
-                    model_port_setting = get_setting(db, "model_server_port")
-                except Exception:
-                    pass
-                model_ip = model_ip_setting.value if model_ip_setting else "127.0.0.1"
-                model_port = model_port_setting.value if model_port_setting else "9000"
-                model_server_url = f"http://{model_ip}:{model_port}"
-
-                payload = {"text": text}
-                resp = requests.post(
-                    f"{model_server_url}/classify", json=payload, timeout=15
+                cleaned = (
+                    str(parsed_data[key]).replace(".", "").replace(",", ".")
                 )
-                if resp.status_code == 200:
-                    ai_classify_result = resp.json()
-                logger.info(f"AI classification result: {ai_classify_result}")
-            except Exception as e:
-                logger.warning(f"AI classification failed: {e}")
-
-            ai_parsed = (
-                ai_classify_result.get("parsed_fields", {})
-                if isinstance(ai_classify_result, dict)
-                else {}
-            )
-            ai_label = (
-                ai_classify_result.get("best_label")
-                if isinstance(ai_classify_result, dict)
-                else None
-            )
-            ai_score = (
-                ai_classify_result.get("best_score")
-                if isinstance(ai_classify_result, dict)
-                else None
-            )
+                amount_value = float(cleaned)
+                break
+            except Exception:
+                pass
 
-            # --- OIB kandidat: SVI OIB iz clients isključeni ---
-            oib_candidates = [
-                x for x in extract_all_oibs(text)
-                if is_valid_oib(x) and x not in all_owner_oibs
-            ]
-            oib = oib_candidates[0] if oib_candidates else None
-            if not oib:
-                oib_ai = ai_parsed.get("oib") if isinstance(ai_parsed, dict) else None
-                if oib_ai and oib_ai not in all_owner_oibs:
-                    oib = oib_ai
-                else:
-                    oib = None
-
-            doc_number = (
-                ai_parsed.get("invoice_number") if isinstance(ai_parsed, dict) else None
-            )
+    supplier_info = extract_supplier_info(text)
+    if not isinstance(supplier_info, dict):
+        supplier_info = {}
+    skraceni_naziv: Optional[str] = None
+    partner_obj: Optional[Partner] = None
+    sudreg_data = None
+    sudreg_raw = None
+    vies_data = None
 
-            invoice_date_str = (
-                ai_parsed.get("date_issued") if isinstance(ai_parsed, dict) else None
-            ) or extract_invoice_date(text)
-            due_date_str = (
-                ai_parsed.get("due_date") if isinstance(ai_parsed, dict) else None
-            ) or extract_due_date(text)
-            invoice_date = str_to_date(invoice_date_str)
-            due_date = str_to_date(due_date_str)
-
-            # --- VAT kandidat: samo HR-VAT (HR{OIB}) isključeni ---
-            vat_ai = (
-                ai_parsed.get("vat_number") if isinstance(ai_parsed, dict) else None
-            )
-            vat_number = None
-            if vat_ai and vat_ai.upper() not in all_owner_hrvats:
-                vat_number = vat_ai
-            else:
-                all_vats = extract_all_vats(text)
-                filtered_vats = [
-                    v for v in all_vats
-                    if v.upper() not in all_owner_hrvats
-                ]
-                vat_number = filtered_vats[0] if filtered_vats else None
-
-            text_lower = text.lower()
-
-            final_document_type = determine_final_document_type(document_type, ai_label, text)
-
-            parser = dispatch_parser(final_document_type)
-            parser_output = parser(text)
-
-            parsed_data: Dict[str, Any] = {}
-            if isinstance(ai_parsed, dict):
-                parsed_data.update({k: v for k, v in ai_parsed.items() if v is not None})
-
-            for k, v in parser_output.items():
-                if k not in parsed_data or parsed_data[k] in (None, '', [], {}):
-                    parsed_data[k] = v
-
-            # --- DODANO: filtriraj owner OIB/VAT iz parsed_data ---
-            parsed_data = filter_owner_fields(parsed_data, all_owner_oibs, all_owner_hrvats)
-
-            ai_conflict = False
-            if document_type == "IRA":
-                ai_suggestion = AI_LABEL_MAPPING.get(ai_label, None)
-                ai_suggestion_score = ai_score
-                if ai_suggestion and ai_suggestion != "IRA":
-                    ai_conflict = True
-                parsed_data["ai_suggestion"] = ai_suggestion
-                parsed_data["ai_score"] = ai_suggestion_score
-                parsed_data["ai_conflict"] = ai_conflict
-
-            amount_value: Optional[float] = None
-            for key in ("amount", "total", "iznos", "amount_total"):
-                if key in parsed_data and parsed_data[key]:
+    if not oib and not vat_number:
+        skraceni_naziv = "Nepoznat dobavljač"
+    else:
+        if oib:
+            partner_obj = reference_cache.partner(db, oib)
+            if partner_obj or oib not in all_owner_oibs:
+                if partner_obj:
+                    supplier_info.update(
+                        {
+                            "naziv_firme": partner_obj.naziv,
+                            "adresa": partner_obj.adresa,
+                            "oib": partner_obj.oib,
+                        }
+                    )
+                    skraceni_naziv = partner_obj.naziv
+                    if not getattr(partner_obj, "vies_response", None):
+                        try:
+                            country_code = oib[:2]
+                            vat = oib[2:]
+                            vies_data = vies_client.validate_vat(country_code, vat)
+                            # partner_obj može biti snapshot iz cachea – upis ide na ORM objekt
+                            db.get(Partner, partner_obj.id).vies_response = vies_data
+                        except Exception as e:
+                            logger.warning(f"VIES validation failed for OIB {oib}: {e}")
+                    else:
+                        vies_data = partner_obj.vies_response
+                else:
                     try:
-                        cleaned = (
-                            str(parsed_data[key]).replace(".", "").replace(",", ".")
-                        )
-                        amount_value = float(cleaned)
-                        break
-                    except Exception:
-                        pass
-
-            supplier_info = extract_supplier_info(text)
-            if not isinstance(supplier_info, dict):
-                supplier_info = {}
-            skraceni_naziv: Optional[str] = None
-            partner_obj: Optional[Partner] = None
-            sudreg_data = None
-            sudreg_raw = None
-            vies_data = None
-
-            if not oib and not vat_number:
-                skraceni_naziv = "Nepoznat dobavljač"
-            else:
-                if oib:
-                    partner_obj = db.query(Partner).filter_by(oib=oib).first()
-                    if partner_obj or oib not in all_owner_oibs:
-                        if partner_obj:
+                        sudreg_data, sudreg_raw = sudreg_client.get_company_by_oib(oib, db)
+                        if sudreg_data:
+                            partner_name_from_sudreg = None
+                            if sudreg_raw and isinstance(sudreg_raw, dict):
+                                skracene_tvrtke = sudreg_raw.get("skracene_tvrtke", [{}])
+                                if (
+                                    isinstance(skracene_tvrtke, list)
+                                    and skracene_tvrtke
+                                    and isinstance(skracene_tvrtke[0], dict)
+                                ):
+                                    partner_name_from_sudreg = skracene_tvrtke[0].get("ime")
+                            partner_name_from_sudreg = (
+                                partner_name_from_sudreg
+                                if partner_name_from_sudreg
+                                else getattr(sudreg_data, "naziv", None)
+                            )
                             supplier_info.update(
                                 {
-                                    "naziv_firme": partner_obj.naziv,
-                                    "adresa": partner_obj.adresa,
-                                    "oib": partner_obj.oib,
+                                    "naziv_firme": partner_name_from_sudreg,
+                                    "adresa": format_address(sudreg_data.adresa),
+                                    "oib": sudreg_data.oib,
                                 }
                             )
-                            skraceni_naziv = partner_obj.naziv
-                            if not getattr(partner_obj, "vies_response", None):
-                                try:
-                                    country_code = oib[:2]
-                                    vat = oib[2:]
-                                    vies_data = vies_client.validate_vat(country_code, vat)
-                                    partner_obj.vies_response = vies_data
-                                    db.commit()
-                                except Exception as e:
-                                    logger.warning(f"VIES validation failed for OIB {oib}: {e}")
-                            else:
-                                vies_data = partner_obj.vies_response
-                        else:
+                            novi_partner = Partner(
+                                naziv=partner_name_from_sudreg,
+                                oib=sudreg_data.oib,
+                                adresa=format_address(sudreg_data.adresa),
+                                kontakt_email=None,
+                                kontakt_osoba=None,
+                                kontakt_telefon=None,
+                                vies_response=None,
+                            )
+                            db.add(novi_partner)
                             try:
-                                sudreg_data, sudreg_raw = sudreg_client.get_company_by_oib(oib, db)
-                                if sudreg_data:
-                                    partner_name_from_sudreg = None
-                                    if sudreg_raw and isinstance(sudreg_raw, dict):
-                                        skracene_tvrtke = sudreg_raw.get("skracene_tvrtke", [{}])
-                                        if (
-                                            isinstance(skracene_tvrtke, list)
-                                            and skracene_tvrtke
-                                            and isinstance(skracene_tvrtke[0], dict)
-                                        ):
-                                            partner_name_from_sudreg = skracene_tvrtke[0].get("ime")
-                                    partner_name_from_sudreg = (
-                                        partner_name_from_sudreg
-                                        if partner_name_from_sudreg
-                                        else getattr(sudreg_data, "naziv", None)
-                                    )
-                                    supplier_info.update(
-                                        {
-                                            "naziv_firme": partner_name_from_sudreg,
-                                            "adresa": format_address(sudreg_data.adresa),
-                                            "oib": sudreg_data.oib,
-                                        }
-                                    )
-                                    novi_partner = Partner(
-                                        naziv=partner_name_from_sudreg,
-                                        oib=sudreg_data.oib,
-                                        adresa=format_address(sudreg_data.adresa),
-                                        kontakt_email=None,
-                                        kontakt_osoba=None,
-                                        kontakt_telefon=None,
-                                        vies_response=None,
-                                    )
-                                    db.add(novi_partner)
-                                    db.commit()
-                                    try:
-                                        country_code = oib[:2]
-                                        vat = oib[2:]
-                                        vies_data = vies_client.validate_vat(country_code, vat)
-                                        novi_partner.vies_response = vies_data
-                                        db.commit()
-                                    except Exception as e:
-                                        logger.warning(f"VIES validation failed for OIB {oib}: {e}")
-                                    partner_obj = novi_partner
+                                country_code = oib[:2]
+                                vat = oib[2:]
+                                vies_data = vies_client.validate_vat(country_code, vat)
+                                novi_partner.vies_response = vies_data
                             except Exception as e:
-                                sudreg_raw = {"error": str(e)}
-                                supplier_info["alert"] = f"❗ Sudreg API error: {e}"
-                                logger.warning(
-                                    f"Error fetching Sudreg data for OIB {oib}: {e}"
-                                )
-                else:
-                    if vat_number:
-                        try:
-                            country_code = vat_number[:2]
-                            vat = vat_number[2:]
-                            vies_data = vies_client.call_vies_soap_api(country_code, vat)
-                            if (
-                                isinstance(vies_data, dict)
-                                and vies_data.get("valid")
-                                and vies_data.get("name")
-                            ):
-                                supplier_info.update(
-                                    {
-                                        "naziv_firme": vies_data.get("name"),
-                                        "adresa": vies_data.get("address"),
-                                    }
-                                )
-                                skraceni_naziv = vies_data.get("name")
-                                partner_obj = db.query(Partner).filter_by(oib=vat_number).first()
-                                if not partner_obj:
-                                    partner_obj = Partner(
-                                        naziv=vies_data.get("name"),
-                                        oib=vat_number,
-                                        adresa=vies_data.get("address"),
-                                        kontakt_email=None,
-                                        kontakt_osoba=None,
-                                        kontakt_telefon=None,
-                                        vies_response=vies_data,
-                                    )
-                                    db.add(partner_obj)
-                                    try:
-                                        db.commit()
-                                    except Exception:
-                                        db.rollback()
-                            else:
-                                ai_supplier_name = (
-                                    ai_parsed.get("supplier_name")
-                                    if isinstance(ai_parsed, dict)
-                                    else None
-                                )
-                                skraceni_naziv = (
-                                    ai_supplier_name if ai_supplier_name else "Strani dobavljač"
-                                )
-                                supplier_info.update({"naziv_firme": skraceni_naziv})
-                        except Exception as e:
-                            logger.warning(
-                                f"VIES validation failed for VAT number {vat_number}: {e}"
-                            )
-                            ai_supplier_name = (
-                                ai_parsed.get("supplier_name") if isinstance(ai_parsed, dict) else None
-                            )
-                            skraceni_naziv = (
-                                ai_supplier_name if ai_supplier_name else "Strani dobavljač"
+                                logger.warning(f"VIES validation failed for OIB {oib}: {e}")
+                            partner_obj = novi_partner
+                    except Exception as e:
+                        sudreg_raw = {"error": str(e)}
+                        supplier_info["alert"] = f"❗ Sudreg API error: {e}"
+                        logger.warning(
+                            f"Error fetching Sudreg data for OIB {oib}: {e}"
+                        )
+        else:
+            if vat_number:
+                try:
+                    country_code = vat_number[:2]
+                    vat = vat_number[2:]
+                    vies_data = vies_client.call_vies_soap_api(country_code, vat)
+                    if (
+                        isinstance(vies_data, dict)
+                        and vies_data.get("valid")
+                        and vies_data.get("name")
+                    ):
+                        supplier_info.update(
+                            {
+                                "naziv_firme": vies_data.get("name"),
+                                "adresa": vies_data.get("address"),
+                            }
+                        )
+                        skraceni_naziv = vies_data.get("name")
+                        partner_obj = reference_cache.partner(db, vat_number)
+                        if not partner_obj:
+                            partner_obj = Partner(
+                                naziv=vies_data.get("name"),
+                                oib=vat_number,
+                                adresa=vies_data.get("address"),
+                                kontakt_email=None,
+                                kontakt_osoba=None,
+                                kontakt_telefon=None,
+                                vies_response=vies_data,
                             )
-                            supplier_info.update({"naziv_firme": skraceni_naziv})
-
-            # ----------- KORISTI ISTU LOGIKU KAO U REPARSE ---------
-            doc_fields = merge_doc_fields(parsed_data)
-            # Hard filtriraj owner OIB u doc_fields!
-            if doc_fields["oib"] in all_owner_oibs:
-                doc_fields["oib"] = None
-            # Override naziv partnera s baze/partnera
-            if partner_obj and getattr(partner_obj, "naziv", None):
-                doc_fields["supplier_name_ocr"] = partner_obj.naziv
-            elif skraceni_naziv:
-                doc_fields["supplier_name_ocr"] = skraceni_naziv
-            elif supplier_info.get("naziv_firme"):
-                doc_fields["supplier_name_ocr"] = supplier_info.get("naziv_firme")
-            # -------------------------------------------------------
-
-            doc = Document(
-                filename=unique_name,
-                ocrresult=text,
-                supplier_id=None,
-                supplier_name_ocr=doc_fields["supplier_name_ocr"] or "Nepoznat dobavljač",
-                supplier_oib=doc_fields["oib"],
-                archived_at=upload_time,
-                date=upload_time,
-                document_type=final_document_type,
-                invoice_date=doc_fields["invoice_date"],
-                due_date=doc_fields["due_date"],
-                doc_number=doc_fields["doc_number"],
-                amount=doc_fields["amount"],
-                hash=file_hash,
-                sudreg_response=(
-                    json.dumps(
-                        sudreg_raw,
-                        ensure_ascii=False,
-                        default=serialize_for_json,
+                            # Savepoint: ako je isti partner upravo upisan paralelno, ne ruši se cijela transakcija
+                            try:
+                                with db.begin_nested():
+                                    db.add(partner_obj)
+                            except IntegrityError:
+                                partner_obj = db.query(Partner).filter_by(oib=vat_number).first()
+                    else:
+                        ai_supplier_name = (
+                            ai_parsed.get("supplier_name")
+                            if isinstance(ai_parsed, dict)
+                            else None
+                        )
+                        skraceni_naziv = (
+                            ai_supplier_name if ai_supplier_name else "Strani dobavljač"
+                        )
+                        supplier_info.update({"naziv_firme": skraceni_naziv})
+                except Exception as e:
+                    logger.warning(
+                        f"VIES validation failed for VAT number {vat_number}: {e}"
+                    )
+                    ai_supplier_name = (
+                        ai_parsed.get("supplier_name") if isinstance(ai_parsed, dict) else None
                     )
-                    if sudreg_raw
-                    else None
-                ),
-                parsed=json.dumps(
-                    parsed_data, ensure_ascii=False, default=serialize_for_json
-                ),
+                    skraceni_naziv = (
+                        ai_supplier_name if ai_supplier_name else "Strani dobavljač"
+                    )
+                    supplier_info.update({"naziv_firme": skraceni_naziv})
+
+    # ----------- KORISTI ISTU LOGIKU KAO U REPARSE ---------
+    doc_fields = merge_doc_fields(parsed_data)
+    # Hard filtriraj owner OIB u doc_fields!
+    if doc_fields["oib"] in all_owner_oibs:
+        doc_fields["oib"] = None
+    # Override naziv partnera s baze/partnera
+    if partner_obj and getattr(partner_obj, "naziv", None):
+        doc_fields["supplier_name_ocr"] = partner_obj.naziv
+    elif skraceni_naziv:
+        doc_fields["supplier_name_ocr"] = skraceni_naziv
+    elif supplier_info.get("naziv_firme"):
+        doc_fields["supplier_name_ocr"] = supplier_info.get("naziv_firme")
+    # -------------------------------------------------------
+
+    doc_values = dict(
+        filename=unique_name,
+        ocrresult=text,
+        supplier_id=None,
+        supplier_name_ocr=doc_fields["supplier_name_ocr"] or "Nepoznat dobavljač",
+        supplier_oib=doc_fields["oib"],
+        archived_at=upload_time,
+        date=upload_time,
+        document_type=final_document_type,
+        invoice_date=doc_fields["invoice_date"],
+        due_date=doc_fields["due_date"],
+        doc_number=doc_fields["doc_number"],
+        amount=doc_fields["amount"],
+        hash=file_hash,
+        sudreg_response=(
+            json.dumps(
+                sudreg_raw,
+                ensure_ascii=False,
+                default=serialize_for_json,
             )
-            db.add(doc)
+            if sudreg_raw
+            else None
+        ),
+        parsed=json.dumps(
+            parsed_data, ensure_ascii=False, default=serialize_for_json
+        ),
+    )
+    if doc is None:
+        doc = Document(**doc_values)
+        db.add(doc)
+    else:
+        # Placeholder iz ingest joba (PROCESSING_DOCUMENT_TYPE) postaje pravi dokument
+        for key, value in doc_values.items():
+            setattr(doc, key, value)
+    # Flush: doc.id bez commita, commit je na kraju
+    db.flush()
+    logger.info(f"Document object: {doc}")
+    logger.info(f"invoice_date: {doc.invoice_date} ({type(doc.invoice_date)})")
+    logger.info(f"due_date: {doc.due_date} ({type(doc.due_date)})")
+
+    logger.info(
+        f"Document saved with ID: {doc.id} and filename: {doc.filename}"
+    )
+    if on_checkpoint is not None:
+        on_checkpoint("saved", {"document_id": doc.id})
+
+    annotation_dict = build_auto_annotation_dict(
+        final_document_type,
+        doc_fields["oib"],
+        doc_fields["doc_number"],
+        doc_fields["invoice_date"],
+        doc_fields["due_date"],
+        parsed_data,
+        doc_fields["supplier_name_ocr"],
+        supplier_info,
+        vat_number=vat_number,
+        partner_obj=partner_obj,
+    )
+    upsert_document_annotations(db, doc.id, annotation_dict, commit=False)
+    sync_annotations_to_document(db, doc, annotation_dict, commit=False)
+
+    # FILE RENAME NA ID – **OVO JE KORIGIRAN BLOK**
+    try:
+        new_filename = f"{doc.id}.pdf"
+        new_path = os.path.join(UPLOAD_DIR, new_filename)
+        os.rename(file_path, new_path)
+        doc.filename = new_filename
+        logger.info(f"File renamed to {new_filename}")
+        try:
+            save_layout(ocr_result, layout_path_for(new_path))
+        except Exception as e:
+            logger.warning(f"Layout save failed for document ID {doc.id}: {e}")
+        logger.info(f"Trying to rename {file_path} -> {new_path}")
+        logger.info(f"Exists file_path: {os.path.exists(file_path)}; Exists new_path: {os.path.exists(new_path)}")
+
+    except Exception as e:
+        logger.warning(f"File renaming failed: {e}")
+
+    # Jedan commit po dokumentu (ili po batchu, kad commita pozivatelj)
+    result = {
+        "id": doc.id,
+        "filename": doc.filename,
+        "original_filename": original_filename,
+        "status": "OK",
+        "supplier": supplier_info,
+        "document_type": final_document_type,
+        "parsed": parsed_data,
+    }
+    if commit:
+        try:
             db.commit()
-            db.refresh(doc)
-            logger.info(f"Document object: {doc}")
-            logger.info(f"invoice_date: {doc.invoice_date} ({type(doc.invoice_date)})")
-            logger.info(f"due_date: {doc.due_date} ({type(doc.due_date)})")
+        except Exception as e:
+            logger.error(f"Commit failed for file {original_filename}: {e}")
+            discard_upload_batch(db, [result], e)
+            return result
+        index_committed(db, [result])
 
-            logger.info(
-                f"Document saved with ID: {doc.id} and filename: {doc.filename}"
+    if is_training_mode_enabled():
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w+", delete=False, suffix=".csv", encoding="utf-8", newline=""
+            ) as tf:
+                writer = csv.writer(tf)
+                writer.writerow(["text", "label"])
+                writer.writerow([text, final_document_type])
+                tf.flush()
+                tf.seek(0)
+                with open(tf.name, "rb") as f:
+                    files_data = {
+                        "file": (
+                            os.path.basename(tf.name),
+                            f,
+                            "text/csv",
+                        )
+                    }
+                    resp = requests.post(
+                        f"{get_model_server_url(db)}/api/new_training_data",
+                        files=files_data,
+                        timeout=8,
+                    )
+                os.unlink(tf.name)
+            if resp.ok:
+                logger.info(
+                    f"Training sample sent for file {original_filename}"
+                )
+            else:
+                logger.warning(
+                    f"Training sample NOT sent for file {original_filename}: {resp.text}"
+                )
+        except Exception as e:
+            logger.error(
+                f"Error sending training sample for file {original_filename}: {e}"
             )
 
-            annotation_dict = build_auto_annotation_dict(
-                final_document_type,
-                doc_fields["oib"],
-                doc_fields["doc_number"],
-                doc_fields["invoice_date"],
-                doc_fields["due_date"],
-                parsed_data,
-                doc_fields["supplier_name_ocr"],
-                supplier_info,
-                vat_number=vat_number,
-                partner_obj=partner_obj,
-            )
-            upsert_document_annotations(db, doc.id, annotation_dict)
-            sync_annotations_to_document(db, doc, annotation_dict)
+    return result
 
+def index_committed(db: Session, results: List[Dict[str, Any]]) -> None:
+    # ES indeksiranje tek nakon commita – u indeksu nema dokumenata koji su rollbackani
+    for result in results:
+        if result.get("status") != "OK":
+            continue
+        doc = db.get(Document, result["id"])
+        if doc is not None:
             index_to_elasticsearch(doc)
 
-            # FILE RENAME NA ID – **OVO JE KORIGIRAN BLOK**
-            try:
-                new_filename = f"{doc.id}.pdf"
-                new_path = os.path.join(UPLOAD_DIR, new_filename)
-                os.rename(file_path, new_path)
-                doc.filename = new_filename
-                db.commit()
-                db.refresh(doc)
-                logger.info(f"File renamed to {new_filename}")
-                logger.info(f"Trying to rename {file_path} -> {new_path}")
-                logger.info(f"Exists file_path: {os.path.exists(file_path)}; Exists new_path: {os.path.exists(new_path)}")
-
-            except Exception as e:
-                logger.warning(f"File renaming failed: {e}")
-
-            if is_training_mode_enabled():
-                try:
-                    with tempfile.NamedTemporaryFile(
-                        "w+", delete=False, suffix=".csv", encoding="utf-8", newline=""
-                    ) as tf:
-                        writer = csv.writer(tf)
-                        writer.writerow(["text", "label"])
-                        writer.writerow([text, final_document_type])
-                        tf.flush()
-                        tf.seek(0)
-                        with open(tf.name, "rb") as f:
-                            files_data = {
-                                "file": (
-                                    os.path.basename(tf.name),
-                                    f,
-                                    "text/csv",
-                                )
-                            }
-                            resp = requests.post(
-                                f"{model_server_url}/api/new_training_data",
-                                files=files_data,
-                                timeout=8,
-                            )
-                        os.unlink(tf.name)
-                    if resp.ok:
-                        logger.info(
-                            f"Training sample sent for file {file.filename}"
-                        )
-                    else:
-                        logger.warning(
-                            f"Training sample NOT sent for file {file.filename}: {resp.text}"
-                        )
-                except Exception as e:
-                    logger.error(
-                        f"Error sending training sample for file {file.filename}: {e}"
-                    )
+def discard_upload_batch(db: Session, batch: List[Dict[str, Any]], error: Exception) -> None:
+    # Rollback batcha: dokumenti nisu upisani, pa se brišu i njihovi fileovi (i layout)
+    db.rollback()
+    for result in batch:
+        if result.get("status") != "OK":
+            continue
+        file_path = os.path.join(UPLOAD_DIR, result["filename"])
+        for path in (file_path, layout_path_for(file_path)):
+            if os.path.isfile(path):
+                os.remove(path)
+        result.pop("id", None)
+        result.update(status="FAILED", error=f"DB commit failed: {error}")
+
+def commit_upload_batch(db: Session, batch: List[Dict[str, Any]]) -> None:
+    """
+    Jedan commit za više dokumenata obrađenih s process_document_file(..., commit=False).
+    Stavke rezultata se ažuriraju na mjestu (FAILED ako commit ne uspije).
+    """
+    if not batch:
+        return
+    try:
+        db.commit()
+    except Exception as e:
+        logger.error(f"Commit of {len(batch)} documents failed: {e}")
+        discard_upload_batch(db, batch, e)
+        return
+    index_committed(db, batch)
+
+def store_spooled(
+    db: Session, spooled: Dict[str, Any], filename: str, batch_hashes: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Spooled upload (core/utils/storage.py) -> provjera duplikata po hashu i atomarno premještanje u UPLOAD_DIR.
+    Vraća {"file_path", "file_hash"} ili gotovu stavku rezultata (DUPLICATE / FAILED).
+    batch_hashes: hash -> ime filea za fileove istog requesta koji se spremaju prije obrade (/documents);
+    kasnija kopija istog sadržaja je DUPLICATE, a existing_id popunjava run_upload_pipeline.
+    """
+    file_hash = spooled["sha256"]
+    logger.info(f"File hash {filename}: {file_hash} ({spooled['size']} B)")
+
+    if batch_hashes is not None and file_hash in batch_hashes:
+        discard_spooled(spooled["tmp_path"])
+        logger.warning(
+            f"Duplicate document in upload: {filename} = {batch_hashes[file_hash]} (hash: {file_hash}) - skipping"
+        )
+        return {
+            "filename": filename,
+            "status": "DUPLICATE",
+            "existing_id": None,
+            "file_hash": file_hash,
+            "message": "Document with same content already exists.",
+        }
+
+    existing_doc = db.query(Document).filter_by(hash=file_hash).first()
+    if existing_doc:
+        discard_spooled(spooled["tmp_path"])
+        logger.warning(
+            f"Duplicate document found: {filename} (hash: {file_hash}) - skipping"
+        )
+        return {
+            "filename": filename,
+            "status": "DUPLICATE",
+            "existing_id": existing_doc.id,
+            "message": "Document with same content already exists.",
+        }
+
+    ext = os.path.splitext(filename)[1]
+    unique_name = f"{uuid.uuid4().hex}{ext}"
+    file_path = os.path.join(UPLOAD_DIR, unique_name)
+
+    try:
+        commit_spooled(spooled["tmp_path"], file_path)
+        logger.info(f"File saved as {unique_name}")
+    except Exception as e:
+        discard_spooled(spooled["tmp_path"])
+        logger.error(f"Error saving file {filename}: {e}")
+        return {
+            "filename": filename,
+            "status": "FAILED",
+            "error": str(e),
+        }
+    if batch_hashes is not None:
+        batch_hashes[file_hash] = filename
+    return {"file_path": file_path, "file_hash": file_hash}
+
+async def store_upload(
+    db: Session, file: UploadFile, batch_hashes: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Sprema upload na disk u chunkovima (privremeni file + sha256 u istom prolazu), vidi store_spooled.
+    """
+    logger.info(f"Processing file: {file.filename}")
+    try:
+        spooled = await spool_upload(file, UPLOAD_DIR)
+    except Exception as e:
+        logger.error(f"Error saving file {file.filename}: {e}")
+        return {"filename": file.filename, "status": "FAILED", "error": str(e)}
+    return store_spooled(db, spooled, file.filename, batch_hashes)
+
+def discard_stored_file(file_path: str) -> None:
+    for path in (file_path, layout_path_for(file_path)):
+        if os.path.isfile(path):
+            os.remove(path)
+
+def persist_stage_task(db: Session, filename: str, stored: Dict[str, Any], document_type: str,
+                       all_owner_oibs, all_owner_hrvats, ocr_stage_result: Dict[str, Any],
+                       batch_mode: bool) -> Dict[str, Any]:
+    """
+    Faza spremanja jednog filea. Greška (npr. IntegrityError pri flushu) daje FAILED stavku za taj file
+    umjesto da sruši cijeli upload: u batch modu dokument je u savepointu, pa ostali necommitani dokumenti
+    batcha ostaju.
+    """
+    saved: Dict[str, Any] = {}
+
+    def on_checkpoint(stage, data):
+        if stage == "saved":
+            saved.update(data)
+
+    savepoint = db.begin_nested() if batch_mode else None
+    try:
+        result = process_document_file(
+            db,
+            stored["file_path"],
+            filename,
+            stored["file_hash"],
+            document_type,
+            all_owner_oibs,
+            all_owner_hrvats,
+            checkpoint=ocr_stage_result,
+            on_checkpoint=on_checkpoint,
+            commit=not batch_mode,
+        )
+        if savepoint is not None:
+            savepoint.commit()
+        return result
+    except Exception as e:
+        logger.error(f"Processing failed for file {filename}: {e}")
+        if savepoint is not None:
+            savepoint.rollback()
+        else:
+            db.rollback()
+        discard_stored_file(stored["file_path"])
+        # Greška nakon preimenovanja: file (i layout) je već pod {id}.pdf, a dokument nije upisan
+        document_id = saved.get("document_id")
+        if document_id is not None and db.get(Document, document_id) is None:
+            discard_stored_file(os.path.join(UPLOAD_DIR, f"{document_id}.pdf"))
+        return {"filename": filename, "status": "FAILED", "error": str(e)}
 
-            results.append(
-                {
-                    "id": doc.id,
-                    "filename": doc.filename,
-                    "original_filename": file.filename,
-                    "status": "OK",
-                    "supplier": supplier_info,
-                    "document_type": final_document_type,
-                    "parsed": parsed_data,
-                }
+def ocr_stage_task(file_path: str, original_filename: str, file_hash: str, document_type: str) -> Dict[str, Any]:
+    # Faza OCR-a u zasebnom threadu: vlastita DB sesija (sesija uploada je zauzeta fazom spremanja)
+    db: Session = SessionMain()
+    try:
+        return ocr_document_file(db, file_path, original_filename, file_hash, document_type)
+    finally:
+        db.close()
+
+async def run_upload_pipeline(
+    db: Session,
+    stored_items: List[tuple],
+    document_type: str,
+    all_owner_oibs,
+    all_owner_hrvats,
+) -> List[Dict[str, Any]]:
+    """
+    Obrada spremljenih fileova jednog uploada u dvije faze koje se preklapaju:
+    1. OCR + klasifikacija (OCR pool + model server) – do UPLOAD_OCR_CONCURRENCY fileova istovremeno,
+    2. parsiranje, Sudreg/VIES, spremanje u bazu i preimenovanje – redom, na sesiji db.
+    Dok se file N sprema, OCR idućih fileova već radi. Rezultati su redom fileova.
+    stored_items: [(ime filea, rezultat store_upload)].
+    """
+    semaphore = asyncio.Semaphore(UPLOAD_OCR_CONCURRENCY)
+
+    async def ocr_stage(filename, stored):
+        async with semaphore:
+            return await asyncio.to_thread(
+                ocr_stage_task, stored["file_path"], filename, stored["file_hash"], document_type
             )
 
+    ocr_tasks = [
+        None if "status" in stored else asyncio.create_task(ocr_stage(filename, stored))
+        for filename, stored in stored_items
+    ]
+    batch_mode = UPLOAD_COMMIT_BATCH > 1
+    results: List[Dict[str, Any]] = []
+    pending: List[Dict[str, Any]] = []
+    try:
+        for (filename, stored), task in zip(stored_items, ocr_tasks):
+            if task is None:
+                results.append(stored)
+                continue
+            ocr_stage_result = await task
+            if "status" in ocr_stage_result:
+                results.append(ocr_stage_result)
+                continue
+            # Blokirajuće (HTTP, DB) – u threadu da ne blokira event loop
+            result = await asyncio.to_thread(
+                persist_stage_task, db, filename, stored, document_type, all_owner_oibs, all_owner_hrvats,
+                ocr_stage_result, batch_mode,
+            )
+            results.append(result)
+            if batch_mode and result["status"] == "OK":
+                pending.append(result)
+                if len(pending) >= UPLOAD_COMMIT_BATCH:
+                    await asyncio.to_thread(commit_upload_batch, db, pending)
+                    pending = []
+        await asyncio.to_thread(commit_upload_batch, db, pending)
+    except Exception as e:
+        for task in ocr_tasks:
+            if task is not None:
+                task.cancel()
+        if pending:
+            discard_upload_batch(db, pending, e)
+        raise
+
+    # Kopije istog sadržaja unutar uploada (store_spooled) -> ID dokumenta prve kopije
+    ids_by_hash = {
+        stored["file_hash"]: result.get("id")
+        for (_, stored), result in zip(stored_items, results)
+        if "status" not in stored and result.get("status") == "OK"
+    }
+    for result in results:
+        file_hash = result.pop("file_hash", None)
+        if result.get("status") == "DUPLICATE" and result.get("existing_id") is None and file_hash:
+            result["existing_id"] = ids_by_hash.get(file_hash)
+    return results
+
+@router.post("/documents")
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    document_type: str = Form(...),
+):
+    """
+    Sinkroni mod: odgovor tek kad su svi fileovi obrađeni (faze se preklapaju, vidi run_upload_pipeline).
+    Za velike batcheve koristi /jobs.
+    """
+    logger.info(
+        f"Starting upload process for {len(files)} files, document type: '{document_type}'"
+    )
+    db: Session = SessionMain()
+
+    try:
+        all_owner_oibs, all_owner_hrvats = get_all_owner_oibs_and_hrvats(db)
+        logger.info(f"All owner OIBs: {all_owner_oibs}")
+        logger.info(f"All owner HR VATs: {all_owner_hrvats}")
+
+        batch_hashes: Dict[str, str] = {}
+        stored_items = [(file.filename, await store_upload(db, file, batch_hashes)) for file in files]
+        results = await run_upload_pipeline(
+            db, stored_items, document_type, all_owner_oibs, all_owner_hrvats
+        )
+
         if not results:
             logger.info(
                 "Upload process finished, no documents processed because owner license recognized."
@@ -758,3 +1032,235 @@ async def upload_documents(
         db.close()
 
     return {"processed": results}
+
+# ---------- INGEST JOBOVI: upload odmah vraća job i ID-eve dokumenata, obrada ide u pozadini ----------
+def discard_ingest_item(db: Session, item: Dict[str, Any]) -> None:
+    # Neuspjela obrada: placeholder dokument i file se brišu (isti file se može ponovno uploadati)
+    doc = db.query(Document).filter(Document.id == item["document_id"]).first()
+    if doc is not None and doc.document_type == PROCESSING_DOCUMENT_TYPE:
+        db.delete(doc)
+        db.commit()
+    if os.path.isfile(item["file_path"]):
+        os.remove(item["file_path"])
+
+def run_ingest_item(
+    item: Dict[str, Any], checkpoint=None, on_checkpoint=None, discard_on_failure=True,
+) -> Dict[str, Any]:
+    """
+    Obrada jedne stavke joba u ingest workeru (vlastita DB sesija po stavci).
+    U trajnom redu (core/worker.py) se prosljeđuju checkpointi, a placeholder se briše tek
+    kad su svi pokušaji potrošeni (discard_on_failure=False).
+    """
+    db: Session = SessionMain()
+    try:
+        doc = db.query(Document).filter(Document.id == item["document_id"]).first()
+        if doc is None:
+            return {"filename": item["filename"], "status": "FAILED", "error": "Placeholder dokument ne postoji"}
+        # Pokušaj koji je pao nakon preimenovanja na {id}.pdf: vrati file na ime iz reda
+        renamed_path = os.path.join(UPLOAD_DIR, f"{doc.id}.pdf")
+        if not os.path.exists(item["file_path"]) and os.path.exists(renamed_path):
+            os.rename(renamed_path, item["file_path"])
+        result = process_document_file(
+            db, item["file_path"], item["filename"], item["file_hash"], item["document_type"], doc=doc,
+            checkpoint=checkpoint, on_checkpoint=on_checkpoint,
+        )
+        if result["status"] != "OK" and discard_on_failure:
+            discard_ingest_item(db, item)
+        return result
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ingest error for {item['filename']}: {e}")
+        if discard_on_failure:
+            try:
+                discard_ingest_item(db, item)
+            except Exception as discard_exc:
+                logger.warning(f"Placeholder cleanup failed for {item['filename']}: {discard_exc}")
+        return {"filename": item["filename"], "status": "FAILED", "error": str(e)}
+    finally:
+        db.close()
+
+def cleanup_stale_placeholders(before: datetime) -> int:
+    """
+    Pri startu: placeholderi starijih jobova koje više nitko ne obrađuje (restart prekida ingest pool
+    u memoriji) brišu se zajedno s fileom. Placeholderi čija stavka čeka ili radi u ingest_queue ostaju.
+    """
+    db: Session = SessionMain()
+    try:
+        live = db.query(IngestQueueItem.document_id).filter(
+            IngestQueueItem.status.in_(("queued", "running")), IngestQueueItem.document_id.isnot(None),
+        )
+        docs = (
+            db.query(Document)
+            .filter(Document.document_type == PROCESSING_DOCUMENT_TYPE, Document.archived_at < before)
+            .filter(Document.id.notin_(live))
+            .all()
+        )
+        for doc in docs:
+            # File je pod imenom iz uploada ili, ako je pokušaj pao nakon preimenovanja, pod {id}.pdf
+            for name in (doc.filename, f"{doc.id}.pdf"):
+                if name:
+                    discard_stored_file(os.path.join(UPLOAD_DIR, name))
+            db.delete(doc)
+        db.commit()
+        if docs:
+            logger.warning(f"Obrisano {len(docs)} napuštenih placeholder dokumenata ({PROCESSING_DOCUMENT_TYPE})")
+        return len(docs)
+    finally:
+        db.close()
+
+# ---------- PROVJERA HASHEVA PRIJE UPLOADA ----------
+KNOWN_HASHES_MAX = 1000
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+class KnownHashesRequest(BaseModel):
+    hashes: List[str]
+
+@router.post("/known-hashes")
+def known_hashes(payload: KnownHashesRequest):
+    """
+    Klijent (mail, skener) pošalje sha256 svojih fileova i uploada samo nepoznate.
+    Jedan upit za cijelu listu (najviše KNOWN_HASHES_MAX hasheva po zahtjevu).
+    """
+    hashes = list(dict.fromkeys(h.strip().lower() for h in payload.hashes))
+    if len(hashes) > KNOWN_HASHES_MAX:
+        raise HTTPException(status_code=413, detail=f"Najviše {KNOWN_HASHES_MAX} hasheva po zahtjevu")
+    invalid = [h for h in hashes if not SHA256_RE.match(h)]
+    if invalid:
+        raise HTTPException(status_code=422, detail={"message": "Neispravan sha256", "invalid": invalid[:20]})
+
+    db: Session = SessionMain()
+    try:
+        rows = (
+            db.query(Document.hash, Document.id, Document.document_type)
+            .filter(Document.hash.in_(hashes))
+            .all()
+            if hashes else []
+        )
+    finally:
+        db.close()
+    known = {h: {"document_id": doc_id, "document_type": doc_type} for h, doc_id, doc_type in rows}
+    return {
+        "known": known,
+        "unknown": [h for h in hashes if h not in known],
+    }
+
+def create_ingest_item(db: Session, stored: Dict[str, Any], filename: str, document_type: str) -> Dict[str, Any]:
+    # Placeholder dokument (ID odmah ide klijentu) + stavka za ingest pool / red
+    now = datetime.utcnow()
+    placeholder = Document(
+        filename=os.path.basename(stored["file_path"]),
+        hash=stored["file_hash"],
+        document_type=PROCESSING_DOCUMENT_TYPE,
+        archived_at=now,
+        date=now,
+    )
+    db.add(placeholder)
+    db.commit()
+    return {
+        "document_id": placeholder.id,
+        "filename": filename,
+        "file_path": stored["file_path"],
+        "file_hash": stored["file_hash"],
+        "document_type": document_type,
+    }
+
+def submit_ingest_job(items: List[Dict[str, Any]], skipped: List[Dict[str, Any]]) -> Dict[str, Any]:
+    job = ingest_jobs.submit(items, run_ingest_item, skipped=skipped)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "documents": [{"id": item["document_id"], "filename": item["filename"]} for item in items],
+        "skipped": skipped,
+    }
+
+@router.post("/jobs")
+async def create_upload_job(
+    files: List[UploadFile] = File(...),
+    document_type: str = Form(...),
+):
+    """
+    Job mod: fileovi se spremaju, za svaki se kreira placeholder dokument i odmah se vraćaju
+    job_id i ID-evi dokumenata. Obradu radi pozadinski ingest pool (core/ingest.py);
+    stanje: GET /jobs/{job_id}, rezultat: GET /jobs/{job_id}/result, napredak (SSE): GET /jobs/{job_id}/events.
+    """
+    logger.info(f"Creating upload job for {len(files)} files, document type: '{document_type}'")
+    db: Session = SessionMain()
+    items: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+    try:
+        for file in files:
+            stored = await store_upload(db, file)
+            if "status" in stored:
+                skipped.append(stored)
+                continue
+            items.append(create_ingest_item(db, stored, file.filename, document_type))
+    finally:
+        db.close()
+    return submit_ingest_job(items, skipped)
+
+@router.post("/raw")
+async def upload_raw(
+    request: Request,
+    filename: str = Query(...),
+    document_type: str = Query(...),
+):
+    """
+    Upload za strojne klijente: tijelo zahtjeva je sam file (bez multiparta), streamano ravno na disk.
+        curl --data-binary @racun.pdf "http://host/api/upload/raw?filename=racun.pdf&document_type=URA"
+    Odgovor je isti kao za /jobs (job_id + ID dokumenta).
+    """
+    logger.info(f"Raw upload: {filename}, document type: '{document_type}'")
+    try:
+        spooled = await spool_stream(request.stream(), UPLOAD_DIR)
+    except Exception as e:
+        logger.error(f"Error saving raw upload {filename}: {e}")
+        raise HTTPException(status_code=400, detail=f"Upload nije uspio: {e}")
+    if not spooled["size"]:
+        discard_spooled(spooled["tmp_path"])
+        raise HTTPException(status_code=400, detail="Prazno tijelo zahtjeva")
+
+    db: Session = SessionMain()
+    try:
+        stored = store_spooled(db, spooled, os.path.basename(filename))
+        if "status" in stored:
+            return submit_ingest_job([], [stored])
+        item = create_ingest_item(db, stored, os.path.basename(filename), document_type)
+    finally:
+        db.close()
+    return submit_ingest_job([item], [])
+
+def _get_job_or_404(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    return _get_job_or_404(job_id).to_dict()
+
+@router.get("/jobs/{job_id}/result")
+def get_upload_job_result(job_id: str):
+    job = _get_job_or_404(job_id)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail="Job još nije završen")
+    return {"job_id": job.id, "processed": job.results()}
+
+@router.get("/jobs/{job_id}/events")
+async def upload_job_events(job_id: str):
+    """
+    Server-Sent Events: događaj "progress" pri svakoj promjeni stanja joba, "done" na kraju.
+    """
+    job = _get_job_or_404(job_id)
+
+    async def event_stream():
+        version = -1
+        while True:
+            version = await asyncio.to_thread(job.wait_for_change, version, 15)
+            payload = json.dumps(job.to_dict(), ensure_ascii=False, default=serialize_for_json)
+            if job.finished:
+                yield f"event: done\ndata: {payload}\n\n"
+                return
+            yield f"event: progress\ndata: {payload}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
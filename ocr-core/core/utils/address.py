@@ -0,0 +1,13 @@
+# ---------- ADRESA IZ SUDREGA ----------
+def format_address(address_obj):
+    # Sudreg adresa (ulica_i_broj, postanski_broj, mjesto) -> "Ilica 1, 10000, Zagreb"
+    if not address_obj:
+        return None
+    parts = []
+    if hasattr(address_obj, "ulica_i_broj") and address_obj.ulica_i_broj:
+        parts.append(address_obj.ulica_i_broj)
+    if hasattr(address_obj, "postanski_broj") and address_obj.postanski_broj:
+        parts.append(str(address_obj.postanski_broj))
+    if hasattr(address_obj, "mjesto") and address_obj.mjesto:
+        parts.append(address_obj.mjesto)
+    return ", ".join(parts)
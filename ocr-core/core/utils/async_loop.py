@@ -0,0 +1,64 @@
+"""
+Jedan pozadinski event loop po procesu za async klijente koje zove i sinkroni kod (model server, Azure OCR).
+
+httpx.AsyncClient i semafori vezani su uz loop na kojem su kreirani, pa svi pozivi tih klijenata idu kroz
+ovaj loop – iz threadova (run_sync) i iz drugih loopova (run_async). Klijent registrira svoj aclose
+s on_shutdown; shutdown_loop() ih zatvara i zaustavlja loop (shutdown API-ja).
+"""
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_thread = None
+_closers = []
+_lock = threading.Lock()
+
+def get_loop():
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="async-clients-loop", daemon=True)
+            _thread.start()
+        return _loop
+
+def run_sync(coro):
+    # Iz threada (ne iz ovog loopa): blokira do rezultata
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+async def run_async(coro):
+    # Iz drugog event loopa: čeka bez blokiranja
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_loop()))
+
+def on_shutdown(aclose):
+    # aclose: async funkcija bez argumenata (npr. klijent.aclose), poziva se na loopu pri shutdown_loop()
+    with _lock:
+        _closers.append(aclose)
+
+def shutdown_loop(timeout=5):
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+        closers = list(_closers)
+    if loop is None:
+        return
+
+    async def close_all():
+        for aclose in closers:
+            try:
+                await aclose()
+            except Exception as e:
+                logger.warning(f"Zatvaranje async klijenta nije uspjelo: {e}")
+
+    try:
+        asyncio.run_coroutine_threadsafe(close_all(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"Async klijenti nisu zatvoreni na vrijeme: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    if not loop.is_running():
+        loop.close()
@@ -0,0 +1,132 @@
+"""
+Circuit breakeri za vanjske servise (model server, Sudreg, VIES).
+
+closed    -> pozivi prolaze; failure_threshold uzastopnih grešaka -> open
+open      -> pozivi odmah padaju (CircuitOpenError) ili vraćaju fallback, bez čekanja na timeout
+half_open -> nakon reset_timeout sekundi propušta se jedan probni poziv: uspjeh -> closed, greška -> open
+
+Breakeri su po procesu (registry get_breaker); stanje se vidi na GET /api/system/breakers.
+"""
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} nedostupan (circuit open, novi pokušaj za {retry_in:.0f} s)")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"calls": 0, "failures": 0, "short_circuited": 0, "opened": 0}
+        self._last_error = None
+
+    def allow(self):
+        """
+        True ako poziv smije ići prema servisu. U half_open stanju propušta samo jedan probni poziv.
+        """
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == CLOSED or (self._state == HALF_OPEN and not self._probe_in_flight):
+                self._probe_in_flight = self._state == HALF_OPEN
+                self._stats["calls"] += 1
+                return True
+            self._stats["short_circuited"] += 1
+            return False
+
+    def check(self):
+        # allow() koji podiže CircuitOpenError
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def retry_in(self):
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit {self.name}: servis ponovno dostupan (closed)")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            self._last_error = str(error) if error is not None else None
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats["opened"] += 1
+                    logger.warning(f"Circuit {self.name}: open nakon {self._failures} grešaka ({self._last_error})")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        self.check()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            state = self._state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                state = HALF_OPEN
+            return {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_in": round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1) if state == OPEN else 0.0,
+                "last_error": self._last_error,
+                **self._stats,
+            }
+
+# ---------- REGISTRY ----------
+_breakers = {}
+_registry_lock = threading.Lock()
+
+def get_breaker(name, **kwargs):
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **kwargs)
+        return _breakers[name]
+
+def all_breakers():
+    with _registry_lock:
+        return list(_breakers.values())
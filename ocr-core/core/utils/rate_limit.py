@@ -0,0 +1,46 @@
+"""
+Token bucket za vanjske API-je s kvotom (Sudreg).
+
+rate tokena u sekundi, najviše burst odjednom. acquire() blokira dok token nije dostupan.
+Bucket je po procesu i dijele ga sve niti.
+"""
+import time
+import threading
+
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0}
+
+    def _reserve(self):
+        # Uzima token (može otići u minus) i vraća koliko treba čekati da on "stigne"
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self._stats["acquired"] += 1
+            if wait > 0:
+                self._stats["waited"] += 1
+                self._stats["wait_seconds"] += wait
+            return wait
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["rate"] = self.rate
+        stats["burst"] = self.burst
+        return stats
@@ -0,0 +1,59 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+
+# ---------- STREAMING SPREMANJE UPLOADA ----------
+# Chunkovi idu ravno u privremeni file uz inkrementalni sha256; memorija ne raste s veličinom filea.
+# Privremeni file je u podmapi odredišta (isti filesystem), pa je premještanje atomarni os.replace.
+
+CHUNK_SIZE = 1024 * 1024
+INCOMING_DIR = ".incoming"
+
+def _write_chunk(f, hasher, chunk):
+    hasher.update(chunk)
+    f.write(chunk)
+
+async def iter_upload_file(file, chunk_size=CHUNK_SIZE):
+    # FastAPI UploadFile -> async iterator chunkova
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+async def spool_stream(chunks, target_dir):
+    """
+    Zapisuje async iterator chunkova (UploadFile, request.stream()) u privremeni file unutar target_dir.
+    Vraća {"tmp_path", "sha256", "size"}; file se zatim premješta s commit_spooled ili briše s discard_spooled.
+    """
+    incoming = os.path.join(target_dir, INCOMING_DIR)
+    os.makedirs(incoming, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=incoming, suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                # Hash i zapis u threadu – event loop ostaje slobodan i za velike skenove
+                await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+                size += len(chunk)
+    except BaseException:
+        discard_spooled(tmp_path)
+        raise
+    return {"tmp_path": tmp_path, "sha256": hasher.hexdigest(), "size": size}
+
+async def spool_upload(file, target_dir):
+    return await spool_stream(iter_upload_file(file), target_dir)
+
+def commit_spooled(tmp_path, final_path):
+    os.replace(tmp_path, final_path)
+    return final_path
+
+def discard_spooled(tmp_path):
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
@@ -1,6 +1,20 @@
+import os
 import requests
 import xml.etree.ElementTree as ET
 
+from core.utils.circuit_breaker import get_breaker
+from core.utils.rate_limit import TokenBucket
+from core.registry_cache import vies_cache
+
+# (connect, read) timeout u sekundama
+VIES_TIMEOUT = (3.05, 10)
+# VIES odbija (MS_MAX_CONCURRENT_REQ) kad ga se preoptereti – kvota po procesu
+VIES_RATE_LIMIT = float(os.getenv("VIES_RATE_LIMIT", "2"))
+VIES_RATE_BURST = int(os.getenv("VIES_RATE_BURST", "4"))
+
+vies_breaker = get_breaker("vies")
+vies_rate_limiter = TokenBucket(VIES_RATE_LIMIT, VIES_RATE_BURST)
+
 class ViesClient:
     def __init__(self):
         # možeš ostaviti postojeći client ako trebaš
@@ -12,6 +26,23 @@ class ViesClient:
         pass
 
     def call_vies_soap_api(self, country_code: str, vat_number: str) -> dict:
+        # Odgovor (i "nevažeći VAT") se cachira po VAT broju; greške se ne cachiraju
+        def fetch(key):
+            result = self._call_vies_soap_api(country_code, vat_number)
+            if result.get("error"):
+                raise RuntimeError(result["error"])
+            return result["valid"], result
+
+        try:
+            found, result = vies_cache.get(f"{country_code}{vat_number}".upper(), fetch)
+            return result
+        except Exception as e:
+            return {
+                "valid": False,
+                "error": str(e),
+            }
+
+    def _call_vies_soap_api(self, country_code: str, vat_number: str) -> dict:
         xml_payload = f"""<?xml version="1.0" encoding="UTF-8"?>
         <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
                           xmlns:urn="urn:ec.europa.eu:taxud:vies:services:checkVat:types">
@@ -29,9 +60,22 @@ class ViesClient:
             "SOAPAction": "urn:ec.europa.eu:taxud:vies:services:checkVat/checkVat"
         }
 
+        # Dok je VIES nedostupan (circuit open) odmah se vraća neuspjeh, bez čekanja na timeout
+        if not vies_breaker.allow():
+            return {"valid": False, "error": f"VIES nedostupan (circuit open, novi pokušaj za {vies_breaker.retry_in():.0f} s)"}
+
+        vies_rate_limiter.acquire()
         try:
-            response = requests.post("http://ec.europa.eu/taxation_customs/vies/services/checkVatService",
-                                     data=xml_payload, headers=headers, timeout=10)
+            try:
+                response = requests.post("http://ec.europa.eu/taxation_customs/vies/services/checkVatService",
+                                         data=xml_payload, headers=headers, timeout=VIES_TIMEOUT)
+                # SOAP fault za neispravan unos je također 500 – to nije ispad servisa
+                if response.status_code >= 500 and "INVALID_INPUT" not in response.text:
+                    response.raise_for_status()
+            except Exception as e:
+                vies_breaker.record_failure(e)
+                raise
+            vies_breaker.record_success()
             response.raise_for_status()
             root = ET.fromstring(response.content)
             ns = {'ns2': 'urn:ec.europa.eu:taxud:vies:services:checkVat:types'}
@@ -55,3 +99,5 @@ class ViesClient:
                 "valid": False,
                 "error": str(e),
             }
+
+vies_client = ViesClient()
@@ -0,0 +1,132 @@
+"""
+Ingest worker: obrađuje trajni red uploada (ingest_queue) izvan API procesa.
+
+    INGEST_BACKEND=queue uvicorn core.main:app ...      # API samo upisuje u red
+    python -m core.worker --threads 2                   # pokreni N puta, na jednom ili više strojeva
+
+Stavke se preuzimaju sa SELECT ... FOR UPDATE SKIP LOCKED, pa se više workera ne sudara.
+Dok stavka radi, worker produljuje lease (INGEST_VISIBILITY_TIMEOUT); ako worker padne, lease istekne
+i stavku preuzima drugi. Neuspjeli pokušaj ide ponovno u red s odmakom, nakon INGEST_MAX_ATTEMPTS u "dead".
+OCR rezultat se sprema kao checkpoint u retku stavke, pa pokušaj nakon pada (i na drugom stroju) ne radi OCR ispočetka.
+"""
+import os
+import signal
+import socket
+import logging
+import argparse
+import threading
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from core.database.connection import SessionMain, engine_main
+from core.database.models import Base
+from core.ingest import (
+    INGEST_VISIBILITY_TIMEOUT, claim_next, extend_lease, set_stage, complete_item, fail_item,
+)
+from core.routes.upload import run_ingest_item, discard_ingest_item
+from modules.ocr_processing.workers.pool import shutdown_ocr_pool
+
+logger = logging.getLogger("core.worker")
+
+def _heartbeat(queue_id, worker_id, stop):
+    # Produljuje lease dok obrada traje (svaka trećina visibility timeouta)
+    while not stop.wait(INGEST_VISIBILITY_TIMEOUT / 3):
+        db = SessionMain()
+        try:
+            if not extend_lease(db, queue_id, worker_id):
+                logger.warning(f"Stavka {queue_id}: lease izgubljen (preuzeo ju je drugi worker)")
+                return
+        except Exception as e:
+            logger.warning(f"Stavka {queue_id}: heartbeat nije uspio: {e}")
+        finally:
+            db.close()
+
+def process_item(item, worker_id):
+    queue_id = item["queue_id"]
+    checkpoint = item.pop("checkpoint", None)
+    if checkpoint:
+        logger.info(f"Stavka {queue_id} ({item['filename']}): nastavak od OCR checkpointa, pokušaj {item['attempts']}")
+
+    def on_checkpoint(stage, data):
+        db = SessionMain()
+        try:
+            set_stage(db, queue_id, stage, checkpoint=data if stage == "ocr" else None)
+        finally:
+            db.close()
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(queue_id, worker_id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = run_ingest_item(item, checkpoint=checkpoint, on_checkpoint=on_checkpoint, discard_on_failure=False)
+    except Exception as e:
+        result = {"filename": item["filename"], "status": "FAILED", "error": str(e)}
+    finally:
+        stop.set()
+
+    db = SessionMain()
+    try:
+        if result.get("status") == "OK":
+            complete_item(db, queue_id, result)
+            logger.info(f"Stavka {queue_id} ({item['filename']}) obrađena: dokument {result.get('id')}")
+            return
+        status = fail_item(db, queue_id, result.get("error"), result)
+        logger.warning(f"Stavka {queue_id} ({item['filename']}) nije uspjela ({result.get('error')}) -> {status}")
+        if status == "dead":
+            discard_ingest_item(db, item)
+    finally:
+        db.close()
+
+def work_loop(worker_id, poll, stop, once=False):
+    while not stop.is_set():
+        db = SessionMain()
+        try:
+            item = claim_next(db, worker_id, on_dead=lambda dead: discard_ingest_item(db, dead))
+        except Exception as e:
+            logger.error(f"{worker_id}: dohvat iz reda nije uspio: {e}")
+            item = None
+        finally:
+            db.close()
+
+        if item is None:
+            if once:
+                return
+            stop.wait(poll)
+            continue
+        process_item(item, worker_id)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest worker za ingest_queue")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("INGEST_WORKER_THREADS", "1")),
+                        help="broj stavki koje ovaj proces obrađuje istovremeno")
+    parser.add_argument("--poll", type=float, default=2.0, help="pauza (s) kad je red prazan")
+    parser.add_argument("--once", action="store_true", help="isprazni red i izađi")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    Base.metadata.create_all(bind=engine_main)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Stavke u obradi se dovršavaju, nove se ne preuzimaju
+        signal.signal(sig, lambda *_: stop.set())
+
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(target=work_loop, args=(f"{base_id}:{n}", args.poll, stop, args.once), name=f"ingest-{n}")
+        for n in range(max(1, args.threads))
+    ]
+    logger.info(f"Ingest worker {base_id} pokrenut s {len(threads)} niti")
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=1)
+    finally:
+        shutdown_ocr_pool()
+    logger.info(f"Ingest worker {base_id} zaustavljen")
+
+if __name__ == "__main__":
+    main()
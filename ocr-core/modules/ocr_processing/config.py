@@ -0,0 +1,63 @@
+import os
+
+# ---------- OCR POSTAVKE (ENV) ----------
+OCR_LANG = os.environ.get("OCR_LANG", "hrv")
+OCR_TESSERACT_CONFIG = os.environ.get("OCR_TESSERACT_CONFIG", "--oem 1 --psm 6")
+OCR_DPI = int(os.environ.get("OCR_DPI", "300"))
+# Stranica s barem ovoliko znakova u text sloju čita se nativno (bez OCR-a)
+OCR_NATIVE_MIN_CHARS = int(os.environ.get("OCR_NATIVE_MIN_CHARS", "100"))
+# Debug: spremaj renderirane stranice kao {file}_{n}.png (za ručnu provjeru); inače se rasterizira samo u memoriji
+OCR_KEEP_PAGE_IMAGES = os.environ.get("OCR_KEEP_PAGE_IMAGES", "0").lower() in ("1", "true", "yes")
+
+# ---------- ADAPTIVNI DPI ----------
+# Prvi prolaz na DPI-u prema veličini stranice, ponovni OCR na OCR_DPI samo za stranice s niskim conf-om
+OCR_ADAPTIVE_DPI = os.environ.get("OCR_ADAPTIVE_DPI", "0").lower() in ("1", "true", "yes")
+OCR_ADAPTIVE_MIN_DPI = int(os.environ.get("OCR_ADAPTIVE_MIN_DPI", "150"))
+OCR_ADAPTIVE_TARGET_PX = int(os.environ.get("OCR_ADAPTIVE_TARGET_PX", "2400"))
+OCR_CONF_THRESHOLD = float(os.environ.get("OCR_CONF_THRESHOLD", "75"))
+
+# ---------- OCR WORKER POOL ----------
+# Broj OCR procesa; ako nije zadano koriste se sve jezgre. 0 = OCR u procesu pozivatelja (bez poola).
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS") or os.cpu_count() or 1)
+# Niti koje tesseract (OpenMP) smije koristiti po procesu; 1 sprječava oversubscription kad radi više procesa
+OCR_TESSERACT_THREADS = int(os.environ.get("OCR_TESSERACT_THREADS", "1"))
+# "spawn" je siguran i kad roditelj (uvicorn) već ima pokrenute niti
+OCR_POOL_START_METHOD = os.environ.get("OCR_POOL_START_METHOD", "spawn")
+
+# ---------- OCR CACHE (po hashu sadržaja + engine + postavke) ----------
+OCR_CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+OCR_CACHE_DIR = os.environ.get(
+    "OCR_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "uploads", "ocr_cache")),
+)
+OCR_CACHE_MAX_MB = int(os.environ.get("OCR_CACHE_MAX_MB", "512"))
+
+# ---------- KLASIFIKACIJA S PRVIH STRANICA ----------
+# Klasifikacija tipa dokumenta radi na prvih N stranica dok ostatak još ide kroz OCR (0 = čeka cijeli dokument)
+OCR_CLASSIFY_PAGES = int(os.environ.get("OCR_CLASSIFY_PAGES", "1"))
+# Tipovi kod kojih ekstrakcija polja ne gleda dalje od prvih OCR_HEADER_PAGES stranica – ostatak se ne OCR-a
+OCR_HEADER_ONLY_TYPES = {t.strip().upper() for t in os.environ.get("OCR_HEADER_ONLY_TYPES", "").split(",") if t.strip()}
+OCR_HEADER_PAGES = int(os.environ.get("OCR_HEADER_PAGES", "2"))
+
+# ---------- INDEKS PONOVLJENIH STRANICA (perceptualni hash) ----------
+# Slikovna stranica koja je već OCR-ana (opći uvjeti uz svaki račun, boilerplate izvoda) preuzima prethodni rezultat
+OCR_PAGE_HASH_ENABLED = os.environ.get("OCR_PAGE_HASH_ENABLED", "1").lower() in ("1", "true", "yes")
+OCR_PAGE_HASH_DPI = int(os.environ.get("OCR_PAGE_HASH_DPI", "100"))
+OCR_PAGE_HASH_MAX_ENTRIES = int(os.environ.get("OCR_PAGE_HASH_MAX_ENTRIES", "256"))
+# Kandidati: dHash (64 bita) udaljen najviše ovoliko bitova
+OCR_PAGE_HASH_MAX_DISTANCE = int(os.environ.get("OCR_PAGE_HASH_MAX_DISTANCE", "6"))
+# Potvrda: udio različitih "tinta" piksela binariziranog thumbnaila; 0 = identičan thumbnail.
+# Veće vrijednosti hvataju i skenirane kopije, ali riskiraju stranice koje se razlikuju samo u iznosu/broju.
+OCR_PAGE_HASH_MAX_DIFF = float(os.environ.get("OCR_PAGE_HASH_MAX_DIFF", "0"))
+
+# ---------- PREDOBRADA SLIKE PRIJE OCR-a (workers/preprocess.py) ----------
+# Koraci odvojeni zarezom: binarize (Otsu) ili adaptive (lokalni prag), deskew, crop. Prazno = bez predobrade.
+# Po backendu: OCR_PREPROCESS_PYTESSERACT / OCR_PREPROCESS_TESSEROCR imaju prednost pred OCR_PREPROCESS.
+OCR_PREPROCESS = os.environ.get("OCR_PREPROCESS", "")
+OCR_PREPROCESS_STEPS = {
+    backend: [s.strip().lower() for s in os.environ.get(f"OCR_PREPROCESS_{backend.upper()}", OCR_PREPROCESS).split(",") if s.strip()]
+    for backend in ("pytesseract", "tesserocr")
+}
+# Najveći kut (stupnjevi) koji deskew traži i rub (px) koji crop ostavlja oko sadržaja
+OCR_PREPROCESS_MAX_SKEW = float(os.environ.get("OCR_PREPROCESS_MAX_SKEW", "5"))
+OCR_PREPROCESS_MARGIN = int(os.environ.get("OCR_PREPROCESS_MARGIN", "20"))
@@ -7,6 +7,7 @@ from modules.ocr_processing.workers.engine import perform_ocr_and_get_supplier_i
 from core.database.connection import SessionMain
 from core.database.models import Document, Client
 from core.parsers.supplier_extractor import extract_supplier_info
+from core.utils.storage import spool_upload, commit_spooled
 
 router = APIRouter()
 
@@ -26,9 +27,8 @@ async def upload_documents(files: List[UploadFile] = File(...)):
         file_path = os.path.join(UPLOAD_DIR, unique_name)
 
         try:
-            content = await file.read()
-            with open(file_path, "wb") as f:
-                f.write(content)
+            spooled = await spool_upload(file, UPLOAD_DIR)
+            commit_spooled(spooled["tmp_path"], file_path)
         except Exception as e:
             results.append({
                 "filename": file.filename,
@@ -0,0 +1,144 @@
+import os
+import json
+import logging
+import hashlib
+import threading
+
+from modules.ocr_processing.config import (
+    OCR_LANG, OCR_TESSERACT_CONFIG, OCR_DPI, OCR_NATIVE_MIN_CHARS,
+    OCR_ADAPTIVE_DPI, OCR_ADAPTIVE_MIN_DPI, OCR_ADAPTIVE_TARGET_PX, OCR_CONF_THRESHOLD,
+    OCR_CACHE_ENABLED, OCR_CACHE_DIR, OCR_CACHE_MAX_MB,
+    OCR_PREPROCESS_STEPS, OCR_PREPROCESS_MAX_SKEW, OCR_PREPROCESS_MARGIN,
+)
+
+logger = logging.getLogger(__name__)
+
+# Podigni kad se promijeni oblik rezultata (build_ocr_result) – stari zapisi se tada ne čitaju
+CACHE_FORMAT = 3
+
+def file_sha256(file_path):
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def ocr_settings_fingerprint(engine, engine_version):
+    # Sve što mijenja OCR izlaz mora biti u ključu
+    return {
+        "engine": engine,
+        "engine_version": engine_version,
+        "dpi": OCR_DPI,
+        "lang": OCR_LANG,
+        "config": OCR_TESSERACT_CONFIG,
+        "native_min_chars": OCR_NATIVE_MIN_CHARS,
+        "adaptive": [OCR_ADAPTIVE_MIN_DPI, OCR_ADAPTIVE_TARGET_PX, OCR_CONF_THRESHOLD] if OCR_ADAPTIVE_DPI else None,
+        "preprocess": [OCR_PREPROCESS_STEPS, OCR_PREPROCESS_MAX_SKEW, OCR_PREPROCESS_MARGIN],
+        "format": CACHE_FORMAT,
+    }
+
+# ---------- OCR CACHE NA DISKU (content-addressed) ----------
+class OcrCache:
+    """
+    Rezultati OCR-a spremljeni kao JSON, ključ = sha256(hash sadržaja + engine + postavke).
+    Kad ukupna veličina prijeđe max_bytes, brišu se najdulje nekorišteni zapisi (mtime = zadnji pristup).
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # lijeno, prvi put skeniranjem direktorija
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+    def make_key(self, content_hash, settings):
+        raw = json.dumps({"hash": content_hash, **settings}, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)  # LRU: zadnji pristup
+        except FileNotFoundError:
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+        except Exception as e:
+            logger.warning(f"OCR cache: neispravan zapis {path}: {e}")
+            with self._lock:
+                self.counters["misses"] += 1
+                self.counters["errors"] += 1
+            return None
+        with self._lock:
+            self.counters["hits"] += 1
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logger.warning(f"OCR cache: spremanje nije uspjelo za {key}: {e}")
+            with self._lock:
+                self.counters["errors"] += 1
+            return
+        with self._lock:
+            self.counters["stores"] += 1
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Briši najstarije dok ne padnemo na 90% limita (da ne evictamo na svakom putu)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in sorted(self._entries(), key=lambda e: e[2]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+            self.counters["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+ocr_cache = OcrCache(OCR_CACHE_DIR, OCR_CACHE_MAX_MB * 1024 * 1024) if OCR_CACHE_ENABLED else None
@@ -1,121 +1,424 @@
 import os
-import pytesseract
-from PIL import Image
+import copy
+import asyncio
+import logging
+from functools import lru_cache, partial
+
 import fitz  # PyMuPDF
+import pytesseract
+
+from modules.ocr_processing.workers.page_ocr import ocr_pdf_page, ocr_image_file
+from modules.ocr_processing.workers.pool import run_ocr_jobs, iter_ocr_jobs
+from modules.ocr_processing.workers.cache import ocr_cache, file_sha256, ocr_settings_fingerprint
+from modules.ocr_processing.workers.result import build_ocr_result
+from modules.ocr_processing.workers.layout import empty_words
+from modules.ocr_processing.workers.page_index import page_index, page_fingerprint, fingerprints_match
+from modules.ocr_processing.workers.engine_tesserocr import engine_version as tesserocr_engine_version
+from modules.ocr_processing.workers.engine_azure import (
+    AZURE_API_VERSION, perform_ocr_azure_result, perform_ocr_azure_batch, perform_ocr_azure_async,
+)
+from modules.ocr_processing.config import OCR_NATIVE_MIN_CHARS, OCR_DPI
+
+logger = logging.getLogger(__name__)
 
 # ---------- PRO NATIVE: PDF blokovi sa x/y (layout aware!) ----------
-def extract_text_blocks_from_pdf_native(pdf_path):
+def extract_page_lines_native(page):
     """
-    Vraća linije sortirane po Y, pa X, iz tekstualnih blokova PDF-a (PyMuPDF).
+    Linije jedne PDF stranice iz text sloja, sortirane po Y pa X.
     Svaki blok: (y, x, text)
     """
-    doc = fitz.open(pdf_path)
     lines = []
-    for page in doc:
-        blocks = page.get_text("blocks")  # svaki blok: (x0, y0, x1, y1, "text", ...)
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            for line in text.splitlines():
-                l = line.strip()
-                if l:
-                    lines.append((y0, x0, l))
+    blocks = page.get_text("blocks")  # svaki blok: (x0, y0, x1, y1, "text", ...)
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        for line in text.splitlines():
+            l = line.strip()
+            if l:
+                lines.append((y0, x0, l))
     # Sortiraj linije po Y, onda po X
-    sorted_lines = [l for _, _, l in sorted(lines, key=lambda t: (t[0], t[1]))]
+    return [l for _, _, l in sorted(lines, key=lambda t: (t[0], t[1]))]
+
+def extract_page_words_native(page):
+    """
+    Geometrija riječi iz text sloja (workers/layout.py); conf = -1 (nije OCR).
+    """
+    words = empty_words()
+    line_ids = {}
+    for x0, y0, x1, y1, word, block_no, line_no, _ in page.get_text("words"):
+        words["text"].append(word)
+        words["boxes"].append([round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2)])
+        words["conf"].append(-1)
+        words["line"].append(line_ids.setdefault((block_no, line_no), len(line_ids)))
+    return words
+
+def extract_text_blocks_from_pdf_native(pdf_path):
+    """
+    Vraća linije iz tekstualnih blokova PDF-a (PyMuPDF), stranicu po stranicu,
+    unutar stranice sortirane po Y, pa X.
+    """
+    with fitz.open(pdf_path) as doc:
+        sorted_lines = [l for page in doc for l in extract_page_lines_native(page)]
     return "\n".join(sorted_lines), sorted_lines
 
-# ---------- FALLBACK: OCR LAYOUT-AWARE (sort po Y pa X) ----------
-def perform_ocr_default(file_path, return_lines=False):
+def _has_text_layer(page, lines):
+    # Stranica ide nativno ako ima dovoljno teksta, ili ako ima tekst a nema slika (generirani PDF)
+    chars = sum(len(l) for l in lines)
+    if chars >= OCR_NATIVE_MIN_CHARS:
+        return True
+    return bool(lines) and not page.get_images()
+
+# ---------- HIBRID: native po stranici, OCR samo za slikovne stranice ----------
+def _plan_image_page(page, file_path, backend, jobs, planned):
+    """
+    Slikovna stranica: ako je ista stranica već OCR-ana (indeks perceptualnih hasheva) preuzima se
+    njen rezultat, ako se ponavlja unutar istog filea/batcha čeka OCR prve kopije ("same_as"),
+    a inače se planira OCR posao.
+    """
+    planned_page = {"page": page.number, "source": "ocr", "lines": None}
+    if page_index is not None:
+        fingerprint = page_fingerprint(page)
+        reused = page_index.lookup(fingerprint, backend)
+        if reused is not None:
+            return {**reused, "page": page.number, "reused": True}
+        for other_fingerprint, other_page in planned:
+            if fingerprints_match(fingerprint, other_fingerprint):
+                page_index.count_in_file_duplicate()
+                planned_page["same_as"] = other_page
+                return planned_page
+        planned_page["page_hash"] = (fingerprint, backend)
+        planned.append((fingerprint, planned_page))
+    jobs.append((ocr_pdf_page, file_path, page.number, OCR_DPI, backend))
+    return planned_page
+
+def _fill_ocr_page(page, ocr_results):
+    # OCR rezultati ({"lines", "conf", "dpi", ...}) dolaze redom kojim su poslovi planirani (= redom stranica)
+    if "same_as" in page:
+        source = page.pop("same_as")
+        page.update({**copy.deepcopy(source), "page": page["page"], "reused": True})
+    elif page["lines"] is None:
+        page.update(next(ocr_results))
+        page_hash = page.pop("page_hash", None)
+        if page_hash is not None:
+            page_index.add(*page_hash, page)
+    return page
+
+def _plan_ocr(file_path, backend="pytesseract", max_pages=None, planned=None):
+    """
+    Jedan fitz.open po fileu: stranice s text slojem čitaju se nativno odmah,
+    a za slikovne stranice (skenovi) planira se OCR posao.
+    Vraća (stranice, poslovi); stranica s lines=None čeka rezultat OCR posla.
+    max_pages: planiraju se samo prve stranice (header mod).
+    planned: zajednička lista za batch, da se ponovljene stranice prepoznaju i preko fileova.
+    """
+    planned = [] if planned is None else planned
+    if not file_path.lower().endswith(".pdf"):
+        return [{"page": 0, "source": "ocr", "lines": None}], [(ocr_image_file, file_path, backend)]
+
+    pages = []
+    jobs = []
+    with fitz.open(file_path) as doc:
+        for page in doc:
+            if max_pages is not None and page.number >= max_pages:
+                break
+            lines = extract_page_lines_native(page)
+            if _has_text_layer(page, lines):
+                pages.append({
+                    "page": page.number,
+                    "source": "native",
+                    "lines": lines,
+                    "words": extract_page_words_native(page),
+                    "width": page.rect.width,
+                    "height": page.rect.height,
+                })
+            else:
+                pages.append(_plan_image_page(page, file_path, backend, jobs, planned))
+    return pages, jobs
+
+def _fill_ocr_pages(pages, ocr_results):
+    ocr_results = iter(ocr_results)
+    return [_fill_ocr_page(page, ocr_results) for page in pages]
+
+def _format_result(result, return_lines=False, return_result=False):
+    if return_result:
+        return result
+    return (result["text"], result["lines"]) if return_lines else result["text"]
+
+def perform_ocr_default(file_path, return_lines=False, return_result=False, backend="pytesseract"):
     """
     OCR s layoutom: vraća tekst i linije strogo sortirane po Y, a unutar linije po X (vizualni redoslijed, blokovi).
+    Odluka native/OCR je po stranici: stranice s text slojem čitaju se iz PDF-a, samo slikovne idu u tesseract,
+    paralelno u OCR poolu (workers/pool.py); linije se slažu po redu stranica.
+    Ponovljene slikovne stranice (isti perceptualni otisak) ne OCR-aju se ponovno (workers/page_index.py).
     Ako return_lines=True, vraća tuple (plain_text, lista_linija).
-    PNG-ovi se NE brišu automatski (za ručnu provjeru).
+    Ako return_result=True, vraća cijeli rezultat s izvorom svake stranice (vidi build_ocr_result).
+    Stranice se rasteriziraju u memoriji; PNG-ovi na disku samo uz OCR_KEEP_PAGE_IMAGES=1 (za ručnu provjeru).
+    backend: "pytesseract" ili "tesserocr" (vidi registar OCR_ENGINES).
     """
-    temp_images_paths = []
-    all_lines = []
+    pages, jobs = _plan_ocr(file_path, backend)
+    result = build_ocr_result(_fill_ocr_pages(pages, run_ocr_jobs(jobs)))
+    return _format_result(result, return_lines, return_result)
 
-    if file_path.lower().endswith(".pdf"):
-        # === PRO NATIVE: PDF blokovi sa x/y
-        text_native, lines_native = extract_text_blocks_from_pdf_native(file_path)
-        # Ako je dobar output (ima dovoljno teksta), koristi to!
-        if text_native and len(text_native) > 100 and len(lines_native) > 3:
-            return (text_native, lines_native) if return_lines else text_native
+class OcrPageIterator:
+    """
+    Stranice jedna po jedna, redom, čim je pojedina gotova.
+    Native stranice dolaze odmah, a OCR svih slikovnih stranica kreće u poolu već pri prvom next()
+    (ili pending_ocr), pa ostatak dokumenta radi dok pozivatelj obrađuje prve stranice.
+    close() otkazuje OCR stranica koje još nisu počele.
+    """
 
-        # Ako nema text sloja ili premalo teksta, fallback na OCR PNG-ove...
-        images = []
-        doc = fitz.open(file_path)
-        for page in doc:
-            pix = page.get_pixmap(dpi=300)
-            img_path = f"{file_path}_{page.number}.png"
-            pix.save(img_path)
-            temp_images_paths.append(img_path)
-            images.append(Image.open(img_path))
-    else:
-        images = [Image.open(file_path)]
-
-    for img in images:
-        ocr_data = pytesseract.image_to_data(
-            img, lang="hrv", config="--oem 1 --psm 6", output_type=pytesseract.Output.DICT
-        )
-        n = len(ocr_data['text'])
-        # Mapiranje: (block, par, line, top) -> [(left, word)]
-        lines_by_line_num = {}
-
-        for i in range(n):
-            word = ocr_data['text'][i]
-            conf = ocr_data['conf'][i]
-            block_num = ocr_data['block_num'][i]
-            par_num = ocr_data['par_num'][i]
-            line_num = ocr_data['line_num'][i]
-            top = ocr_data['top'][i]
-            left = ocr_data['left'][i]
-            if word and word.strip() and str(conf).isdigit() and int(conf) > 10:
-                key = (block_num, par_num, line_num, top)
-                if key not in lines_by_line_num:
-                    lines_by_line_num[key] = []
-                lines_by_line_num[key].append((left, word))
-        
-        # Sortiraj linije po Y (top), blok, par, linija
-        sorted_keys = sorted(lines_by_line_num.keys(), key=lambda k: (k[3], k[0], k[1], k[2]))
-        for key in sorted_keys:
-            # Unutar linije, sort po X (left)
-            words = [w for _, w in sorted(lines_by_line_num[key], key=lambda t: t[0])]
-            line = " ".join(words).strip()
-            if line:
-                all_lines.append(line)
-
-    # PNG cleanup DISABLED! (ostaju za ručnu provjeru)
-    # for temp_img_path in temp_images_paths:
-    #     if os.path.exists(temp_img_path):
-    #         os.remove(temp_img_path)
-
-    final_lines = []
-    for l in all_lines:
-        l = l.strip()
-        if l and (not final_lines or l != final_lines[-1]):
-            final_lines.append(l)
-    plain_text = "\n".join(final_lines)
-
-    return (plain_text, final_lines) if return_lines else plain_text
+    def __init__(self, file_path, backend="pytesseract", max_pages=None):
+        self._args = (file_path, backend, max_pages)
+        self._pages = None
+        self._ocr_results = None
+        self._next = 0
+
+    def _start(self):
+        if self._pages is None:
+            self._pages, jobs = _plan_ocr(*self._args)
+            self._ocr_results = iter_ocr_jobs(jobs)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._start()
+        if self._next >= len(self._pages):
+            self.close()
+            raise StopIteration
+        page = _fill_ocr_page(self._pages[self._next], self._ocr_results)
+        self._next += 1
+        return page
+
+    @property
+    def pending_ocr(self):
+        # Ima li među još nepročitanim stranicama onih koje čekaju OCR
+        self._start()
+        return any(page["lines"] is None for page in self._pages[self._next:])
+
+    def close(self):
+        if self._ocr_results is not None:
+            self._ocr_results.close()
+
+def iter_ocr_pages_default(file_path, backend="pytesseract", max_pages=None):
+    return OcrPageIterator(file_path, backend, max_pages)
+
+def perform_ocr_default_batch(file_paths, return_lines=False, return_result=False, backend="pytesseract"):
+    """
+    Kao perform_ocr_default, ali za više fileova odjednom: slikovne stranice SVIH fileova idu
+    u pool zajedno, pa i kratki fileovi iz batcha rade paralelno. Rezultati su istim redoslijedom kao file_paths.
+    """
+    planned = []
+    plans = [_plan_ocr(fp, backend, planned=planned) for fp in file_paths]
+    all_jobs = [job for _, jobs in plans for job in jobs]
+    job_results = iter(run_ocr_jobs(all_jobs))
+
+    results = []
+    for pages, jobs in plans:
+        result = build_ocr_result(_fill_ocr_pages(pages, [next(job_results) for _ in jobs]))
+        results.append(_format_result(result, return_lines, return_result))
+    return results
+
+# ---------- REGISTAR OCR ENGINEA ----------
+OCR_ENGINES = {}
+
+def _iter_pages_from_run(run, file_path, max_pages=None):
+    # Engine bez streaminga (npr. azure): stranice tek nakon cijelog dokumenta
+    yield from run(file_path)["pages"][:max_pages]
+
+def register_engine(name, run, run_batch=None, run_async=None, iter_pages=None, version=None):
+    """
+    Registrira OCR engine pod imenom; svi vraćaju zajednički rezultat (workers/result.py).
+    run(file_path) -> rezultat
+    run_batch(file_paths) -> rezultati istim redoslijedom (opcionalno, inače run za svaki file)
+    run_async(file_path) -> coroutine s rezultatom (opcionalno, za udaljene engine-e)
+    iter_pages(file_path, max_pages) -> generator stranica (opcionalno, inače stranice iz run)
+    version() -> verzija engina, ulazi u ključ OCR cachea
+    """
+    OCR_ENGINES[name] = {
+        "run": run,
+        "run_batch": run_batch or (lambda file_paths: [run(fp) for fp in file_paths]),
+        "run_async": run_async,
+        "iter_pages": iter_pages or partial(_iter_pages_from_run, run),
+        "version": lru_cache(maxsize=None)(version or (lambda: "unknown")),
+    }
+
+def get_engine(engine=None):
+    if engine is None:
+        engine = os.environ.get("OCR_ENGINE", "default")
+    if engine not in OCR_ENGINES:
+        logger.warning(f"Nepoznat OCR engine '{engine}', koristim 'default'")
+        engine = "default"
+    return engine, OCR_ENGINES[engine]
+
+def _pytesseract_version():
+    return str(pytesseract.get_tesseract_version())
+
+register_engine(
+    "default",  # tesseract proces po stranici
+    run=partial(perform_ocr_default, return_result=True),
+    run_batch=partial(perform_ocr_default_batch, return_result=True),
+    iter_pages=iter_ocr_pages_default,
+    version=_pytesseract_version,
+)
+register_engine(
+    "tesserocr",  # jedan trajni tesseract API po worker procesu (pip install tesserocr)
+    run=partial(perform_ocr_default, return_result=True, backend="tesserocr"),
+    run_batch=partial(perform_ocr_default_batch, return_result=True, backend="tesserocr"),
+    iter_pages=partial(iter_ocr_pages_default, backend="tesserocr"),
+    version=tesserocr_engine_version,
+)
+register_engine(
+    "azure",  # Azure Read API, async s ograničenim brojem istovremenih zahtjeva
+    run=perform_ocr_azure_result,
+    run_batch=perform_ocr_azure_batch,
+    run_async=perform_ocr_azure_async,
+    version=lambda: f"azure-read-{AZURE_API_VERSION}",
+)
+
+def _cache_key(engine, entry, file_hash):
+    try:
+        version = entry["version"]()
+    except Exception:
+        version = "unknown"
+    return ocr_cache.make_key(file_hash, ocr_settings_fingerprint(engine, version))
 
 # ---------- MODULAR ENGINE WRAPPER ----------
-def perform_ocr(file_path, engine=None, return_lines=False):
+def perform_ocr(file_path, engine=None, return_lines=False, return_result=False, file_hash=None):
     """
-    Plug&Play wrapper: biraj OCR engine ("default", ...)
+    Plug&Play wrapper: biraj OCR engine iz registra ("default", "tesserocr", "azure")
     engine: string ili None (ako None, čita iz ENV var OCR_ENGINE)
     Ako return_lines=True, svi enginei vraćaju tuple (plain_text, lines)
+    Ako return_result=True, vraća dict s tekstom, linijama i stranicama (izvor po stranici)
+    Rezultat se čita iz / sprema u OCR cache (workers/cache.py); file_hash (sha256) se
+    može proslijediti ako ga pozivatelj već ima, inače se računa iz filea.
     """
-    if engine is None:
-        engine = os.environ.get("OCR_ENGINE", "default")
+    engine, entry = get_engine(engine)
+
+    if ocr_cache is None:
+        return _format_result(entry["run"](file_path), return_lines, return_result)
+
+    key = _cache_key(engine, entry, file_hash or file_sha256(file_path))
+    result = ocr_cache.get(key)
+    if result is None:
+        result = entry["run"](file_path)
+        ocr_cache.put(key, result)
+    return _format_result(result, return_lines, return_result)
+
+async def perform_ocr_async(file_path, engine=None, return_lines=False, return_result=False, file_hash=None):
+    """
+    Async varijanta perform_ocr. Engine s run_async (npr. azure) se čeka bez blokiranja niti,
+    lokalni enginei rade u threadu (a stranice ionako u OCR poolu).
+    """
+    engine, entry = get_engine(engine)
+    if entry["run_async"] is None:
+        return await asyncio.to_thread(perform_ocr, file_path, engine, return_lines, return_result, file_hash)
 
-    # Samo jedan engine, fallback uvijek radi na perform_ocr_default
-    return perform_ocr_default(file_path, return_lines=return_lines)
+    key = None
+    if ocr_cache is not None:
+        key = _cache_key(engine, entry, file_hash or await asyncio.to_thread(file_sha256, file_path))
+        result = await asyncio.to_thread(ocr_cache.get, key)
+        if result is not None:
+            return _format_result(result, return_lines, return_result)
+    result = await entry["run_async"](file_path)
+    if key is not None:
+        await asyncio.to_thread(ocr_cache.put, key, result)
+    return _format_result(result, return_lines, return_result)
+
+def perform_ocr_batch(file_paths, engine=None, return_lines=False, return_result=False):
+    """
+    Batch varijanta perform_ocr: lista fileova -> lista rezultata (isti redoslijed).
+    Iz cachea se uzima što postoji, ostatak ide zajedno u engine (lokalno: OCR pool).
+    """
+    engine, entry = get_engine(engine)
+
+    if ocr_cache is None:
+        return [_format_result(r, return_lines, return_result) for r in entry["run_batch"](file_paths)]
+
+    keys = [_cache_key(engine, entry, file_sha256(fp)) for fp in file_paths]
+    results = [ocr_cache.get(key) for key in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    computed = entry["run_batch"]([file_paths[i] for i in missing]) if missing else []
+    for i, result in zip(missing, computed):
+        ocr_cache.put(keys[i], result)
+        results[i] = result
+    return [_format_result(r, return_lines, return_result) for r in results]
+
+# ---------- LIJENI OCR PO STRANICAMA ----------
+class OcrPageStream:
+    """
+    OCR dokumenta kao tok stranica: klasifikacija može krenuti s prvom stranicom (header_text)
+    dok ostale stranice još rade u OCR poolu; result() zatim pričeka ostatak.
+    result(max_pages=n) je "header" mod: ostatak dokumenta se ne OCR-a (otkazuje se).
+    Cijeli rezultat čita se iz / sprema u OCR cache kao i kod perform_ocr; djelomični se ne sprema.
+
+        with OcrPageStream(file_path, file_hash=file_hash) as stream:
+            header = stream.header_text(1)
+            ...
+            result = stream.result()
+    """
+
+    def __init__(self, file_path, engine=None, file_hash=None):
+        self.file_path = file_path
+        self.engine, entry = get_engine(engine)
+        self.pages = []
+        self._key = None
+        cached = None
+        if ocr_cache is not None:
+            self._key = _cache_key(self.engine, entry, file_hash or file_sha256(file_path))
+            cached = ocr_cache.get(self._key)
+        self.from_cache = cached is not None
+        self._source = iter(cached["pages"]) if cached is not None else entry["iter_pages"](file_path)
+        self._exhausted = False
+
+    def _read_until(self, n=None):
+        while not self._exhausted and (n is None or len(self.pages) < n):
+            try:
+                self.pages.append(next(self._source))
+            except StopIteration:
+                self._exhausted = True
+        return self.pages[:n]
+
+    def header_pages(self, n=1):
+        return self._read_until(n)
+
+    def header_text(self, n=1):
+        return build_ocr_result(self.header_pages(n))["text"]
+
+    def has_pending_ocr(self):
+        """
+        True ako ostatak dokumenta još čeka OCR (ima latencije koju vrijedi preklopiti).
+        Native PDF, rezultat iz cachea ili engine bez streaminga -> False.
+        """
+        return not self._exhausted and bool(getattr(self._source, "pending_ocr", False))
+
+    def result(self, max_pages=None):
+        if max_pages is not None:
+            pages = self._read_until(max_pages)
+            if not self._exhausted:
+                self.close()
+                result = build_ocr_result(pages)
+                result["partial"] = True
+                return result
+        result = build_ocr_result(self._read_until())
+        if self._key is not None and not self.from_cache:
+            ocr_cache.put(self._key, result)
+        return result
+
+    def close(self):
+        if hasattr(self._source, "close"):
+            self._source.close()
+        self._exhausted = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 # ---------- BACKWARD-COMPATIBLE EKSTRAKCIJE ----------
-from modules.sudreg_api.client import SudregClient
+from modules.sudreg_api.client import sudreg_client
 from core.utils.regex_common import extract_oib, extract_invoice_date, extract_dates
 
-sudreg_client = SudregClient()
-
 def extract_oib(text: str) -> str | None:
     return extract_oib(text)
 
@@ -1,39 +1,140 @@
-import requests
-import time
-import os
-
-AZURE_ENDPOINT = os.environ.get("AZURE_CV_ENDPOINT", "https://spineic-computervision.cognitiveservices.azure.com/")
-AZURE_KEY = os.environ.get("AZURE_CV_KEY", "7svcs81aWHrol4erH2IKDXhWKRbBQKbp2H6RpFbX0sTeUisljqUbJQQJ99BGAC5RqLJXJ3w3AAAFACOGGj40")
-
-def perform_ocr_azure(file_path, language="hr"):
-    analyze_url = f"{AZURE_ENDPOINT.rstrip('/')}/vision/v3.2/read/analyze"
-    headers = {
-        "Ocp-Apim-Subscription-Key": AZURE_KEY,
-        "Content-Type": "application/octet-stream"
-    }
-    params = {
-        "language": language,
-        "readingOrder": "natural"
-    }
-    with open(file_path, "rb") as f:
-        data = f.read()
-    response = requests.post(analyze_url, headers=headers, params=params, data=data)
-    response.raise_for_status()
-
-    operation_url = response.headers["Operation-Location"]
-    # Poll for result
-    for _ in range(30):  # max 30 sec
-        result = requests.get(operation_url, headers={"Ocp-Apim-Subscription-Key": AZURE_KEY})
-        result.raise_for_status()
-        res_json = result.json()
-        status = res_json["status"]
-        if status == "succeeded":
-            lines = []
-            for page in res_json["analyzeResult"]["readResults"]:
-                for line in page["lines"]:
-                    lines.append(line["text"])
-            return "\n".join(lines)
-        elif status == "failed":
-            raise Exception("Azure OCR failed")
-        time.sleep(1)
-    raise TimeoutError("Azure OCR operation timed out")
+import os
+import asyncio
+import random
+import logging
+
+import httpx
+
+from modules.ocr_processing.workers.result import build_ocr_result
+from modules.ocr_processing.workers.layout import empty_words
+from core.utils.async_loop import run_sync, run_async, on_shutdown
+
+logger = logging.getLogger(__name__)
+
+AZURE_ENDPOINT = os.environ.get("AZURE_CV_ENDPOINT", "https://spineic-computervision.cognitiveservices.azure.com/")
+AZURE_KEY = os.environ.get("AZURE_CV_KEY", "7svcs81aWHrol4erH2IKDXhWKRbBQKbp2H6RpFbX0sTeUisljqUbJQQJ99BGAC5RqLJXJ3w3AAAFACOGGj40")
+AZURE_API_VERSION = "v3.2"
+# Najviše istovremenih Read operacija prema Azureu (po engineu)
+AZURE_MAX_IN_FLIGHT = int(os.environ.get("AZURE_OCR_MAX_IN_FLIGHT", "4"))
+# Polling: prvi razmak, gornja granica (eksponencijalni backoff s jitterom) i ukupni timeout u sekundama
+AZURE_POLL_INITIAL = float(os.environ.get("AZURE_OCR_POLL_INITIAL", "0.5"))
+AZURE_POLL_MAX = float(os.environ.get("AZURE_OCR_POLL_MAX", "5"))
+AZURE_TIMEOUT = float(os.environ.get("AZURE_OCR_TIMEOUT", "60"))
+
+def _page_from_read_result(read_result):
+    # Azure za PDF vraća inče, za slike piksele; layout je u PDF točkama (kao native/tesseract)
+    scale = 72 if read_result.get("unit") == "inch" else 1
+    lines = []
+    words = empty_words()
+    for line_id, line in enumerate(read_result.get("lines", [])):
+        lines.append(line["text"])
+        for word in line.get("words", []):
+            bbox = word.get("boundingBox") or [0] * 8
+            xs, ys = bbox[0::2], bbox[1::2]
+            words["text"].append(word["text"])
+            words["boxes"].append([round(v * scale, 2) for v in (min(xs), min(ys), max(xs), max(ys))])
+            words["conf"].append(int(round(100 * word.get("confidence", 0))))
+            words["line"].append(line_id)
+    return {
+        "page": read_result.get("page", 1) - 1,
+        "source": "azure",
+        "lines": lines,
+        "conf": round(sum(words["conf"]) / len(words["conf"]), 2) if words["conf"] else None,
+        "words": words,
+        "width": (read_result.get("width") or 0) * scale,
+        "height": (read_result.get("height") or 0) * scale,
+    }
+
+def _read_file(file_path):
+    with open(file_path, "rb") as f:
+        return f.read()
+
+# ---------- AZURE READ API ENGINE ----------
+class AzureReadEngine:
+    """
+    Async klijent za Azure Read API (POST analyze -> Operation-Location -> polling).
+    Jedan pooled httpx klijent (keep-alive), najviše max_in_flight operacija istovremeno,
+    polling s eksponencijalnim backoffom i jitterom.
+    """
+
+    def __init__(self, endpoint=AZURE_ENDPOINT, key=AZURE_KEY, max_in_flight=AZURE_MAX_IN_FLIGHT,
+                 poll_initial=AZURE_POLL_INITIAL, poll_max=AZURE_POLL_MAX, timeout=AZURE_TIMEOUT):
+        self.endpoint = endpoint.rstrip("/")
+        self.key = key
+        self.max_in_flight = max_in_flight
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.timeout = timeout
+        self._client = None
+        self._semaphore = None
+
+    def _ensure_client(self):
+        # Kreira se na loopu na kojem će se koristiti (zajednički loop, core/utils/async_loop.py)
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Ocp-Apim-Subscription-Key": self.key},
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_connections=self.max_in_flight * 2, max_keepalive_connections=self.max_in_flight),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def analyze(self, file_path, language="hr"):
+        """
+        OCR jednog filea -> zajednički rezultat (build_ocr_result), izvor stranica "azure".
+        """
+        self._ensure_client()
+        # Čitanje filea u threadu – loop dijele svi Azure i model server pozivi
+        data = await asyncio.to_thread(_read_file, file_path)
+
+        async with self._semaphore:
+            response = await self._client.post(
+                f"{self.endpoint}/vision/{AZURE_API_VERSION}/read/analyze",
+                params={"language": language, "readingOrder": "natural"},
+                headers={"Content-Type": "application/octet-stream"},
+                content=data,
+            )
+            response.raise_for_status()
+            operation_url = response.headers["Operation-Location"]
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            delay = self.poll_initial
+            while loop.time() < deadline:
+                # "equal jitter": pola razmaka fiksno, pola slučajno – pollovi se ne sinkroniziraju
+                await asyncio.sleep(delay / 2 + random.uniform(0, delay / 2))
+                result = await self._client.get(operation_url)
+                result.raise_for_status()
+                res_json = result.json()
+                status = res_json["status"]
+                if status == "succeeded":
+                    pages = [_page_from_read_result(r) for r in res_json["analyzeResult"]["readResults"]]
+                    return build_ocr_result(pages)
+                elif status == "failed":
+                    raise Exception("Azure OCR failed")
+                delay = min(delay * 2, self.poll_max)
+        raise TimeoutError("Azure OCR operation timed out")
+
+    async def analyze_many(self, file_paths, language="hr"):
+        # Redoslijed rezultata = redoslijed fileova; semafor ograničava istovremene operacije
+        return await asyncio.gather(*(self.analyze(fp, language) for fp in file_paths))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+azure_engine = AzureReadEngine()
+on_shutdown(azure_engine.aclose)
+
+def perform_ocr_azure_result(file_path, language="hr"):
+    return run_sync(azure_engine.analyze(file_path, language))
+
+def perform_ocr_azure_batch(file_paths, language="hr"):
+    return run_sync(azure_engine.analyze_many(file_paths, language))
+
+async def perform_ocr_azure_async(file_path, language="hr"):
+    return await run_async(azure_engine.analyze(file_path, language))
+
+def perform_ocr_azure(file_path, language="hr"):
+    # Backward kompatibilnost: samo plain tekst
+    return perform_ocr_azure_result(file_path, language)["text"]
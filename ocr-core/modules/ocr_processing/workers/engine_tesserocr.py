@@ -0,0 +1,76 @@
+import re
+import atexit
+import threading
+
+try:
+    import tesserocr
+    from tesserocr import PyTessBaseAPI, RIL, iterate_level
+except ImportError:  # opcionalni engine – pip install tesserocr
+    tesserocr = None
+
+from modules.ocr_processing.config import OCR_LANG, OCR_TESSERACT_CONFIG
+
+# Jedan inicijalizirani tesseract API po procesu (OCR worker): hrv traineddata se učitava jednom,
+# bez novog tesseract procesa i temp fileova po stranici.
+_api = None
+_api_lock = threading.Lock()
+
+def _config_int(flag, default):
+    match = re.search(rf"--{flag}\s+(\d+)", OCR_TESSERACT_CONFIG)
+    return int(match.group(1)) if match else default
+
+def engine_version():
+    return tesserocr.tesseract_version().splitlines()[0] if tesserocr else "unavailable"
+
+def _get_api():
+    global _api
+    if tesserocr is None:
+        raise RuntimeError("OCR engine 'tesserocr' nije dostupan (pip install tesserocr)")
+    if _api is None:
+        _api = PyTessBaseAPI(lang=OCR_LANG, psm=_config_int("psm", 6), oem=_config_int("oem", 1))
+        atexit.register(_api.End)
+    return _api
+
+def image_to_data(img):
+    """
+    Isti oblik kao pytesseract.image_to_data(..., output_type=DICT) za razinu riječi:
+    text, conf, block_num, par_num, line_num, left, top, width, height.
+    """
+    data = {k: [] for k in ("text", "conf", "block_num", "par_num", "line_num", "left", "top", "width", "height")}
+    with _api_lock:
+        api = _get_api()
+        api.SetImage(img)
+        try:
+            api.Recognize()
+            iterator = api.GetIterator()
+            if iterator is not None:
+                _collect_words(iterator, data)
+        finally:
+            # Slika i rezultat se otpuštaju i kad stranica nema riječi ili OCR pukne
+            api.Clear()
+    return data
+
+def _collect_words(iterator, data):
+    block_num = par_num = line_num = 0
+    for word in iterate_level(iterator, RIL.WORD):
+        if word.IsAtBeginningOf(RIL.BLOCK):
+            block_num += 1
+            par_num = line_num = 0
+        if word.IsAtBeginningOf(RIL.PARA):
+            par_num += 1
+            line_num = 0
+        if word.IsAtBeginningOf(RIL.TEXTLINE):
+            line_num += 1
+        bbox = word.BoundingBox(RIL.WORD)
+        if bbox is None:
+            continue
+        x0, y0, x1, y1 = bbox
+        data["text"].append(word.GetUTF8Text(RIL.WORD) or "")
+        data["conf"].append(int(word.Confidence(RIL.WORD)))
+        data["block_num"].append(block_num)
+        data["par_num"].append(par_num)
+        data["line_num"].append(line_num)
+        data["left"].append(x0)
+        data["top"].append(y0)
+        data["width"].append(x1 - x0)
+        data["height"].append(y1 - y0)
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+
+# ---------- LAYOUT: geometrija riječi po stranicama (NumPy stupci) ----------
+# Stranica u OCR rezultatu ima "words": {"text": [str], "boxes": [[x0, y0, x1, y1]], "conf": [int], "line": [int]}
+# te "width"/"height". Koordinate su u PDF točkama (1/72 inča), za slike u pikselima.
+# conf: 0-100 za OCR, -1 za riječi iz text sloja PDF-a.
+
+LAYOUT_SUFFIX = ".layout.npz"
+PAGE_SOURCES = ["native", "ocr", "azure"]
+
+def empty_words():
+    return {"text": [], "boxes": [], "conf": [], "line": []}
+
+def layout_path_for(file_path):
+    # uploads/123.pdf -> uploads/123.layout.npz
+    return f"{os.path.splitext(file_path)[0]}{LAYOUT_SUFFIX}"
+
+def save_layout(result, path):
+    """
+    Sprema geometriju riječi iz OCR rezultata u komprimirani .npz (bez picklea).
+    Riječi svih stranica su spojene u stupce; page_offsets[n]:page_offsets[n+1] je stranica n.
+    Tekst riječi je jedan UTF-8 blob + offseti.
+    """
+    pages = result.get("pages", [])
+    texts, boxes, confs, lines, page_offsets = [], [], [], [], [0]
+    for page in pages:
+        words = page.get("words") or empty_words()
+        texts.extend(words["text"])
+        boxes.extend(words["boxes"])
+        confs.extend(words["conf"])
+        lines.extend(words["line"])
+        page_offsets.append(len(texts))
+
+    encoded = [t.encode("utf-8") for t in texts]
+    text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        text_offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        page_offsets=np.asarray(page_offsets, dtype=np.int64),
+        page_size=np.asarray([[p.get("width") or 0, p.get("height") or 0] for p in pages], dtype=np.float32).reshape(-1, 2),
+        page_source=np.asarray([PAGE_SOURCES.index(p["source"]) if p.get("source") in PAGE_SOURCES else -1 for p in pages], dtype=np.int8),
+        boxes=np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+        conf=np.asarray(confs, dtype=np.int16),
+        line=np.asarray(lines, dtype=np.int32),
+        text_blob=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        text_offsets=text_offsets,
+    )
+    os.replace(tmp_path, path)
+    return path
+
+class LayoutResult:
+    """
+    Lijeno učitan layout dokumenta: .npz se otvara odmah, a stupci se čitaju tek pri pristupu.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        self._cache = {}
+
+    def _array(self, name):
+        if name not in self._cache:
+            self._cache[name] = self._npz[name]
+        return self._cache[name]
+
+    @property
+    def page_count(self):
+        return len(self._array("page_offsets")) - 1
+
+    def page(self, n):
+        offsets = self._array("page_offsets")
+        start, end = int(offsets[n]), int(offsets[n + 1])
+        text_offsets = self._array("text_offsets")[start:end + 1]
+        blob = self._array("text_blob")
+        source = int(self._array("page_source")[n])
+        width, height = self._array("page_size")[n]
+        return {
+            "page": n,
+            "source": PAGE_SOURCES[source] if source >= 0 else None,
+            "width": float(width),
+            "height": float(height),
+            "words": [blob[a:b].tobytes().decode("utf-8") for a, b in zip(text_offsets[:-1], text_offsets[1:])],
+            "boxes": self._array("boxes")[start:end],
+            "conf": self._array("conf")[start:end],
+            "line": self._array("line")[start:end],
+        }
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load_layout(path):
+    return LayoutResult(path)
@@ -0,0 +1,114 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import fitz  # PyMuPDF
+
+from modules.ocr_processing.config import (
+    OCR_PAGE_HASH_ENABLED, OCR_PAGE_HASH_DPI, OCR_PAGE_HASH_MAX_ENTRIES,
+    OCR_PAGE_HASH_MAX_DISTANCE, OCR_PAGE_HASH_MAX_DIFF,
+)
+
+logger = logging.getLogger(__name__)
+
+# Piksel tamniji od ovoga (0-255) je "tinta" u binariziranom thumbnailu
+INK_THRESHOLD = 160
+
+# ---------- PERCEPTUALNI OTISAK STRANICE (NumPy) ----------
+def _block_mean(gray, rows, cols):
+    # Smanjivanje usrednjavanjem po blokovima (area resize) bez PIL-a
+    ys = np.linspace(0, gray.shape[0], rows + 1).astype(np.int64)
+    xs = np.linspace(0, gray.shape[1], cols + 1).astype(np.int64)
+    sums = np.add.reduceat(np.add.reduceat(gray.astype(np.float32), ys[:-1], axis=0), xs[:-1], axis=1)
+    return sums / np.outer(np.diff(ys), np.diff(xs))
+
+def dhash(gray):
+    """
+    64-bitni difference hash: 9x8 smanjena slika, bit = je li piksel svjetliji od lijevog susjeda.
+    """
+    small = _block_mean(gray, 8, 9)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def page_fingerprint(page, dpi=OCR_PAGE_HASH_DPI):
+    """
+    Otisak PDF stranice iz sivog rastera niske rezolucije: dHash za brzo traženje kandidata
+    i binarizirani thumbnail (bitovi) za potvrdu da je sadržaj zaista isti.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    ink = gray < INK_THRESHOLD
+    return {
+        "dhash": dhash(gray),
+        "shape": ink.shape,
+        "ink": np.packbits(ink),
+        "ink_count": int(ink.sum()),
+    }
+
+def fingerprints_match(a, b, max_distance=OCR_PAGE_HASH_MAX_DISTANCE, max_diff=OCR_PAGE_HASH_MAX_DIFF):
+    if a["shape"] != b["shape"]:
+        return False
+    if bin(a["dhash"] ^ b["dhash"]).count("1") > max_distance:
+        return False
+    differing = int(np.bitwise_count(a["ink"] ^ b["ink"]).sum())
+    return differing <= max_diff * max(a["ink_count"], b["ink_count"], 1)
+
+# ---------- INDEKS VEĆ OCR-ANIH STRANICA ----------
+class PageHashIndex:
+    """
+    Ograničen (LRU, max_entries) indeks: otisak stranice -> OCR rezultat te stranice.
+    Ponovljena stranica (opći uvjeti uz svaki račun, boilerplate izvoda) preuzima prethodni
+    rezultat umjesto ponovnog OCR-a. Rezultat vrijedi samo za isti backend.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> (backend, otisak, rezultat stranice)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        # hits: iz indeksa (raniji fileovi), in_file_duplicates: ponovljena stranica unutar istog filea/batcha
+        self.counters = {"lookups": 0, "hits": 0, "in_file_duplicates": 0, "stores": 0, "evictions": 0}
+
+    def lookup(self, fingerprint, backend):
+        """
+        Vraća kopiju spremljenog OCR rezultata stranice ili None.
+        """
+        with self._lock:
+            self.counters["lookups"] += 1
+            if self._entries:
+                ids = np.fromiter(self._entries.keys(), dtype=np.int64, count=len(self._entries))
+                hashes = np.fromiter((e[1]["dhash"] for e in self._entries.values()), dtype=np.uint64, count=len(ids))
+                distances = np.bitwise_count(hashes ^ np.uint64(fingerprint["dhash"]))
+                for entry_id in ids[np.argsort(distances, kind="stable")][:8]:
+                    entry_backend, candidate, page_result = self._entries[int(entry_id)]
+                    if entry_backend == backend and fingerprints_match(fingerprint, candidate):
+                        self._entries.move_to_end(int(entry_id))
+                        self.counters["hits"] += 1
+                        return copy.deepcopy(page_result)
+        return None
+
+    def count_in_file_duplicate(self):
+        with self._lock:
+            self.counters["in_file_duplicates"] += 1
+
+    def add(self, fingerprint, backend, page_result):
+        with self._lock:
+            self._entries[self._next_id] = (backend, fingerprint, copy.deepcopy(page_result))
+            self._next_id += 1
+            self.counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "skipped_pages": self.counters["hits"] + self.counters["in_file_duplicates"],
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+page_index = PageHashIndex(OCR_PAGE_HASH_MAX_ENTRIES) if OCR_PAGE_HASH_ENABLED else None
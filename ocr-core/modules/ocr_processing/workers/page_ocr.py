@@ -0,0 +1,184 @@
+import pytesseract
+from PIL import Image
+import fitz  # PyMuPDF
+
+from modules.ocr_processing.workers.layout import empty_words
+from modules.ocr_processing.workers.preprocess import preprocess_image, source_box
+from modules.ocr_processing.config import (
+    OCR_LANG, OCR_TESSERACT_CONFIG, OCR_DPI, OCR_KEEP_PAGE_IMAGES,
+    OCR_ADAPTIVE_DPI, OCR_ADAPTIVE_MIN_DPI, OCR_ADAPTIVE_TARGET_PX, OCR_CONF_THRESHOLD,
+    OCR_PREPROCESS_STEPS,
+)
+
+# ---------- ZAŠTITA OD PREVELIKIH SLIKA (decompression bomb) ----------
+class ImageTooLargeError(Exception):
+    """Slika/stranica ima više piksela od Image.MAX_IMAGE_PIXELS – preskače se prije dekodiranja i OCR-a."""
+
+def check_image_pixels(width, height, source=""):
+    # Eksplicitna provjera umjesto warnings filtera (filteri su globalni za proces i nisu thread-safe)
+    limit = Image.MAX_IMAGE_PIXELS
+    pixels = int(width) * int(height)
+    if limit and pixels > limit:
+        raise ImageTooLargeError(f"{source}: {pixels} piksela > {limit} (MAX_IMAGE_PIXELS)")
+
+# ---------- TESSERACT: image_to_data -> linije (sort po Y pa X) ----------
+def lines_from_tesseract_data(ocr_data):
+    """
+    Iz image_to_data DICT-a slaže linije strogo sortirane po Y, a unutar linije po X.
+    Riječi s conf <= 10 se odbacuju.
+    """
+    n = len(ocr_data['text'])
+    # Mapiranje: (block, par, line, top) -> [(left, word)]
+    lines_by_line_num = {}
+
+    for i in range(n):
+        word = ocr_data['text'][i]
+        conf = ocr_data['conf'][i]
+        block_num = ocr_data['block_num'][i]
+        par_num = ocr_data['par_num'][i]
+        line_num = ocr_data['line_num'][i]
+        top = ocr_data['top'][i]
+        left = ocr_data['left'][i]
+        if word and word.strip() and str(conf).isdigit() and int(conf) > 10:
+            key = (block_num, par_num, line_num, top)
+            if key not in lines_by_line_num:
+                lines_by_line_num[key] = []
+            lines_by_line_num[key].append((left, word))
+
+    lines = []
+    # Sortiraj linije po Y (top), blok, par, linija
+    sorted_keys = sorted(lines_by_line_num.keys(), key=lambda k: (k[3], k[0], k[1], k[2]))
+    for key in sorted_keys:
+        # Unutar linije, sort po X (left)
+        words = [w for _, w in sorted(lines_by_line_num[key], key=lambda t: t[0])]
+        line = " ".join(words).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+def words_from_tesseract_data(ocr_data, scale=1.0, preprocess=None):
+    """
+    Geometrija riječi (workers/layout.py) iz image_to_data DICT-a; scale pretvara piksele u PDF točke.
+    preprocess: info iz predobrade – okviri se vraćaju u prostor izvorne slike (crop, deskew; vidi source_box).
+    line = redni broj (block, par, line) grupe na stranici.
+    """
+    words = empty_words()
+    line_ids = {}
+    for i in range(len(ocr_data['text'])):
+        word = ocr_data['text'][i]
+        conf = ocr_data['conf'][i]
+        if not (word and word.strip() and str(conf).isdigit()):
+            continue
+        key = (ocr_data['block_num'][i], ocr_data['par_num'][i], ocr_data['line_num'][i])
+        left, top = ocr_data['left'][i], ocr_data['top'][i]
+        box = [left, top, left + ocr_data['width'][i], top + ocr_data['height'][i]]
+        if preprocess:
+            box = source_box(box, preprocess)
+        words["text"].append(word.strip())
+        words["boxes"].append([round(v * scale, 2) for v in box])
+        words["conf"].append(int(conf))
+        words["line"].append(line_ids.setdefault(key, len(line_ids)))
+    return words
+
+def mean_word_conf(ocr_data):
+    # Prosječni conf svih prepoznatih riječi (i onih ispod praga za linije); None ako riječi nema
+    confs = [
+        int(conf) for word, conf in zip(ocr_data['text'], ocr_data['conf'])
+        if word and word.strip() and str(conf).isdigit()
+    ]
+    return round(sum(confs) / len(confs), 2) if confs else None
+
+def ocr_image(img, backend="pytesseract", scale=1.0):
+    """
+    OCR jedne slike -> {"lines": [...], "conf": prosječni conf riječi, "words": geometrija riječi}.
+    backend: "pytesseract" (tesseract proces po slici) ili "tesserocr" (trajni API handle po procesu).
+    Ako su za backend zadani koraci predobrade (OCR_PREPROCESS*), rezultat ima i "preprocess" info.
+    """
+    steps = OCR_PREPROCESS_STEPS.get(backend)
+    preprocess = None
+    if steps:
+        img, preprocess = preprocess_image(img, steps)
+
+    if backend == "tesserocr":
+        from modules.ocr_processing.workers.engine_tesserocr import image_to_data
+        ocr_data = image_to_data(img)
+    else:
+        ocr_data = pytesseract.image_to_data(
+            img, lang=OCR_LANG, config=OCR_TESSERACT_CONFIG, output_type=pytesseract.Output.DICT
+        )
+    result = {
+        "lines": lines_from_tesseract_data(ocr_data),
+        "conf": mean_word_conf(ocr_data),
+        "words": words_from_tesseract_data(ocr_data, scale, preprocess),
+    }
+    if preprocess:
+        result["preprocess"] = preprocess
+    return result
+
+# ---------- RASTERIZACIJA U MEMORIJI ----------
+def pixmap_to_image(pix):
+    """
+    PIL slika direktno nad bufferom pixmape (bez kopije, bez PNG encode/decode).
+    Pixmap MORA živjeti dok se slika koristi (buffer pripada pixmapi).
+    Format PPM: pytesseract sliku predaje tesseractu kao nekomprimirani PPM umjesto PNG-a.
+    """
+    mode = "L" if pix.n == 1 else "RGB"
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    img.format = "PPM"
+    return img
+
+# ---------- ADAPTIVNI DPI ----------
+def choose_dpi(page, max_dpi=OCR_DPI):
+    """
+    DPI prema dimenzijama stranice: dulja stranica ~OCR_ADAPTIVE_TARGET_PX piksela,
+    u granicama [OCR_ADAPTIVE_MIN_DPI, max_dpi]. Za A4 to je ~200 DPI (pola piksela od 300 DPI).
+    """
+    long_edge_inch = max(page.rect.width, page.rect.height) / 72
+    if long_edge_inch <= 0:
+        return max_dpi
+    dpi = int(OCR_ADAPTIVE_TARGET_PX / long_edge_inch)
+    return max(OCR_ADAPTIVE_MIN_DPI, min(max_dpi, dpi))
+
+def _ocr_page_at(page, file_path, dpi, backend):
+    check_image_pixels(page.rect.width * dpi / 72, page.rect.height * dpi / 72, f"{file_path} str. {page.number + 1}")
+    pix = page.get_pixmap(dpi=dpi, alpha=False)
+    if OCR_KEEP_PAGE_IMAGES:
+        pix.save(f"{file_path}_{page.number}.png")
+    # Koordinate riječi u PDF točkama, kao i za native stranice
+    result = ocr_image(pixmap_to_image(pix), backend, scale=72 / dpi)
+    result.update({"dpi": dpi, "width": page.rect.width, "height": page.rect.height})
+    return result
+
+# ---------- POSLOVI ZA OCR WORKERE (jedna stranica / jedna slika) ----------
+def ocr_pdf_page(file_path, page_number, dpi=OCR_DPI, backend="pytesseract"):
+    """
+    Renderira jednu stranicu PDF-a u memoriju i vraća {"lines", "conf", "dpi"}.
+    U adaptivnom modu (OCR_ADAPTIVE_DPI) prvo OCR na nižem DPI-u po dimenzijama stranice;
+    samo ako je prosječni conf ispod OCR_CONF_THRESHOLD stranica se ponovno renderira na punom DPI-u.
+    PNG na disk samo ako je uključen OCR_KEEP_PAGE_IMAGES (debug).
+    """
+    with fitz.open(file_path) as doc:
+        page = doc[page_number]
+        if not OCR_ADAPTIVE_DPI:
+            return _ocr_page_at(page, file_path, dpi, backend)
+
+        first_dpi = choose_dpi(page, dpi)
+        result = _ocr_page_at(page, file_path, first_dpi, backend)
+        if first_dpi >= dpi or (result["conf"] is not None and result["conf"] >= OCR_CONF_THRESHOLD):
+            return result
+
+        retry = _ocr_page_at(page, file_path, dpi, backend)
+        retry["retried_from_dpi"] = first_dpi
+        # Zadrži bolji od dva pokušaja (prazna stranica ostaje prazna na bilo kojem DPI-u)
+        if result["conf"] is not None and (retry["conf"] is None or retry["conf"] < result["conf"]):
+            result["retried_dpi"] = dpi
+            return result
+        return retry
+
+def ocr_image_file(file_path, backend="pytesseract"):
+    with Image.open(file_path) as img:
+        # Image.open čita samo zaglavlje – provjera prije dekodiranja
+        check_image_pixels(img.width, img.height, file_path)
+        result = ocr_image(img, backend)
+        result.update({"width": img.width, "height": img.height})
+        return result
@@ -0,0 +1,104 @@
+import os
+import logging
+import threading
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL.Image import DecompressionBombWarning
+
+from modules.ocr_processing.config import OCR_WORKERS, OCR_TESSERACT_THREADS, OCR_POOL_START_METHOD
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _init_worker(tesseract_threads):
+    # tesseract subprocess nasljeđuje env workera
+    os.environ["OMP_THREAD_LIMIT"] = str(tesseract_threads)
+    # Worker je zaseban jednonitni proces: filter vrijedi samo za njega. DecompressionBombWarning se
+    # podiže odmah (prije dekodiranja slike), a iznimka se istog tipa vraća pozivatelju kroz future.
+    warnings.simplefilter("error", DecompressionBombWarning)
+
+def _run_job(job):
+    # Izvršava (funkcija, *args); bez poola (OCR_WORKERS=0) u niti pozivatelja, bez diranja warnings filtera –
+    # prevelike slike tada zaustavlja eksplicitna provjera (page_ocr.check_image_pixels)
+    func, *args = job
+    return func(*args)
+
+def get_ocr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context(OCR_POOL_START_METHOD),
+                initializer=_init_worker,
+                initargs=(OCR_TESSERACT_THREADS,),
+            )
+            logger.info(f"OCR pool pokrenut: {OCR_WORKERS} procesa, {OCR_TESSERACT_THREADS} tesseract niti po procesu")
+        return _pool
+
+def shutdown_ocr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def iter_ocr_jobs(jobs):
+    """
+    Varijanta run_ocr_jobs s rezultatima kao generatorom: svi poslovi se predaju poolu odmah (pri pozivu),
+    a rezultati se vraćaju ISTIM redoslijedom kao poslovi, čim je pojedini gotov. Zatvaranje generatora
+    (break, close) otkazuje poslove koji još nisu počeli. Bez poola (OCR_WORKERS=0) posao se
+    izvršava tek kad se zatraži njegov rezultat.
+    """
+    if not jobs:
+        return _JobResults([])
+    if OCR_WORKERS <= 0:
+        return (_run_job(job) for job in jobs)
+    pool = get_ocr_pool()
+    return _JobResults([pool.submit(_run_job, job) for job in jobs])
+
+class _JobResults:
+    # Rezultati predanih poslova redom; close() otkazuje i poslove čiji rezultat još nije ni zatražen
+    def __init__(self, futures):
+        self._futures = futures
+        self._next = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._next >= len(self._futures):
+            raise StopIteration
+        future = self._futures[self._next]
+        self._next += 1
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # Srušen worker ruši cijeli pool – sljedeći poziv dobiva novi
+            logger.error("OCR pool je srušen, bit će ponovno kreiran")
+            shutdown_ocr_pool()
+            self.close()
+            raise
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for f in self._futures:
+            f.cancel()
+
+def run_ocr_jobs(jobs):
+    """
+    Izvršava OCR poslove [(funkcija, *args), ...] paralelno u poolu i vraća
+    rezultate ISTIM redoslijedom kao poslovi (stranice ostaju poredane).
+    """
+    results = iter_ocr_jobs(jobs)
+    try:
+        return list(results)
+    finally:
+        results.close()
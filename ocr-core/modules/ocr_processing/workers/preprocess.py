@@ -0,0 +1,136 @@
+import numpy as np
+from PIL import Image
+
+from modules.ocr_processing.config import OCR_PREPROCESS_MAX_SKEW, OCR_PREPROCESS_MARGIN
+
+# ---------- PREDOBRADA SLIKE (NumPy, u OCR workeru) ----------
+# Ulaz i izlaz su PIL slike; "ink" je bool maska (True = tinta/tekst).
+
+# Manji nagib se ne ispravlja (rotacija bi samo zamutila sliku)
+MIN_SKEW = 0.1
+
+def otsu_threshold(gray):
+    """
+    Otsu prag iz histograma: maksimalna varijanca između klasa, za sve pragove odjednom.
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    cum_mean = np.cumsum(hist * np.arange(256))
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+def adaptive_ink(gray, window=31, offset=10):
+    """
+    Lokalni prag (srednja vrijednost prozora window x window iz integralne slike) – za fotografije
+    mobitelom i neravnomjerno osvjetljenje, gdje jedan globalni prag ne radi.
+    """
+    half = window // 2
+    padded = np.pad(gray.astype(np.int64), ((half + 1, half), (half + 1, half)), mode="edge")
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    h, w = gray.shape
+    window_sum = (
+        integral[window:window + h, window:window + w] - integral[:h, window:window + w]
+        - integral[window:window + h, :w] + integral[:h, :w]
+    )
+    return gray < window_sum / (window * window) - offset
+
+def estimate_skew(ink, max_angle=OCR_PREPROCESS_MAX_SKEW, step=0.25, max_points=50000):
+    """
+    Projection-profile deskew: za svaki kandidatski kut "smakne" piksele tinte po retcima;
+    kut kod kojeg su retci najoštriji (najveća suma kvadrata razlika profila) je nagib teksta.
+    Svi kutovi se računaju odjednom (matrica kutovi x točke). Vraća kut u stupnjevima.
+    """
+    stride = max(1, max(ink.shape) // 1000)
+    ys, xs = np.nonzero(ink[::stride, ::stride])
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > max_points:
+        pick = np.random.default_rng(0).choice(len(ys), max_points, replace=False)
+        ys, xs = ys[pick], xs[pick]
+
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    rows = np.rint(ys[None, :] - xs[None, :] * np.tan(np.radians(angles))[:, None]).astype(np.int64)
+    rows -= rows.min()
+    height = int(rows.max()) + 1
+    flat = rows + np.arange(len(angles))[:, None] * height
+    profiles = np.bincount(flat.ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+    scores = (np.diff(profiles, axis=1).astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[np.argmax(scores)])
+
+def content_bbox(ink, margin=OCR_PREPROCESS_MARGIN):
+    """
+    Okvir sadržaja (x0, y0, x1, y1) iz projekcija tinte po retcima/stupcima.
+    Gotovo puni retci/stupci (crni rub skena, rub fotografije) i pojedinačne mrlje ne računaju se kao sadržaj.
+    """
+    h, w = ink.shape
+    row_ink = ink.sum(axis=1)
+    col_ink = ink.sum(axis=0)
+    rows = np.flatnonzero((row_ink >= max(2, 0.002 * w)) & (row_ink < 0.9 * w))
+    cols = np.flatnonzero((col_ink >= max(2, 0.002 * h)) & (col_ink < 0.9 * h))
+    if not len(rows) or not len(cols):
+        return 0, 0, w, h
+    return (
+        max(0, int(cols[0]) - margin), max(0, int(rows[0]) - margin),
+        min(w, int(cols[-1]) + 1 + margin), min(h, int(rows[-1]) + 1 + margin),
+    )
+
+def preprocess_image(img, steps):
+    """
+    Predobrada prije tesseracta prema koracima ("binarize" | "adaptive", "deskew", "crop").
+    Vraća (slika, info); info["skew"], info["offset"] (pomak izrezanog dijela) i info["size"] (ulazna slika)
+    služe za vraćanje koordinata riječi u prostor izvorne slike (source_box),
+    info["pixels_removed"] koliko je piksela manje otišlo u OCR.
+    """
+    gray = np.asarray(img.convert("L"))
+    pixels_in = gray.size
+    ink = adaptive_ink(gray) if "adaptive" in steps else gray < otsu_threshold(gray)
+    binarized = "binarize" in steps or "adaptive" in steps
+    out = gray
+
+    skew = 0.0
+    if "deskew" in steps:
+        skew = estimate_skew(ink)
+        if abs(skew) >= MIN_SKEW:
+            # Nagib "dolje desno" ispravlja se rotacijom suprotno od kazaljke (PIL: pozitivan kut)
+            ink = np.asarray(Image.fromarray(ink.astype(np.uint8) * 255).rotate(skew, fillcolor=0)) > 127
+            if not binarized:
+                out = np.asarray(Image.fromarray(gray).rotate(skew, resample=Image.BILINEAR, fillcolor=255))
+    if binarized:
+        out = np.where(ink, 0, 255).astype(np.uint8)
+
+    x0, y0 = 0, 0
+    if "crop" in steps:
+        x0, y0, x1, y1 = content_bbox(ink)
+        out = out[y0:y1, x0:x1]
+
+    result = Image.fromarray(np.ascontiguousarray(out))
+    result.format = "PPM"
+    return result, {
+        "steps": list(steps),
+        "skew": skew,
+        "offset": [x0, y0],
+        "size": [gray.shape[1], gray.shape[0]],
+        "pixels_in": pixels_in,
+        "pixels_removed": pixels_in - out.size,
+    }
+
+def source_box(box, info):
+    """
+    Okvir riječi (x0, y0, x1, y1) s predobrađene slike -> pikseli izvorne slike.
+    Dodaje se pomak crop-a, a nakon deskewa kutovi okvira rotiraju se natrag oko središta slike
+    (inverz PIL rotate); vraća se okvir zarotiranih kutova, pa je za nagnutu riječ malo veći od nje same.
+    """
+    dx, dy = info.get("offset") or (0, 0)
+    x0, y0, x1, y1 = box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy
+    skew = info.get("skew") or 0.0
+    if abs(skew) < MIN_SKEW:
+        return [x0, y0, x1, y1]
+    cx, cy = info["size"][0] / 2, info["size"][1] / 2
+    cos, sin = np.cos(np.radians(skew)), np.sin(np.radians(skew))
+    corners = np.array([[x0, y0], [x1, y0], [x0, y1], [x1, y1]], dtype=np.float64) - (cx, cy)
+    xs = cx + corners[:, 0] * cos - corners[:, 1] * sin
+    ys = cy + corners[:, 0] * sin + corners[:, 1] * cos
+    return [float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max())]
@@ -0,0 +1,16 @@
+# ---------- ZAJEDNIČKI OBLIK OCR REZULTATA (svi enginei) ----------
+def build_ocr_result(pages):
+    """
+    Rezultat OCR-a za cijeli dokument, isti za sve engine-e:
+    {"text": str, "lines": [str], "pages": [{"page": n, "source": "native"|"ocr"|"azure", "lines": [str], ...}]}
+    OCR stranice imaju i "conf" (prosječni conf riječi, 0-100) i "dpi" (za PDF, lokalni OCR).
+    Sve stranice imaju "words" (geometrija riječi) i "width"/"height" – vidi workers/layout.py.
+    Linije stranica spajaju se redom stranica, uzastopni duplikati se izbacuju.
+    """
+    final_lines = []
+    for page in pages:
+        for l in page["lines"]:
+            l = l.strip()
+            if l and (not final_lines or l != final_lines[-1]):
+                final_lines.append(l)
+    return {"text": "\n".join(final_lines), "lines": final_lines, "pages": pages}
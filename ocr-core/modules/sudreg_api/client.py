@@ -1,34 +1,114 @@
 import os
+import time
+import asyncio
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Tuple
 from sqlalchemy.orm import Session
 from .schemas import SudregCompany
+from .snapshot import snapshot_lookup
 from core.database.models import Client, ParsedOIB
+from core.utils.circuit_breaker import get_breaker
+from core.utils.rate_limit import TokenBucket
+from core.registry_cache import sudreg_cache
 
 CLIENT_ID = os.getenv("SUDREG_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SUDREG_CLIENT_SECRET")
-TOKEN_URL = "https://sudreg-data.gov.hr/api/oauth/token"
-LEGACY_BASE_URL = "https://sudreg-data.gov.hr/api/javni/v1"
-
+TOKEN_URL = os.getenv("SUDREG_TOKEN_URL", "https://sudreg-data.gov.hr/api/oauth/token")
+LEGACY_BASE_URL = os.getenv("SUDREG_BASE_URL", "https://sudreg-data.gov.hr/api/javni/v1")
+# (connect, read) timeout u sekundama – bez njega jedan zaglavljeni poziv blokira upload
+SUDREG_TIMEOUT = (float(os.getenv("SUDREG_CONNECT_TIMEOUT", "3.05")), float(os.getenv("SUDREG_READ_TIMEOUT", "10")))
+# Kvota Sudreg API-ja: zahtjeva u sekundi i najveći burst (dijele ih sve niti procesa)
+SUDREG_RATE_LIMIT = float(os.getenv("SUDREG_RATE_LIMIT", "5"))
+SUDREG_RATE_BURST = int(os.getenv("SUDREG_RATE_BURST", "10"))
+SUDREG_POOL_SIZE = int(os.getenv("SUDREG_POOL_SIZE", "10"))
+# Token se obnavlja toliko sekundi prije isteka (expires_in iz OAuth odgovora)
+SUDREG_TOKEN_REFRESH_MARGIN = float(os.getenv("SUDREG_TOKEN_REFRESH_MARGIN", "60"))
+SUDREG_TOKEN_DEFAULT_TTL = 3600
+
+sudreg_breaker = get_breaker("sudreg")
+
+
+def company_from_subjekt(data: dict) -> SudregCompany:
+    # Sudreg subjekt_detalji -> SudregCompany
+    mapped_data = {
+        "oib": str(data.get("oib", "")),
+        "naziv": None,
+        "adresa": None,
+        "status": None,
+        "datum_osnivanja": data.get("datum_osnivanja"),
+        "djelatnost": None
+    }
+
+    if isinstance(data.get("tvrtke"), list) and data["tvrtke"]:
+        mapped_data["naziv"] = data["tvrtke"][0].get("ime")
+
+    if isinstance(data.get("sjedista"), list) and data["sjedista"]:
+        sj = data["sjedista"][0]
+        mapped_data["adresa"] = {
+            "ulica_i_broj": f'{sj.get("ulica", "")} {sj.get("kucni_broj", "")}'.strip(),
+            "mjesto": sj.get("naziv_naselja"),
+            "postanski_broj": None
+        }
+    return SudregCompany(**mapped_data)
 
 class SudregClient:
-    def __init__(self):
+    """
+    Jedan klijent po procesu (sudreg_client dolje): pooled HTTP sesija (keep-alive), OAuth token koji se
+    obnavlja prije isteka i nakon 401, token bucket za kvotu i circuit breaker "sudreg".
+    Prije API-ja gleda lokalni snapshot (snapshot.py); odgovori API-ja idu kroz registry cache
+    (core/registry_cache.py).
+    """
+
+    def __init__(self, token_url=TOKEN_URL, base_url=LEGACY_BASE_URL, client_id=CLIENT_ID, client_secret=CLIENT_SECRET,
+                 rate=SUDREG_RATE_LIMIT, burst=SUDREG_RATE_BURST, pool_size=SUDREG_POOL_SIZE, breaker=None,
+                 cache=sudreg_cache, use_snapshot=True):
+        self.token_url = token_url
+        self.base_url = base_url
+        self.client_id = client_id
+        self.client_secret = client_secret
         self.token: Optional[str] = None
-
+        self.token_refresh_at = 0.0
+        self._token_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.rate_limiter = TokenBucket(rate, burst)
+        self.breaker = breaker or sudreg_breaker
+        self.cache = cache
+        self.use_snapshot = use_snapshot
+        self._stats = {"requests": 0, "token_refreshes": 0, "unauthorized_retries": 0, "snapshot_hits": 0}
+
+    # ---------- OAUTH TOKEN ----------
     def get_token(self) -> str:
-        if self.token:
-            return self.token
-        response = requests.post(
-            TOKEN_URL,
-            data={"grant_type": "client_credentials"},
-            auth=(CLIENT_ID, CLIENT_SECRET)
-        )
-        response.raise_for_status()
-        token = response.json().get("access_token")
-        if not token:
-            raise RuntimeError("Nije moguće dohvatiti OAuth token iz Sudreg API-ja")
-        self.token = token
-        return token
+        with self._token_lock:
+            if self.token and time.monotonic() < self.token_refresh_at:
+                return self.token
+            response = self.session.post(
+                self.token_url,
+                data={"grant_type": "client_credentials"},
+                auth=(self.client_id, self.client_secret),
+                timeout=SUDREG_TIMEOUT,
+            )
+            response.raise_for_status()
+            data = response.json()
+            token = data.get("access_token")
+            if not token:
+                raise RuntimeError("Nije moguće dohvatiti OAuth token iz Sudreg API-ja")
+            ttl = float(data.get("expires_in") or SUDREG_TOKEN_DEFAULT_TTL)
+            # Kratkotrajni token: obnova najkasnije na pola trajanja
+            self.token_refresh_at = time.monotonic() + max(ttl - SUDREG_TOKEN_REFRESH_MARGIN, ttl / 2)
+            self.token = token
+            self._stats["token_refreshes"] += 1
+            return token
+
+    def _invalidate_token(self, token: str):
+        # Samo ako ga u međuvremenu nije obnovila druga nit
+        with self._token_lock:
+            if self.token == token:
+                self.token = None
 
     def get_headers(self) -> dict:
         token = self.get_token()
@@ -44,7 +124,7 @@ class SudregClient:
             if client:
                 company = SudregCompany(
                     oib=client.oib,
-                    naziv=client.name,
+                    naziv=client.naziv_firme,
                     adresa=None,
                     status=None,
                     datum_osnivanja=None,
@@ -59,21 +139,31 @@ class SudregClient:
                     naziv=parsed.supplier_name,
                     adresa={"ulica_i_broj": parsed.supplier_address or ""},
                     status=None,
-                    datum_osnivanja=parsed.created_at.date().isoformat(),
+                    datum_osnivanja=None,
                     djelatnost=None
                 )
                 return company, company.dict()
 
-        # 2. Sudreg API
-        url = f"{LEGACY_BASE_URL}/subjekt_detalji"
-        headers = self.get_headers()
-        params = {"identifikator": oib, "tipIdentifikatora": "oib"}
+        # 2. Lokalni snapshot Sudrega (uvoz: python -m modules.sudreg_api.snapshot)
+        if self.use_snapshot:
+            hit = snapshot_lookup(oib, db)
+            if hit is not None:
+                self._stats["snapshot_hits"] += 1
+                return hit
 
-        response = requests.get(url, headers=headers, params=params)
+        # 3. Sudreg (registry cache s TTL-om -> API)
+        found, data = self._lookup(oib)
+        if not found:
+            return None, data
+        return company_from_subjekt(data), data
 
-        # Ako nije pronađeno, spremi minimalni sadržaj
+    def _fetch_subjekt(self, oib: str) -> Tuple[bool, dict]:
+        # Circuit breaker: dok je Sudreg nedostupan, odmah CircuitOpenError (greške se ne cachiraju)
+        response = self.breaker.call(self._get_subjekt, oib)
+
+        # Ako nije pronađeno, spremi minimalni sadržaj (negativni odgovor, kraći TTL)
         if response.status_code == 404:
-            return None, {
+            return False, {
                 "error": "Dobavljač nije pronađen u Sudregu",
                 "oib": oib,
                 "status_code": 404
@@ -81,44 +171,49 @@ class SudregClient:
 
         # Baci grešku za sve druge nepredviđene statuse
         response.raise_for_status()
-        data = response.json()
-
-        mapped_data = {
-            "oib": str(data.get("oib", "")),
-            "naziv": None,
-            "adresa": None,
-            "status": None,
-            "datum_osnivanja": data.get("datum_osnivanja"),
-            "djelatnost": None
-        }
+        return True, response.json()
 
-        if isinstance(data.get("tvrtke"), list) and data["tvrtke"]:
-            mapped_data["naziv"] = data["tvrtke"][0].get("ime")
+    def _get_subjekt(self, oib: str) -> requests.Response:
+        # Greška za breaker su mrežne greške i 5xx; 404 (nije pronađen) i ostali 4xx nisu ispad servisa
+        url = f"{self.base_url}/subjekt_detalji"
+        params = {"identifikator": oib, "tipIdentifikatora": "oib"}
+        for attempt in range(2):
+            headers = self.get_headers()
+            self.rate_limiter.acquire()
+            response = self.session.get(url, headers=headers, params=params, timeout=SUDREG_TIMEOUT)
+            self._stats["requests"] += 1
+            if response.status_code != 401 or attempt:
+                break
+            # Token je opozvan ili istekao prije roka: novi token i jedan ponovni pokušaj
+            self._stats["unauthorized_retries"] += 1
+            self._invalidate_token(headers["Authorization"][len("Bearer "):])
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+    def _lookup(self, oib: str) -> Tuple[bool, dict]:
+        if self.cache is None:
+            return self._fetch_subjekt(oib)
+        return self.cache.get(oib, self._fetch_subjekt)
 
-        if isinstance(data.get("sjedista"), list) and data["sjedista"]:
-            sj = data["sjedista"][0]
-            mapped_data["adresa"] = {
-                "ulica_i_broj": f'{sj.get("ulica", "")} {sj.get("kucni_broj", "")}'.strip(),
-                "mjesto": sj.get("naziv_naselja"),
-                "postanski_broj": None
-            }
+    def get_company_raw_by_oib(self, oib: str) -> dict:
+        found, data = self._lookup(oib)
+        return data
 
-        return SudregCompany(**mapped_data), data
+    # ---------- ASYNC ----------
+    # Isti klijent (pool, token, kvota, cache) u threadu – ne blokira event loop FastAPI ruta
+    async def aget_company_by_oib(self, oib: str, db: Optional[Session] = None) -> Tuple[Optional[SudregCompany], dict]:
+        return await asyncio.to_thread(self.get_company_by_oib, oib, db)
 
-    def get_company_raw_by_oib(self, oib: str) -> dict:
-        url = f"{LEGACY_BASE_URL}/subjekt_detalji"
-        headers = self.get_headers()
-        params = {"identifikator": oib, "tipIdentifikatora": "oib"}
+    async def aget_company_raw_by_oib(self, oib: str) -> dict:
+        return await asyncio.to_thread(self.get_company_raw_by_oib, oib)
 
-        response = requests.get(url, headers=headers, params=params)
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["rate_limiter"] = self.rate_limiter.stats()
+        return stats
 
-        if response.status_code == 404:
-            return {
-                "error": "Dobavljač nije pronađen u Sudregu",
-                "oib": oib,
-                "status_code": 404
-            }
+    def close(self):
+        self.session.close()
 
-        response.raise_for_status()
-        data = response.json()
-        return data
+sudreg_client = SudregClient()
@@ -0,0 +1,206 @@
+"""
+Lokalni snapshot Sudrega (tablica registry_snapshot): OIB -> naziv, skraćeni naziv, adresa.
+
+SudregClient gleda snapshot prije API-ja, pa je za domaće dobavljače rješavanje OIB-a lokalni upit;
+API (i registry cache) ostaju samo za OIB-e kojih nema u snapshotu.
+
+Uvoz (CSV ili JSON dump; JSON niz ili JSON Lines, ravni zapisi ili zapisi oblika subjekt_detalji):
+
+    python -m modules.sudreg_api.snapshot subjekti.csv
+    python -m modules.sudreg_api.snapshot subjekti.jsonl --replace   # obriši OIB-e kojih nema u novom snapshotu
+
+CSV stupci (zaglavlje, bilo kojim redom): oib, naziv, skraceni_naziv, ulica_i_broj, mjesto, postanski_broj;
+prihvaćaju se i uobičajeni alternativni nazivi (ime, tvrtka, adresa, naziv_naselja, ...).
+"""
+import os
+import csv
+import json
+import logging
+import argparse
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from core.database.connection import SessionMain, engine_main
+from core.database.models import Base, RegistrySnapshotEntry
+from core.routes.oibvalidator import is_valid_oib
+from .schemas import SudregCompany
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_IMPORT_BATCH = int(os.environ.get("SNAPSHOT_IMPORT_BATCH", "5000"))
+
+# Stupac u tablici -> nazivi koji se prihvaćaju u dumpu (mala slova)
+FIELD_ALIASES = {
+    "oib": ("oib", "potpuni_oib", "identifikator"),
+    "naziv": ("naziv", "ime", "tvrtka", "naziv_tvrtke", "name"),
+    "skraceni_naziv": ("skraceni_naziv", "skracena_tvrtka", "skraceno_ime", "short_name"),
+    "ulica_i_broj": ("ulica_i_broj", "adresa", "address"),
+    "mjesto": ("mjesto", "naziv_naselja", "grad", "city"),
+    "postanski_broj": ("postanski_broj", "postanski_broj_naselja", "zip"),
+}
+FIELD_LIMITS = {"naziv": 500, "skraceni_naziv": 255, "ulica_i_broj": 255, "mjesto": 100, "postanski_broj": 10}
+
+# ---------- ČITANJE DUMPA ----------
+def _first(items):
+    return items[0] if isinstance(items, list) and items and isinstance(items[0], dict) else {}
+
+def normalize_record(record):
+    """
+    Jedan zapis dumpa -> dict stupaca tablice, ili None ako nema ispravnog OIB-a (kontrolna znamenka).
+    """
+    record = {str(k).strip().lower(): v for k, v in record.items()}
+    if "tvrtke" in record or "sjedista" in record:
+        # Zapis oblika subjekt_detalji (kao odgovor API-ja)
+        sj = _first(record.get("sjedista"))
+        record = {
+            "oib": record.get("oib"),
+            "naziv": _first(record.get("tvrtke")).get("ime"),
+            "skraceni_naziv": _first(record.get("skracene_tvrtke")).get("ime"),
+            "ulica_i_broj": f'{sj.get("ulica") or ""} {sj.get("kucni_broj") or ""}'.strip(),
+            "mjesto": sj.get("naziv_naselja"),
+        }
+
+    row = {}
+    for field, aliases in FIELD_ALIASES.items():
+        value = next((record[a] for a in aliases if record.get(a) not in (None, "")), None)
+        value = None if value is None else str(value).strip() or None
+        if value and field in FIELD_LIMITS:
+            value = value[:FIELD_LIMITS[field]]
+        row[field] = value
+
+    oib = (row["oib"] or "").zfill(11) if (row["oib"] or "").isdigit() else row["oib"]
+    # Vodeće nule (Excel) se vraćaju, ali OIB mora proći kontrolnu znamenku
+    if not is_valid_oib(oib):
+        return None
+    row["oib"] = oib
+    return row
+
+def read_snapshot(path):
+    # Generator zapisa (dict) iz CSV-a, JSON niza ili JSON Lines datoteke
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t") if sample else csv.excel
+            except csv.Error:
+                # Sniffer ne prepozna npr. dump s jednim stupcem – čita se kao običan CSV sa zarezom
+                logger.warning(f"Snapshot {path}: CSV dijalekt nije prepoznat, koristi se zarez")
+                dialect = csv.excel
+            yield from csv.DictReader(f, dialect=dialect)
+            return
+
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+# ---------- UVOZ ----------
+def _upsert_batch(db, rows):
+    existing = {
+        oib for (oib,) in db.query(RegistrySnapshotEntry.oib).filter(RegistrySnapshotEntry.oib.in_(list(rows)))
+    }
+    db.bulk_update_mappings(RegistrySnapshotEntry, [rows[oib] for oib in existing])
+    db.bulk_insert_mappings(RegistrySnapshotEntry, [row for oib, row in rows.items() if oib not in existing])
+    db.commit()
+    return len(rows) - len(existing), len(existing)
+
+def import_snapshot(db, path, replace=False, batch_size=SNAPSHOT_IMPORT_BATCH):
+    """
+    Uvozi snapshot u registry_snapshot (upsert po OIB-u, commit po batchu – tablica je upotrebljiva
+    i tijekom uvoza). replace=True na kraju briše OIB-e kojih nema u ovom snapshotu.
+    """
+    started = datetime.utcnow()
+    stats = {"read": 0, "inserted": 0, "updated": 0, "skipped": 0, "deleted": 0}
+    rows = {}
+    for record in read_snapshot(path):
+        stats["read"] += 1
+        row = normalize_record(record) if isinstance(record, dict) else None
+        if row is None:
+            stats["skipped"] += 1
+            continue
+        row["imported_at"] = started
+        rows[row["oib"]] = row  # isti OIB više puta u dumpu: vrijedi zadnji zapis
+        if len(rows) >= batch_size:
+            inserted, updated = _upsert_batch(db, rows)
+            stats["inserted"] += inserted
+            stats["updated"] += updated
+            rows = {}
+    if rows:
+        inserted, updated = _upsert_batch(db, rows)
+        stats["inserted"] += inserted
+        stats["updated"] += updated
+
+    if replace:
+        stats["deleted"] = (
+            db.query(RegistrySnapshotEntry)
+            .filter(RegistrySnapshotEntry.imported_at < started)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+    logger.info(f"Sudreg snapshot {path}: {stats}")
+    return stats
+
+# ---------- LOOKUP ----------
+def snapshot_entry_to_company(entry):
+    # -> (SudregCompany, raw dict u obliku koji upload već čita: skracene_tvrtke)
+    company = SudregCompany(
+        oib=entry.oib,
+        naziv=entry.naziv,
+        adresa={
+            "ulica_i_broj": entry.ulica_i_broj or "",
+            "mjesto": entry.mjesto,
+            "postanski_broj": entry.postanski_broj,
+        },
+        status=None,
+        datum_osnivanja=None,
+        djelatnost=None,
+    )
+    raw = company.dict()
+    raw["source"] = "snapshot"
+    if entry.skraceni_naziv:
+        raw["skracene_tvrtke"] = [{"ime": entry.skraceni_naziv}]
+    return company, raw
+
+def snapshot_lookup(oib, db=None, session_factory=SessionMain):
+    """
+    (SudregCompany, raw) iz lokalnog snapshota ili None. Bez db otvara vlastitu sesiju.
+    Nedostupna tablica (npr. snapshot nikad uvezen u staroj bazi) znači None, ne grešku.
+    """
+    try:
+        if db is not None:
+            entry = db.get(RegistrySnapshotEntry, oib)
+            return snapshot_entry_to_company(entry) if entry else None
+        with session_factory() as session:
+            entry = session.get(RegistrySnapshotEntry, oib)
+            return snapshot_entry_to_company(entry) if entry else None
+    except Exception as e:
+        logger.warning(f"Sudreg snapshot nedostupan za OIB {oib}: {e}")
+        return None
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Uvoz Sudreg snapshota (CSV/JSON) u tablicu registry_snapshot")
+    parser.add_argument("path", help="CSV, JSON ili JSON Lines datoteka")
+    parser.add_argument("--replace", action="store_true", help="obriši OIB-e kojih nema u ovom snapshotu")
+    parser.add_argument("--batch", type=int, default=SNAPSHOT_IMPORT_BATCH, help="zapisa po transakciji")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    Base.metadata.create_all(bind=engine_main)
+    db = SessionMain()
+    try:
+        stats = import_snapshot(db, args.path, replace=args.replace, batch_size=max(1, args.batch))
+    finally:
+        db.close()
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
 import logging
 from fastapi import APIRouter, Query, HTTPException, Depends
 from sqlalchemy.orm import Session
-from modules.sudreg_api.client import SudregClient
+from modules.sudreg_api.client import sudreg_client
 from core.database.session import get_db  # ispravno importaj iz session.py
 
 router = APIRouter()
-sudreg_client = SudregClient()
 logger = logging.getLogger(__name__)
 
 @router.get("/sudreg-manual-raw")
@@ -14,7 +13,7 @@ async def sudreg_manual_raw_search(
     db: Session = Depends(get_db),
 ):
     try:
-        raw_data = sudreg_client.get_company_raw_by_oib(oib)
+        raw_data = await sudreg_client.aget_company_raw_by_oib(oib)
         if "error" in raw_data:
             logger.info(f"Subjekt s OIB-om {oib} nije pronađen.")
             raise HTTPException(status_code=404, detail=raw_data["error"])
@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+from core.utils import async_loop
+from core.ml import model_client
+from modules.ocr_processing.workers import engine_azure
+
+async def _current_loop():
+    return asyncio.get_running_loop(), threading.current_thread().name
+
+def test_clients_share_one_loop_and_one_shutdown(monkeypatch):
+    monkeypatch.setattr(async_loop, "_closers", list(async_loop._closers))
+    closed = []
+
+    async def aclose():
+        closed.append(asyncio.get_running_loop())
+
+    async_loop.on_shutdown(aclose)
+    # Model server i Azure OCR dijele isti loop i istu nit
+    loop, thread_name = model_client.run_sync(_current_loop())
+    assert engine_azure.run_sync(_current_loop()) == (loop, thread_name)
+    assert asyncio.run(async_loop.run_async(_current_loop())) == (loop, thread_name)
+
+    async_loop.shutdown_loop()
+    assert closed == [loop]
+    assert loop.is_closed()
+    # Nakon shutdowna novi poziv diže novi loop
+    new_loop, _ = async_loop.run_sync(_current_loop())
+    assert new_loop is not loop
+    async_loop.shutdown_loop()
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.ml.model_client import ModelServerClient
+
+def _fail():
+    raise ConnectionError("connection refused")
+
+def test_opens_after_threshold_and_recovers_through_half_open():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.1)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.snapshot()["state"] == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+
+    time.sleep(0.15)
+    # half_open: jedan probni poziv, drugi istovremeni se odbija
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure(ConnectionError("still down"))
+    assert breaker.snapshot()["state"] == "open"
+
+    time.sleep(0.15)
+    assert breaker.call(lambda: "ok") == "ok"
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == "closed" and snapshot["consecutive_failures"] == 0
+
+def test_model_client_fails_fast_when_server_is_down():
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            calls.append(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    breaker = CircuitBreaker("model_server_test", failure_threshold=3, reset_timeout=60)
+    client = ModelServerClient(batch_size=1, max_in_flight=1, breaker=breaker)
+
+    async def main():
+        try:
+            return await client.classify_many(base_url, [f"Račun {i}" for i in range(200)], return_exceptions=True)
+        finally:
+            await client.aclose()
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        server.shutdown()
+    assert len(calls) == 3
+    assert sum(isinstance(r, CircuitOpenError) for r in results) == 197
+    assert breaker.snapshot()["short_circuited"] == 197
+
+def test_model_version_always_records_the_probe_outcome():
+    import httpx
+
+    responses = []
+
+    def handler(request):
+        return responses.pop(0)
+
+    breaker = CircuitBreaker("model_version_test", failure_threshold=1, reset_timeout=0.05)
+    client = ModelServerClient(breaker=breaker)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def version():
+        client._versions.clear()
+        return await client.model_version("http://model")
+
+    async def main():
+        try:
+            # 5xx je ispad servisa, ne uspjeh
+            responses.append(httpx.Response(503))
+            assert await version() is None
+            assert breaker.snapshot()["state"] == "open"
+
+            # Probni poziv s greškom koja nije ispad (neispravan JSON) ipak zatvara half_open probu
+            await asyncio.sleep(0.06)
+            responses.append(httpx.Response(200, content=b"nije json"))
+            assert await version() is None
+            assert breaker.snapshot()["state"] == "closed"
+
+            responses.append(httpx.Response(200, json={"model_version": "v7"}))
+            assert await version() == "v7"
+        finally:
+            await client.aclose()
+
+    asyncio.run(main())
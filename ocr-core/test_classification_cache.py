@@ -0,0 +1,70 @@
+import os
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import core.ml.model_client as model_client_module
+from core.database.models import Base, ClassificationCacheEntry
+from core.ml.classification_cache import classify_cached, text_hash
+
+def start_model_server(state):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._reply({"model_version": state["version"]})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            texts = body["texts"] if self.path == "/classify_batch" else [body["text"]]
+            state["classified"].extend(texts)
+            results = [{"best_label": "0", "best_score": 0.75, "parsed_fields": {"n": len(t)}} for t in texts]
+            self._reply({"results": results} if self.path == "/classify_batch" else results[0])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_cache_skips_known_texts_and_follows_model_version(monkeypatch):
+    monkeypatch.setattr(model_client_module, "MODEL_VERSION_TTL", 0)
+    state = {"version": "v1", "classified": []}
+    server, base_url = start_model_server(state)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'cache.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            texts = ["RAČUN br. 1\nUkupno 100,00", "RAČUN  br. 1 Ukupno 100,00", "Ugovor o najmu"]
+            first = classify_cached(db, base_url, texts)
+            # Tekstovi koji se razlikuju samo u razmacima klasificiraju se jednom
+            assert len(state["classified"]) == 2
+            assert first[0]["best_label"] == "0" and first[0]["parsed_fields"] == first[1]["parsed_fields"]
+
+            second = classify_cached(db, base_url, texts)
+            assert len(state["classified"]) == 2
+            assert all(r["cached"] for r in second)
+            assert [r["parsed_fields"] for r in second] == [r["parsed_fields"] for r in first]
+
+            state["version"] = "v2"
+            classify_cached(db, base_url, texts)
+            assert len(state["classified"]) == 4
+            versions = {row.model_version for row in db.query(ClassificationCacheEntry)}
+            assert versions == {"v2"}
+            assert db.query(ClassificationCacheEntry).filter_by(text_hash=text_hash(texts[2])).count() == 1
+        finally:
+            db.close()
+            engine.dispose()
+            server.shutdown()
@@ -0,0 +1,121 @@
+import json
+import tempfile
+import threading
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from modules.ocr_processing.workers.engine_azure import AzureReadEngine, run_sync
+
+# ---------- LOKALNI STAND-IN ZA AZURE READ API (Operation-Location flow) ----------
+class FakeReadApi(BaseHTTPRequestHandler):
+    operations = {}
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    polls_before_done = 2
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        content = self.rfile.read(length).decode("utf-8")
+        if self.headers.get("Ocp-Apim-Subscription-Key") != "test-key":
+            return self._json(401, {"error": "unauthorized"})
+        op_id = uuid.uuid4().hex
+        cls = type(self)
+        with cls.lock:
+            cls.operations[op_id] = {"content": content, "polls": 0}
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        host, port = self.server.server_address
+        location = f"http://{host}:{port}/vision/v3.2/read/analyzeResults/{op_id}"
+        self._json(202, {}, {"Operation-Location": location})
+
+    def do_GET(self):
+        cls = type(self)
+        op_id = self.path.rsplit("/", 1)[-1]
+        with cls.lock:
+            op = cls.operations[op_id]
+            op["polls"] += 1
+            done = op["polls"] >= cls.polls_before_done
+            if done:
+                cls.in_flight -= 1
+        if not done:
+            return self._json(200, {"status": "running"})
+        lines = [{"text": l, "words": [{"text": l, "confidence": 0.9}]} for l in op["content"].splitlines()]
+        self._json(200, {
+            "status": "succeeded",
+            "analyzeResult": {"readResults": [{"page": 1, "lines": lines}, {"page": 2, "lines": [{"text": "Stranica 2", "words": []}]}]},
+        })
+
+def _start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeReadApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _write_tmp(text):
+    f = tempfile.NamedTemporaryFile("w", suffix=".pdf", delete=False, encoding="utf-8")
+    f.write(text)
+    f.close()
+    return f.name
+
+def test_azure_engine_operation_location_flow():
+    server = _start_server()
+    try:
+        host, port = server.server_address
+        engine = AzureReadEngine(endpoint=f"http://{host}:{port}/", key="test-key", poll_initial=0.01, poll_max=0.02)
+        result = run_sync(engine.analyze(_write_tmp("Račun br. 7\nOIB 12345678903")))
+        assert result["lines"] == ["Račun br. 7", "OIB 12345678903", "Stranica 2"]
+        assert [p["page"] for p in result["pages"]] == [0, 1]
+        assert result["pages"][0]["source"] == "azure"
+        assert result["pages"][0]["conf"] == 90.0
+        run_sync(engine.aclose())
+    finally:
+        server.shutdown()
+
+def test_azure_engine_caps_in_flight_requests():
+    FakeReadApi.max_in_flight = 0
+    server = _start_server()
+    try:
+        host, port = server.server_address
+        engine = AzureReadEngine(endpoint=f"http://{host}:{port}", key="test-key", max_in_flight=2,
+                                 poll_initial=0.01, poll_max=0.02)
+        paths = [_write_tmp(f"Dokument {i}") for i in range(6)]
+        results = run_sync(engine.analyze_many(paths))
+        assert [r["lines"][0] for r in results] == [f"Dokument {i}" for i in range(6)]
+        assert FakeReadApi.max_in_flight <= 2
+        run_sync(engine.aclose())
+    finally:
+        server.shutdown()
+
+def test_azure_engine_reads_file_off_the_shared_loop(monkeypatch):
+    import modules.ocr_processing.workers.engine_azure as engine_azure
+
+    read_threads = []
+    read_file = engine_azure._read_file
+
+    def recording_read(file_path):
+        read_threads.append(threading.current_thread().name)
+        return read_file(file_path)
+
+    monkeypatch.setattr(engine_azure, "_read_file", recording_read)
+    server = _start_server()
+    try:
+        host, port = server.server_address
+        engine = AzureReadEngine(endpoint=f"http://{host}:{port}", key="test-key", poll_initial=0.01, poll_max=0.02)
+        run_sync(engine.analyze(_write_tmp("Račun br. 8")))
+        run_sync(engine.aclose())
+    finally:
+        server.shutdown()
+    assert read_threads and read_threads[0] != "async-clients-loop"
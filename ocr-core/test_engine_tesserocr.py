@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+from modules.ocr_processing.workers import engine_tesserocr
+
+RIL = SimpleNamespace(BLOCK="block", PARA="para", TEXTLINE="line", WORD="word")
+
+class FakeWord:
+    def __init__(self, text, starts, bbox):
+        self.text, self.starts, self.bbox = text, starts, bbox
+
+    def IsAtBeginningOf(self, level):
+        return level in self.starts
+
+    def BoundingBox(self, level):
+        return self.bbox
+
+    def GetUTF8Text(self, level):
+        return self.text
+
+    def Confidence(self, level):
+        return 88.6
+
+class FakeApi:
+    def __init__(self, words):
+        self.words = words
+        self.calls = []
+
+    def SetImage(self, img):
+        self.calls.append("SetImage")
+
+    def Recognize(self):
+        self.calls.append("Recognize")
+
+    def GetIterator(self):
+        return self.words
+
+    def Clear(self):
+        self.calls.append("Clear")
+
+def _use(monkeypatch, api):
+    monkeypatch.setattr(engine_tesserocr, "tesserocr", object())
+    monkeypatch.setattr(engine_tesserocr, "_api", api)
+    monkeypatch.setattr(engine_tesserocr, "RIL", RIL, raising=False)
+    monkeypatch.setattr(engine_tesserocr, "iterate_level", lambda iterator, level: iter(iterator), raising=False)
+
+def test_words_are_mapped_like_pytesseract_data(monkeypatch):
+    api = FakeApi([
+        FakeWord("Račun", {"block", "para", "line"}, (10, 20, 60, 32)),
+        FakeWord("1001", set(), (70, 20, 100, 32)),
+        FakeWord("Ukupno", {"line"}, (10, 50, 70, 62)),
+        FakeWord("", set(), None),
+    ])
+    _use(monkeypatch, api)
+    data = engine_tesserocr.image_to_data("slika")
+    assert data["text"] == ["Račun", "1001", "Ukupno"]
+    assert data["conf"] == [88, 88, 88]
+    assert (data["block_num"], data["par_num"], data["line_num"]) == ([1, 1, 1], [1, 1, 1], [1, 1, 2])
+    assert (data["left"][2], data["top"][2], data["width"][2], data["height"][2]) == (10, 50, 60, 12)
+    assert api.calls == ["SetImage", "Recognize", "Clear"]
+
+def test_api_is_cleared_when_page_has_no_words(monkeypatch):
+    api = FakeApi(None)
+    _use(monkeypatch, api)
+    data = engine_tesserocr.image_to_data("prazna stranica")
+    assert data["text"] == []
+    assert api.calls[-1] == "Clear"
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import core.enrichment as enrichment
+from core.database.models import Base, Partner
+from modules.sudreg_api.schemas import SudregCompany
+
+def make_db(tmp):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'enrich.db')}")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)()
+
+def test_resolve_partner_uses_sudreg_and_vies(monkeypatch):
+    class FakeSudreg:
+        def get_company_by_oib(self, oib, db=None):
+            return SudregCompany(oib=oib, naziv="FIRMA d.o.o.", adresa={"ulica_i_broj": "Ilica 1", "mjesto": "Zagreb"}), {}
+
+    class FakeVies:
+        def call_vies_soap_api(self, country_code, vat):
+            if vat == "999999999":
+                return {"valid": False, "error": "timeout"}
+            return {"valid": True, "name": "EXAMPLE GMBH", "address": "Hauptstr. 1\n10115 Berlin", "request_date": "2026-01-01"}
+
+    monkeypatch.setattr(enrichment, "sudreg_client", FakeSudreg())
+    monkeypatch.setattr(enrichment, "vies_client", FakeVies())
+    domestic = {"id": 1, "naziv": "", "oib": "12345678901", "vat_id": None, "adresa": "", "vies_response": None}
+    result = enrichment.resolve_partner(domestic)
+    assert result["error"] is None
+    assert result["values"]["adresa"] == "Ilica 1, Zagreb" and result["values"]["naziv"] == "FIRMA d.o.o."
+    assert result["values"]["vies_response"]["valid"] is True
+
+    foreign = {"id": 2, "naziv": "Example", "oib": "de123456789", "vat_id": None, "adresa": None, "vies_response": None}
+    assert enrichment.resolve_partner(foreign)["values"]["adresa"] == "Hauptstr. 1 10115 Berlin"
+
+    failing = {"id": 3, "naziv": "X", "oib": "DE999999999", "vat_id": None, "adresa": "Ulica 1", "vies_response": None}
+    result = enrichment.resolve_partner(failing)
+    assert result["values"] == {} and "timeout" in result["error"]
+
+def test_run_checkpoints_batches_and_resumes():
+    resolved = []
+
+    def resolver(partner):
+        resolved.append(partner["id"])
+        return {"id": partner["id"], "values": {"adresa": f"Adresa {partner['oib']}", "vies_response": {"valid": True}}, "error": None}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = make_db(tmp)
+        try:
+            for i in range(7):
+                db.add(Partner(naziv=f"P{i}", oib=f"1000000000{i}", adresa="", vies_response=None))
+            db.add(Partner(naziv="Potpun", oib="20000000000", adresa="Ilica 1", vies_response={"valid": True}))
+            db.commit()
+
+            stop = threading.Event()
+            stop.set()
+            first = enrichment.run_enrichment(db, workers=2, batch_size=3, stop=stop, resolver=resolver)
+            assert first["stopped"] and first["processed"] == 3 and first["last_id"] == 3
+
+            # Nastavak od checkpointa: ostatak, bez ponavljanja prvog batcha i bez potpunog partnera
+            second = enrichment.run_enrichment(db, workers=2, batch_size=3, resolver=resolver)
+            assert not second["stopped"] and second["completed_at"]
+            assert second["processed"] == 7 and second["enriched"] == 7
+            assert sorted(resolved) == list(range(1, 8))
+            assert enrichment.load_checkpoint(db)["last_id"] == 0
+            assert db.query(Partner).filter(Partner.adresa == "").count() == 0
+
+            # Sve obogaćeno: novi prolaz nema što raditi
+            assert enrichment.run_enrichment(db, resolver=resolver)["processed"] == 0
+        finally:
+            db.close()
+            engine.dispose()
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from core import ingest
+from core.database import connection
+from core.database.models import Base, IngestQueueItem
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(connection, "SessionMain", Session)
+    return Session
+
+def _submit(names, max_attempts=3):
+    items = [
+        {"document_id": None, "filename": name, "file_path": f"/tmp/{name}", "file_hash": name, "document_type": "URA"}
+        for name in names
+    ]
+    return ingest.QueueIngestBackend(max_attempts=max_attempts).submit(items)
+
+def _row(db, queue_id):
+    db.expire_all()
+    return db.get(IngestQueueItem, queue_id)
+
+def test_claim_skips_locked_rows_on_postgres(Session):
+    db = Session()
+    sql = str(ingest.claimable_query(db, datetime.utcnow()).limit(1).statement.compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+def test_each_item_is_claimed_once_in_order(Session):
+    job = _submit(["a.pdf", "b.pdf"])
+    db = Session()
+    first = ingest.claim_next(db, "w1")
+    second = ingest.claim_next(db, "w2")
+    assert [first["filename"], second["filename"]] == ["a.pdf", "b.pdf"]
+    assert first["job_id"] == job.id and first["attempts"] == 1
+    assert ingest.claim_next(db, "w3") is None
+    assert _row(db, first["queue_id"]).locked_by == "w1"
+
+def test_expired_lease_is_reclaimed_by_another_worker(Session):
+    _submit(["a.pdf"])
+    db = Session()
+    item = ingest.claim_next(db, "w1", visibility_timeout=60)
+    assert ingest.claim_next(db, "w2") is None
+    assert ingest.extend_lease(db, item["queue_id"], "w1", visibility_timeout=60)
+
+    # w1 je pao: lease istekne i stavku preuzima w2
+    _row(db, item["queue_id"]).locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    again = ingest.claim_next(db, "w2")
+    assert again["queue_id"] == item["queue_id"]
+    assert again["attempts"] == 2
+    assert not ingest.extend_lease(db, item["queue_id"], "w1")
+
+def test_failed_attempt_is_retried_with_backoff(Session):
+    _submit(["a.pdf"])
+    db = Session()
+    item = ingest.claim_next(db, "w1")
+    before = datetime.utcnow()
+    assert ingest.fail_item(db, item["queue_id"], "OCR error", retry_delay=10) == "queued"
+    row = _row(db, item["queue_id"])
+    assert row.last_error == "OCR error" and row.locked_by is None
+    assert timedelta(seconds=9) < row.available_at - before <= timedelta(seconds=11)
+    assert ingest.claim_next(db, "w1") is None
+
+    row.available_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    item = ingest.claim_next(db, "w1")
+    before = datetime.utcnow()
+    ingest.fail_item(db, item["queue_id"], "OCR error", retry_delay=10)
+    # Drugi neuspjeh: odmak se udvostručuje
+    assert timedelta(seconds=19) < _row(db, item["queue_id"]).available_at - before <= timedelta(seconds=21)
+
+def test_item_is_dead_after_max_attempts(Session):
+    _submit(["a.pdf", "b.pdf"], max_attempts=1)
+    db = Session()
+    failed = ingest.claim_next(db, "w1")
+    assert ingest.fail_item(db, failed["queue_id"], "OCR error", retry_delay=0) == "dead"
+
+    # Lease zadnjeg pokušaja istekao: stavka ide u dead umjesto ponovne obrade
+    crashed = ingest.claim_next(db, "w1")
+    _row(db, crashed["queue_id"]).locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    dead = []
+    assert ingest.claim_next(db, "w2", on_dead=dead.append) is None
+    assert [item["filename"] for item in dead] == ["b.pdf"]
+    assert [_row(db, i["queue_id"]).status for i in (failed, crashed)] == ["dead", "dead"]
+
+    job = ingest.QueueIngestJob(failed["job_id"], db.query(IngestQueueItem).order_by(IngestQueueItem.id).all())
+    assert job.finished and job.status == "done_with_errors"
+
+def test_retry_resumes_from_ocr_checkpoint(Session, monkeypatch):
+    from core import worker
+
+    monkeypatch.setattr(worker, "SessionMain", Session)
+    checkpoint = {"ocr_result": {"text": "Račun 1001"}, "ai_classify_result": {"best_label": "URA"}}
+    calls = []
+
+    def fake_run(item, checkpoint=None, on_checkpoint=None, discard_on_failure=True):
+        calls.append(checkpoint)
+        if checkpoint is None:
+            on_checkpoint("ocr", {"ocr_result": {"text": "Račun 1001"}, "ai_classify_result": {"best_label": "URA"}})
+            raise RuntimeError("baza nedostupna")
+        return {"id": 7, "filename": item["filename"], "status": "OK"}
+
+    monkeypatch.setattr(worker, "run_ingest_item", fake_run)
+    monkeypatch.setattr(worker, "discard_ingest_item", lambda db, item: None)
+    _submit(["a.pdf"])
+    db = Session()
+
+    item = ingest.claim_next(db, "w1")
+    worker.process_item(item, "w1")
+    row = _row(db, item["queue_id"])
+    assert (row.status, row.stage) == ("queued", "ocr")
+    assert row.checkpoint == checkpoint
+
+    row.available_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    worker.process_item(ingest.claim_next(db, "w1"), "w1")
+    assert calls == [None, checkpoint]
+    row = _row(db, item["queue_id"])
+    assert row.status == "done" and row.checkpoint is None
+
+def test_job_keeps_skipped_files_across_processes(Session):
+    skipped = [{"filename": "stari.pdf", "status": "DUPLICATE", "document_id": 7}]
+    items = [{"document_id": None, "filename": "a.pdf", "file_path": "/tmp/a.pdf", "file_hash": "a", "document_type": "URA"}]
+    job = ingest.QueueIngestBackend().submit(items, skipped=skipped)
+    db = Session()
+    ingest.complete_item(db, ingest.claim_next(db, "w1")["queue_id"], {"filename": "a.pdf", "status": "OK"})
+
+    # get() čita iz baze, kao što bi ga čitao drugi API proces
+    again = ingest.QueueIngestBackend().get(job.id)
+    assert again.finished and again.to_dict()["skipped"] == skipped
+    assert again.results() == skipped + [{"filename": "a.pdf", "status": "OK"}]
+
+def test_job_with_only_skipped_files_is_found_and_done(Session):
+    skipped = [{"filename": "stari.pdf", "status": "DUPLICATE", "document_id": 7}]
+    job = ingest.QueueIngestBackend().submit([], skipped=skipped)
+    again = ingest.QueueIngestBackend().get(job.id)
+    assert again is not None
+    assert again.status == "done" and again.results() == skipped
+    assert again.to_dict()["created_at"] is not None
+    assert ingest.QueueIngestBackend().get("nepostojeci") is None
@@ -0,0 +1,88 @@
+import os
+import asyncio
+import hashlib
+from email.message import EmailMessage
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+fernet = pytest.importorskip("cryptography.fernet")
+os.environ.setdefault("FERNET_KEY", fernet.Fernet.generate_key().decode())
+
+from core.database.models import Base, MailAccount, MailProcessed
+from core.routes import mail_processing
+
+def _mail(attachments):
+    msg = EmailMessage()
+    msg["Subject"] = "Računi"
+    msg.set_content("U prilogu.")
+    for name, content in attachments:
+        msg.add_attachment(content, maintype="application", subtype="pdf", filename=name)
+    return msg.as_bytes()
+
+class FakeImap:
+    mails = {}
+
+    def __init__(self, *args):
+        pass
+
+    def login(self, *args):
+        pass
+
+    def select(self, *args):
+        pass
+
+    def search(self, *args):
+        return "OK", [b" ".join(self.mails)]
+
+    def fetch(self, uid, what):
+        return "OK", [(b"", self.mails[uid])]
+
+    def logout(self):
+        pass
+
+def test_known_attachments_mark_mail_processed_and_same_names_do_not_collide(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'mail.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(MailAccount(name="Računi", email="racuni@firma.hr", imap_server="imap", imap_port=993,
+                       username="racuni", password_encrypted="x", active=True))
+    db.commit()
+
+    known = b"%PDF-1.4 poznati"
+    FakeImap.mails = {
+        b"1": _mail([("racun.pdf", known)]),
+        b"2": _mail([("racun.pdf", known), ("racun.pdf", b"%PDF-1.4 novi")]),
+    }
+    uploaded = []
+
+    def handler(request):
+        if request.url.path.endswith("/known-hashes"):
+            hashes = httpx.Response(200, content=request.content).json()["hashes"]
+            digest = hashlib.sha256(known).hexdigest()
+            return httpx.Response(200, json={"known": {digest: {"document_id": 7}} if digest in hashes else {}})
+        uploaded.append(request.content)
+        return httpx.Response(200, json={"processed": [{"status": "OK", "id": 8}]})
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(mail_processing.httpx, "AsyncClient", lambda: real_client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(mail_processing.imaplib, "IMAP4_SSL", FakeImap)
+    monkeypatch.setattr(mail_processing, "decrypt_password", lambda value: "lozinka")
+
+    try:
+        result = asyncio.run(mail_processing.process_mail_batch(db))
+        # Mail 1: jedini prilog je poznat – ne šalje se, ali je mail zabilježen
+        # Mail 2: drugi "racun.pdf" je novi i šalje se unatoč istom imenu
+        assert [(d["uid"], d["result"].get("status")) for d in result["details"]] == [
+            ("1", "DUPLICATE"), ("2", "DUPLICATE"), ("2", None),
+        ]
+        assert len(uploaded) == 1 and b"novi" in uploaded[0]
+        assert sorted(uid for (uid,) in db.query(MailProcessed.uid)) == ["1", "2"]
+
+        # Sljedeći prolaz ne dohvaća ponovno zabilježene mailove
+        assert asyncio.run(mail_processing.process_mail_batch(db))["processed"] == 0
+    finally:
+        db.close()
+        engine.dispose()
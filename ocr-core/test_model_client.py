@@ -0,0 +1,82 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.ml.model_client import ModelServerClient
+
+# ---------- STAND-IN MODEL SERVER ----------
+def _classify(text):
+    return {"best_label": "0", "best_score": 0.9, "parsed_fields": {"length": len(text)}}
+
+def start_model_server(batch=True):
+    """
+    Lokalni zamjenski model server: /classify (+ /classify_batch ako batch=True). Vraća (server, base_url, paths).
+    """
+    paths = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            paths.append(self.path)
+            if self.path == "/classify":
+                payload = _classify(body["text"])
+            elif self.path == "/classify_batch" and batch:
+                payload = {"results": [_classify(t) for t in body["texts"]]}
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", paths
+
+def _run(client, base_url, texts):
+    async def main():
+        try:
+            return await client.classify_many(base_url, texts)
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+def test_concurrent_requests_are_batched():
+    server, base_url, paths = start_model_server(batch=True)
+    try:
+        texts = [f"Račun br. {i}" + "x" * i for i in range(20)]
+        results = _run(ModelServerClient(batch_size=8, batch_wait=0.05), base_url, texts)
+        assert [r["parsed_fields"]["length"] for r in results] == [len(t) for t in texts]
+        assert paths == ["/classify_batch"] * 3
+    finally:
+        server.shutdown()
+
+def test_fallback_to_single_requests_without_batch_endpoint():
+    server, base_url, paths = start_model_server(batch=False)
+    try:
+        client = ModelServerClient(batch_size=8, batch_wait=0.05)
+        texts = [f"Ugovor {i}" for i in range(10)]
+
+        async def main():
+            try:
+                first = await client.classify_many(base_url, texts)
+                second = await client.classify_many(base_url, texts)
+                return first, second
+            finally:
+                await client.aclose()
+
+        first, second = asyncio.run(main())
+        assert first == second == [_classify(t) for t in texts]
+        # Batch endpoint se probao samo jednom, ostalo su pojedinačni pozivi
+        assert paths.count("/classify_batch") == 1
+        assert paths.count("/classify") == 20
+    finally:
+        server.shutdown()
@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+from modules.ocr_processing.workers.cache import OcrCache
+
+def _result(text):
+    return {"text": text, "lines": [text], "pages": [{"page": 0, "source": "ocr", "lines": [text]}]}
+
+def test_cache_hit_miss_counters():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = OcrCache(tmp, 10 * 1024 * 1024)
+        key = cache.make_key("a" * 64, {"engine": "default", "dpi": 300})
+        assert cache.get(key) is None
+        cache.put(key, _result("Račun br. 1"))
+        assert cache.get(key)["text"] == "Račun br. 1"
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["stores"] == 1
+
+def test_cache_key_depends_on_settings():
+    cache = OcrCache(tempfile.gettempdir(), 1024)
+    assert cache.make_key("a" * 64, {"dpi": 300}) != cache.make_key("a" * 64, {"dpi": 200})
+
+def test_cache_evicts_oldest_over_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = OcrCache(tmp, 2000)
+        keys = [cache.make_key(str(i), {}) for i in range(5)]
+        for i, key in enumerate(keys):
+            cache.put(key, _result("x" * 400))
+            # mtime razlike da redoslijed evictanja bude deterministički
+            os.utime(cache._path(key), (i, i))
+        assert cache.stats()["size_bytes"] <= 2000
+        assert cache.counters["evictions"] > 0
+        assert cache.get(keys[-1]) is not None
+        assert cache.get(keys[0]) is None
@@ -0,0 +1,79 @@
+import io
+
+import fitz
+from PIL import Image
+
+from modules.ocr_processing.workers import engine, page_ocr, pool
+
+def fake_image_to_data(img, **kwargs):
+    # Jedna riječ po slici: širina slike, da se vidi koja je stranica OCR-ana
+    return {
+        "text": [f"OCR{img.width}"], "conf": ["91"], "block_num": [1], "par_num": [1], "line_num": [1],
+        "left": [10], "top": [10], "width": [50], "height": [12],
+    }
+
+def _mixed_pdf(path):
+    # 0: tekst, 1: sken, 2: sken s kratkim text slojem (npr. pečat), 3: kratki tekst bez slika
+    png = io.BytesIO()
+    Image.new("L", (300, 400), 255).save(png, "PNG")
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 72), "Racun br. 1001 " + "stavka racuna " * 10)
+        for width in (300, 312):
+            page = doc.new_page(width=width, height=400)
+            page.insert_image(page.rect, stream=png.getvalue())
+        page.insert_text((20, 20), "PRIMLJENO")
+        page = doc.new_page()
+        page.insert_text((72, 72), "Prilog 1")
+        doc.save(path)
+    return path
+
+def test_text_layer_decision_per_page(tmp_path):
+    with fitz.open(_mixed_pdf(str(tmp_path / "mix.pdf"))) as doc:
+        decisions = [engine._has_text_layer(page, engine.extract_page_lines_native(page)) for page in doc]
+    assert decisions == [True, False, False, True]
+
+def test_only_scanned_pages_are_ocred(tmp_path, monkeypatch):
+    monkeypatch.setattr(pool, "OCR_WORKERS", 0)
+    monkeypatch.setattr(engine, "page_index", None)
+    monkeypatch.setattr(page_ocr.pytesseract, "image_to_data", fake_image_to_data)
+    path = _mixed_pdf(str(tmp_path / "mix.pdf"))
+
+    pages, jobs = engine._plan_ocr(path)
+    assert [p["source"] for p in pages] == ["native", "ocr", "ocr", "native"]
+    assert [job[2] for job in jobs] == [1, 2]
+
+    result = engine.perform_ocr_default(path, return_result=True)
+    assert [p["source"] for p in result["pages"]] == ["native", "ocr", "ocr", "native"]
+    # Stranice ostaju poredane; OCR stranice na 300 DPI (širina točke * 300/72)
+    assert result["pages"][1]["lines"] == ["OCR1250"]
+    assert result["pages"][2]["lines"] == ["OCR1300"]
+    assert result["pages"][0]["lines"][0].startswith("Racun br. 1001")
+    assert result["pages"][3]["lines"] == ["Prilog 1"]
+
+    header, _ = engine._plan_ocr(path, max_pages=2)
+    assert len(header) == 2
+
+def test_engine_registry_and_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "ocr_cache", None)
+    calls = []
+
+    def run(file_path):
+        calls.append(file_path)
+        return {"text": "Racun 1001", "lines": ["Racun 1001"], "pages": [{"page": 0, "source": "ocr", "lines": ["Racun 1001"]}]}
+
+    engine.register_engine("test", run, version=lambda: "1.0")
+    try:
+        name, entry = engine.get_engine("test")
+        assert name == "test" and entry["version"]() == "1.0"
+        assert engine.perform_ocr("a.pdf", engine="test", return_lines=True) == ("Racun 1001", ["Racun 1001"])
+        # Bez run_batch / iter_pages: izvedeni iz run
+        assert [r["text"] for r in entry["run_batch"](["b.pdf", "c.pdf"])] == ["Racun 1001", "Racun 1001"]
+        assert [p["page"] for p in entry["iter_pages"]("d.pdf")] == [0]
+        assert calls == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+
+        monkeypatch.setenv("OCR_ENGINE", "test")
+        assert engine.get_engine()[0] == "test"
+        assert engine.get_engine("nepostojeci")[0] == "default"
+    finally:
+        engine.OCR_ENGINES.pop("test", None)
@@ -0,0 +1,28 @@
+import numpy as np
+
+from modules.ocr_processing.workers.layout import save_layout, load_layout, layout_path_for
+
+def test_layout_round_trip(tmp_path):
+    result = {"pages": [
+        {
+            "page": 0, "source": "native", "width": 595, "height": 842,
+            "words": {"text": ["Račun", "1001"], "boxes": [[10, 20, 60, 32], [70, 20, 100, 32]], "conf": [-1, -1], "line": [0, 0]},
+        },
+        {"page": 1, "source": "ocr", "width": 595, "height": 842, "words": None},
+        {
+            "page": 2, "source": "azure", "width": 8.5, "height": 11,
+            "words": {"text": ["Ukupno"], "boxes": [[1.5, 9.25, 2.5, 9.5]], "conf": [97], "line": [3]},
+        },
+    ]}
+    path = layout_path_for(str(tmp_path / "123.pdf"))
+    assert path.endswith("123.layout.npz")
+    save_layout(result, path)
+
+    with load_layout(path) as layout:
+        assert layout.page_count == 3
+        first = layout.page(0)
+        assert (first["source"], first["words"], first["width"]) == ("native", ["Račun", "1001"], 595.0)
+        assert np.array_equal(first["boxes"], np.array([[10, 20, 60, 32], [70, 20, 100, 32]], dtype=np.float32))
+        assert layout.page(1)["words"] == []
+        last = layout.page(2)
+        assert (last["source"], last["words"], last["conf"].tolist(), last["line"].tolist()) == ("azure", ["Ukupno"], [97], [3])
@@ -0,0 +1,53 @@
+import fitz
+
+from modules.ocr_processing.workers import engine
+from modules.ocr_processing.workers.engine import OcrPageStream
+
+def _native_pdf(tmp_path, page_count):
+    path = str(tmp_path / "ugovor.pdf")
+    with fitz.open() as doc:
+        for n in range(page_count):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Stranica {n + 1} " + "tekst ugovora " * 10)
+        doc.save(path)
+    return path
+
+def test_stream_header_then_full_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "ocr_cache", None)
+    with OcrPageStream(_native_pdf(tmp_path, 3)) as stream:
+        assert stream.header_text(1).startswith("Stranica 1")
+        assert len(stream.pages) == 1
+        result = stream.result()
+    assert [p["page"] for p in result["pages"]] == [0, 1, 2]
+    assert "partial" not in result
+
+def test_stream_header_only_mode_stops_early(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "ocr_cache", None)
+    with OcrPageStream(_native_pdf(tmp_path, 5)) as stream:
+        stream.header_text(1)
+        result = stream.result(max_pages=2)
+    assert [p["page"] for p in result["pages"]] == [0, 1]
+    assert result["partial"] is True
+
+def test_native_pdf_is_classified_from_full_text(tmp_path, monkeypatch):
+    from core.routes import upload
+
+    monkeypatch.setattr(engine, "ocr_cache", None)
+    monkeypatch.setattr(upload, "OCR_CLASSIFY_PAGES", 1)
+    monkeypatch.setattr(upload, "OCR_HEADER_ONLY_TYPES", {"ugovor"})
+    classified = []
+
+    def fake_classify(db, text):
+        classified.append(text)
+        return {"best_label": "ugovor", "parsed_fields": {}}
+
+    monkeypatch.setattr(upload, "classify_document_text", fake_classify)
+    path = _native_pdf(tmp_path, 3)
+    with OcrPageStream(path) as stream:
+        assert stream.has_pending_ocr() is False
+
+    # Nema OCR latencije za preklopiti: nema ni klasifikacije s prve stranice ni skraćenog rezultata
+    stage = upload.ocr_document_file(None, path, "ugovor.pdf", "hash", "ugovor")
+    assert "partial" not in stage["ocr_result"]
+    assert classified == [stage["ocr_result"]["text"]]
+    assert "Stranica 3" in classified[0]
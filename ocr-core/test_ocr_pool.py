@@ -0,0 +1,41 @@
+import time
+import warnings
+
+import pytest
+from PIL import Image
+from PIL.Image import DecompressionBombWarning
+
+import modules.ocr_processing.workers.pool as pool
+import modules.ocr_processing.workers.page_ocr as page_ocr
+
+def test_pool_keeps_job_order_and_raises_bomb_warning_in_worker(monkeypatch):
+    monkeypatch.setattr(pool, "OCR_WORKERS", 2)
+    pool.shutdown_ocr_pool()
+    try:
+        # Prvi posao traje dulje – rezultati ipak dolaze redom poslova
+        results = pool.run_ocr_jobs([(time.sleep, 0.2), (abs, -2), (abs, -3)])
+        assert results == [None, 2, 3]
+
+        # U workeru je DecompressionBombWarning greška: posao staje odmah, tip iznimke ostaje isti
+        with pytest.raises(DecompressionBombWarning):
+            pool.run_ocr_jobs([(warnings.warn, "Image size exceeds limit", DecompressionBombWarning)])
+    finally:
+        pool.shutdown_ocr_pool()
+
+def test_inline_jobs_do_not_touch_warning_filters(monkeypatch):
+    monkeypatch.setattr(pool, "OCR_WORKERS", 0)
+    filters = list(warnings.filters)
+    assert pool.run_ocr_jobs([(abs, -1), (abs, -2)]) == [1, 2]
+    assert warnings.filters == filters
+
+def test_oversized_image_is_rejected_before_ocr(monkeypatch, tmp_path):
+    path = tmp_path / "sken.png"
+    Image.new("L", (400, 300), 255).save(path)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100_000)
+
+    def no_ocr(*args, **kwargs):
+        raise AssertionError("OCR se ne smije pokrenuti za preveliku sliku")
+
+    monkeypatch.setattr(page_ocr, "ocr_image", no_ocr)
+    with pytest.raises(page_ocr.ImageTooLargeError):
+        page_ocr.ocr_image_file(str(path))
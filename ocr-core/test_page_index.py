@@ -0,0 +1,41 @@
+import io
+
+import fitz
+from PIL import Image, ImageDraw
+
+from modules.ocr_processing.workers.page_index import PageHashIndex, page_fingerprint
+
+def _scanned_pdf(texts):
+    doc = fitz.open()
+    for text in texts:
+        img = Image.new("L", (1240, 1754), 255)
+        draw = ImageDraw.Draw(img)
+        for i in range(40):
+            draw.text((100, 100 + i * 35), f"{text} linija {i} opći uvjeti poslovanja", fill=0)
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buf.getvalue())
+    return doc
+
+def test_repeated_page_is_found_and_changed_number_is_not():
+    doc = _scanned_pdf(["Uvjeti", "Uvjeti", "Racun 1001", "Racun 1002"])
+    uvjeti, uvjeti_kopija, racun_1, racun_2 = [page_fingerprint(page) for page in doc]
+
+    index = PageHashIndex(max_entries=10)
+    index.add(uvjeti, "pytesseract", {"lines": ["Uvjeti"]})
+    index.add(racun_1, "pytesseract", {"lines": ["Racun 1001"]})
+
+    assert index.lookup(uvjeti_kopija, "pytesseract") == {"lines": ["Uvjeti"]}
+    assert index.lookup(uvjeti_kopija, "tesserocr") is None
+    assert index.lookup(racun_2, "pytesseract") is None
+    assert index.stats()["skipped_pages"] == 1
+
+def test_index_is_bounded():
+    fingerprints = [page_fingerprint(page) for page in _scanned_pdf([f"Stranica {i}" for i in range(3)])]
+    index = PageHashIndex(max_entries=2)
+    for i, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, "pytesseract", {"lines": [str(i)]})
+    assert index.stats()["entries"] == 2
+    assert index.stats()["evictions"] == 1
+    assert index.lookup(fingerprints[0], "pytesseract") is None
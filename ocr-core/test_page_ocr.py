@@ -0,0 +1,84 @@
+import io
+import os
+import subprocess
+import sys
+
+import fitz
+from PIL import Image
+
+from modules.ocr_processing.workers import page_ocr
+
+def _pixmap(colorspace):
+    with fitz.open() as doc:
+        page = doc.new_page(width=200, height=100)
+        page.insert_text((20, 50), "Račun 1001", fontsize=20)
+        return page.get_pixmap(dpi=100, colorspace=colorspace, alpha=False)
+
+def test_pixmap_image_matches_png_round_trip():
+    for colorspace, mode in ((fitz.csRGB, "RGB"), (fitz.csGRAY, "L")):
+        pix = _pixmap(colorspace)
+        img = page_ocr.pixmap_to_image(pix)
+        expected = Image.open(io.BytesIO(pix.tobytes("png")))
+        assert (img.mode, img.size, img.format) == (mode, expected.size, "PPM")
+        assert img.tobytes() == expected.convert(mode).tobytes()
+        # img je pogled na buffer pixmape: mora nestati prije nego što se pix zamijeni
+        del img, expected
+
+def test_rendering_tests_leave_no_unraisable_buffer_errors():
+    # BufferError iz pixmape koja nestaje dok je slika još živa pytest javlja samo kao upozorenje
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = ["test_page_ocr.py", "test_ocr_page_stream.py", "test_ocr_engine.py", "test_page_index.py"]
+    proc = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+         "-W", "error::pytest.PytestUnraisableExceptionWarning",
+         "-k", "not unraisable_buffer_errors", *files],
+        cwd=here, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, proc.stdout[-2000:]
+
+def _pdf(tmp_path, width=595, height=842):
+    path = str(tmp_path / "sken.pdf")
+    with fitz.open() as doc:
+        doc.new_page(width=width, height=height)
+        doc.save(path)
+    return path
+
+def test_choose_dpi_follows_page_size():
+    with fitz.open() as doc:
+        for width, height in ((595, 842), (200, 300), (2384, 3370)):
+            doc.new_page(width=width, height=height)
+        a4, small, poster = doc
+        assert page_ocr.choose_dpi(a4, 300) == 205
+        assert page_ocr.choose_dpi(small, 300) == 300
+        assert page_ocr.choose_dpi(poster, 300) == page_ocr.OCR_ADAPTIVE_MIN_DPI
+
+def test_adaptive_dpi_retries_only_low_confidence_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_ocr, "OCR_ADAPTIVE_DPI", True)
+    monkeypatch.setattr(page_ocr, "OCR_CONF_THRESHOLD", 75)
+    rendered = []
+    confs = {}
+
+    def fake_ocr_image(img, backend="pytesseract", scale=1.0):
+        dpi = round(72 / scale)
+        rendered.append(dpi)
+        return {"lines": [f"{dpi} dpi"], "conf": confs[dpi], "words": {}}
+
+    monkeypatch.setattr(page_ocr, "ocr_image", fake_ocr_image)
+    path = _pdf(tmp_path)
+
+    confs.update({205: 90, 300: 95})
+    result = page_ocr.ocr_pdf_page(path, 0, 300)
+    assert rendered == [205] and result["dpi"] == 205
+
+    # Nizak conf: ponovni OCR na punom DPI-u
+    rendered.clear()
+    confs.update({205: 40, 300: 85})
+    result = page_ocr.ocr_pdf_page(path, 0, 300)
+    assert rendered == [205, 300]
+    assert (result["dpi"], result["retried_from_dpi"]) == (300, 205)
+
+    # Puni DPI nije pomogao: ostaje bolji prvi pokušaj
+    rendered.clear()
+    confs.update({205: 60, 300: 50})
+    result = page_ocr.ocr_pdf_page(path, 0, 300)
+    assert (result["dpi"], result["conf"], result["retried_dpi"]) == (205, 60, 300)
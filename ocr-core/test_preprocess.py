@@ -0,0 +1,43 @@
+from PIL import Image, ImageDraw, ImageFont
+
+from modules.ocr_processing.workers.preprocess import preprocess_image
+
+def _scan(angle):
+    img = Image.new("L", (1240, 1754), 235)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=20)
+    for i in range(30):
+        draw.text((200, 300 + i * 35), f"Linija {i} račun broj 12345 iznos 100,00", fill=20, font=font)
+    return img.rotate(angle, fillcolor=235, resample=Image.BILINEAR)
+
+def test_deskew_finds_rotation_and_crop_removes_margins():
+    out, info = preprocess_image(_scan(-2), ["binarize", "deskew", "crop"])
+    assert abs(info["skew"] - 2) <= 0.25
+    assert info["pixels_removed"] > 0.5 * info["pixels_in"]
+    assert out.size[0] * out.size[1] == info["pixels_in"] - info["pixels_removed"]
+    assert set(out.getdata()) <= {0, 255}
+
+def test_crop_only_keeps_greyscale():
+    out, info = preprocess_image(_scan(0), ["crop"])
+    assert info["skew"] == 0.0
+    assert info["offset"][0] > 100 and info["offset"][1] > 200
+    assert len(set(out.getdata())) > 2
+
+def _dark_bbox(img):
+    return Image.eval(img.convert("L"), lambda v: 255 if v < 128 else 0).getbbox()
+
+def test_word_boxes_map_back_to_source_image_after_deskew_and_crop():
+    from modules.ocr_processing.workers.preprocess import source_box
+
+    # "Riječ" na nagnutom skenu i ista riječ na predobrađenoj (ispravljenoj, izrezanoj) slici
+    page = Image.new("L", (1240, 1754), 255)
+    ImageDraw.Draw(page).rectangle((900, 1300, 1000, 1330), fill=0)
+    scan = page.rotate(-2, fillcolor=255)
+    info = {"skew": 2.0, "offset": [150, 250], "size": list(scan.size)}
+    deskewed = scan.rotate(2, fillcolor=255).crop((150, 250, 1240, 1754))
+
+    box = source_box(_dark_bbox(deskewed), info)
+    expected = _dark_bbox(scan)
+    assert all(abs(a - b) <= 3 for a, b in zip(box, expected))
+    # Bez deskewa samo pomak crop-a
+    assert source_box([10, 20, 30, 40], {"skew": 0.0, "offset": [5, 6]}) == [15, 26, 35, 46]
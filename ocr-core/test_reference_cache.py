@@ -0,0 +1,88 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from core.database.models import Base, Client, Partner
+from core.crud.settings import set_setting
+from core.reference_cache import ReferenceCache
+import core.reference_cache as reference_cache_module
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    return sessionmaker(bind=engine)(), queries
+
+def test_hot_loop_does_no_queries(monkeypatch):
+    cache = ReferenceCache(ttl=3600)
+    monkeypatch.setattr(reference_cache_module, "reference_cache", cache)
+    db, queries = _session()
+    db.add(Client(naziv_firme="Vlasnik d.o.o.", oib="11111111111", db_name="vlasnik"))
+    db.add(Partner(naziv="Dobavljač d.o.o.", oib="22222222222", vat_id="HR22222222222"))
+    db.commit()
+    set_setting(db, "model_server_ip", "10.0.0.5")
+
+    cache.owner_identifiers(db), cache.setting(db, "model_server_ip"), cache.partner(db, "22222222222")
+    queries.clear()
+    for _ in range(100):
+        oibs, hrvats = cache.owner_identifiers(db)
+        assert "11111111111" in oibs and "HR11111111111" in hrvats
+        assert cache.setting(db, "model_server_ip") == "10.0.0.5"
+        assert cache.partner(db, "22222222222").naziv == "Dobavljač d.o.o."
+        assert cache.partner(db, "HR22222222222").oib == "22222222222"
+    assert queries == []
+
+def test_commit_invalidates_changed_kind(monkeypatch):
+    cache = ReferenceCache(ttl=3600)
+    monkeypatch.setattr(reference_cache_module, "reference_cache", cache)
+    db, _ = _session()
+    set_setting(db, "model_server_port", "9000")
+    db.add(Partner(naziv="Stari naziv", oib="22222222222"))
+    db.commit()
+
+    assert cache.setting(db, "model_server_port") == "9000"
+    assert cache.partner(db, "22222222222").naziv == "Stari naziv"
+
+    set_setting(db, "model_server_port", "9100")
+    assert cache.setting(db, "model_server_port") == "9100"
+
+    partner = db.query(Partner).filter_by(oib="22222222222").first()
+    partner.naziv = "Novi naziv"
+    db.flush()
+    # Necommitana promjena ne dira cache
+    assert cache.partner(db, "22222222222").naziv == "Stari naziv"
+    db.commit()
+    assert cache.partner(db, "22222222222").naziv == "Novi naziv"
+
+def test_partner_commit_reloads_only_touched_keys(monkeypatch):
+    cache = ReferenceCache(ttl=3600)
+    monkeypatch.setattr(reference_cache_module, "reference_cache", cache)
+    db, queries = _session()
+    db.add(Partner(naziv="Prvi", oib="22222222222", vat_id="HR22222222222"))
+    db.add(Partner(naziv="Drugi", oib="33333333333"))
+    db.commit()
+    assert cache.partner(db, "33333333333").naziv == "Drugi"
+
+    partner = db.query(Partner).filter_by(oib="22222222222").first()
+    partner.naziv, partner.vat_id = "Prvi novi", "HR44444444444"
+    db.commit()
+    queries.clear()
+    # Netaknuti partner ostaje u cacheu, mapa se ne učitava ponovno
+    assert cache.partner(db, "33333333333").naziv == "Drugi"
+    assert queries == []
+    assert cache.partner(db, "22222222222").naziv == "Prvi novi"
+    assert cache.partner(db, "HR22222222222") is None
+    assert cache.partner(db, "HR44444444444").naziv == "Prvi novi"
+    assert len(queries) == 3 and all("FROM partneri" in q for q in queries)
+    # Osvježeni ključevi su opet u cacheu
+    queries.clear()
+    assert cache.partner(db, "22222222222").naziv == "Prvi novi"
+    assert queries == []
+
+def test_duplicate_partner_keys_keep_lowest_id():
+    db, _ = _session()
+    db.add(Partner(id=1, naziv="Stariji", oib="22222222222", vat_id="HR55555555555"))
+    db.add(Partner(id=2, naziv="Noviji", oib="33333333333", vat_id="HR55555555555"))
+    db.commit()
+    partners = ReferenceCache._load_partners(db)
+    assert partners["HR55555555555"].naziv == "Stariji"
@@ -0,0 +1,81 @@
+import os
+import time
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.database.models import Base, RegistryLookup
+from core.registry_cache import RegistryCache
+
+def make_session_factory(tmp):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'registry.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)
+
+def test_concurrent_lookups_share_one_fetch_and_survive_restart():
+    calls = []
+
+    def fetch(oib):
+        calls.append(oib)
+        time.sleep(0.2)
+        return True, {"oib": oib, "tvrtke": [{"ime": "Firma d.o.o."}]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, factory = make_session_factory(tmp)
+        try:
+            cache = RegistryCache("sudreg", 3600, 60, session_factory=factory)
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(cache.get("12345678901", fetch))) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert len(calls) == 1
+            assert all(r == (True, {"oib": "12345678901", "tvrtke": [{"ime": "Firma d.o.o."}]}) for r in results)
+            assert cache.stats()["coalesced"] == 7
+
+            # Payload je kopija: izmjena kod pozivatelja ne mijenja cache
+            results[0][1]["tvrtke"].clear()
+            assert cache.get("12345678901", fetch)[1]["tvrtke"]
+
+            # Novi proces (prazna memorija) čita iz tablice registry_lookups
+            restarted = RegistryCache("sudreg", 3600, 60, session_factory=factory)
+            assert restarted.get("12345678901", fetch)[0] is True
+            assert len(calls) == 1
+            assert restarted.stats()["hits_db"] == 1
+        finally:
+            engine.dispose()
+
+def test_negative_answers_are_cached_and_errors_are_not():
+    calls = []
+
+    def not_found(key):
+        calls.append(key)
+        return False, {"error": "Dobavljač nije pronađen u Sudregu", "status_code": 404}
+
+    def failing(key):
+        calls.append(key)
+        raise ConnectionError("timeout")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, factory = make_session_factory(tmp)
+        try:
+            cache = RegistryCache("sudreg", 3600, 60, session_factory=factory)
+            assert cache.get("00000000001", not_found)[0] is False
+            assert cache.get("00000000001", not_found)[0] is False
+            assert calls == ["00000000001"]
+            assert cache.stats()["negative_hits"] == 1
+
+            for _ in range(2):
+                with pytest.raises(ConnectionError):
+                    cache.get("00000000002", failing)
+            assert calls.count("00000000002") == 2
+            with factory() as db:
+                assert db.query(RegistryLookup).filter_by(lookup_key="00000000002").count() == 0
+            stats = cache.stats()
+            assert stats["errors"] == 2 and stats["lookups"] == 4 and stats["hit_rate"] == 0.25
+        finally:
+            engine.dispose()
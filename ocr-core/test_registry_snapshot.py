@@ -0,0 +1,58 @@
+import os
+import json
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.database.models import Base, RegistrySnapshotEntry
+from core.utils.circuit_breaker import CircuitBreaker
+from modules.sudreg_api.client import SudregClient
+from modules.sudreg_api.snapshot import import_snapshot, read_snapshot
+
+def test_import_and_local_resolution():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'snapshot.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        csv_path = os.path.join(tmp, "subjekti.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("OIB;Naziv;Skraceni_naziv;Adresa;Mjesto;Postanski_broj\n")
+            f.write("12345678903;FIRMA d.o.o. za trgovinu;FIRMA d.o.o.;Ilica 1;Zagreb;10000\n")
+            f.write("2345678901;NULA j.d.o.o.;;Vukovarska 2;Split;21000\n")  # Excel je pojeo vodeću nulu
+            f.write("12345678901;Kriva kontrolna znamenka;;;;\n")
+            f.write("abc;Neispravan;;;;\n")
+        jsonl_path = os.path.join(tmp, "subjekti.jsonl")
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "oib": 12345678903,
+                "tvrtke": [{"ime": "FIRMA d.o.o. za trgovinu i usluge"}],
+                "sjedista": [{"ulica": "Ilica", "kucni_broj": 5, "naziv_naselja": "Zagreb"}],
+            }) + "\n")
+        try:
+            stats = import_snapshot(db, csv_path, batch_size=2)
+            assert stats == {"read": 4, "inserted": 2, "updated": 0, "skipped": 2, "deleted": 0}
+
+            # Novi snapshot s --replace: postojeći OIB se ažurira, OIB kojeg nema se briše
+            stats = import_snapshot(db, jsonl_path, replace=True)
+            assert stats["updated"] == 1 and stats["deleted"] == 1
+            assert [e.oib for e in db.query(RegistrySnapshotEntry)] == ["12345678903"]
+
+            # API nije dostupan: OIB iz snapshota se rješava lokalno, bez poziva
+            client = SudregClient(
+                token_url="http://127.0.0.1:9/token", base_url="http://127.0.0.1:9", client_id="id",
+                client_secret="secret", breaker=CircuitBreaker("sudreg_snapshot_test"), cache=None,
+            )
+            company, raw = client.get_company_by_oib("12345678903", db)
+            assert company.naziv == "FIRMA d.o.o. za trgovinu i usluge"
+            assert company.adresa.ulica_i_broj == "Ilica 5" and raw["source"] == "snapshot"
+            assert client.stats()["snapshot_hits"] == 1 and client.stats()["requests"] == 0
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_unrecognised_csv_dialect_falls_back_to_comma(tmp_path):
+    # Jedan stupac: Sniffer ne nađe razdjelnik i podiže csv.Error
+    path = tmp_path / "oibi.csv"
+    path.write_text("oib\n12345678903\n02345678901\n", encoding="utf-8")
+    assert [r["oib"] for r in read_snapshot(str(path))] == ["12345678903", "02345678901"]
@@ -0,0 +1,104 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from core.utils.circuit_breaker import CircuitBreaker
+from modules.sudreg_api.client import SudregClient
+
+def start_sudreg_server(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            state["tokens"].append(f"token-{len(state['tokens']) + 1}")
+            self._reply(200, {"access_token": state["tokens"][-1], "expires_in": state["expires_in"]})
+
+        def do_GET(self):
+            state["connections"].add(self.client_address)
+            token = self.headers.get("Authorization", "")[len("Bearer "):]
+            if token not in state["tokens"] or token in state["revoked"]:
+                state["unauthorized"] += 1
+                return self._reply(401, {"error": "invalid_token"})
+            oib = parse_qs(urlparse(self.path).query)["identifikator"][0]
+            state["requests"].append(time.monotonic())
+            if oib == "00000000001":
+                return self._reply(404, {"error": "not found"})
+            self._reply(200, {"oib": oib, "tvrtke": [{"ime": f"Firma {oib}"}], "sjedista": []})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def make_client(base_url, **kwargs):
+    return SudregClient(
+        token_url=f"{base_url}/oauth/token", base_url=f"{base_url}/api/javni/v1", client_id="id",
+        client_secret="secret", breaker=CircuitBreaker("sudreg_test"), cache=None, use_snapshot=False, **kwargs,
+    )
+
+def test_token_refresh_and_retry_on_401():
+    state = {"tokens": [], "revoked": set(), "requests": [], "connections": set(), "unauthorized": 0, "expires_in": 3600}
+    server, base_url = start_sudreg_server(state)
+    client = make_client(base_url, rate=0)
+    try:
+        company, raw = client.get_company_by_oib("12345678901")
+        assert company.naziv == "Firma 12345678901"
+        client.get_company_by_oib("12345678902")
+        assert state["tokens"] == ["token-1"]
+        # Jedna pooled konekcija za sve zahtjeve
+        assert len(state["connections"]) == 1
+
+        # Opozvani token: 401 -> novi token -> jedan ponovni pokušaj
+        state["revoked"].add("token-1")
+        company, _ = client.get_company_by_oib("12345678903")
+        assert company.oib == "12345678903"
+        assert state["tokens"] == ["token-1", "token-2"] and state["unauthorized"] == 1
+
+        # Kratkotrajni token obnavlja se prije isteka, bez 401
+        state["expires_in"] = 0.4
+        client.token = None
+        client.get_company_raw_by_oib("12345678904")
+        time.sleep(0.25)
+        client.get_company_raw_by_oib("12345678905")
+        assert len(state["tokens"]) == 4 and state["unauthorized"] == 1
+
+        assert client.get_company_by_oib("00000000001")[0] is None
+        assert client.stats()["unauthorized_retries"] == 1
+    finally:
+        client.close()
+        server.shutdown()
+
+def test_rate_limit_and_async_interface():
+    state = {"tokens": [], "revoked": set(), "requests": [], "connections": set(), "unauthorized": 0, "expires_in": 3600}
+    server, base_url = start_sudreg_server(state)
+    client = make_client(base_url, rate=20, burst=2)
+
+    async def main():
+        oibs = [f"1234567890{i}" for i in range(8)]
+        return await asyncio.gather(*(client.aget_company_raw_by_oib(oib) for oib in oibs))
+
+    try:
+        started = time.monotonic()
+        results = asyncio.run(main())
+        elapsed = time.monotonic() - started
+    finally:
+        client.close()
+        server.shutdown()
+    assert sorted(r["oib"] for r in results) == [f"1234567890{i}" for i in range(8)]
+    # burst 2, zatim 20/s: 6 zahtjeva čeka barem ~0.3 s
+    assert elapsed >= 0.28
+    assert client.stats()["rate_limiter"]["waited"] == 6
@@ -0,0 +1,141 @@
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.ingest import IngestJobRegistry, PROCESSING_DOCUMENT_TYPE
+from core.database.models import Base, Document
+from core.routes import upload
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'upload.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    registry = IngestJobRegistry(workers=2)
+    monkeypatch.setattr(upload, "SessionMain", Session)
+    monkeypatch.setattr(upload, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(upload, "ingest_jobs", registry)
+    app = FastAPI()
+    app.include_router(upload.router, prefix="/api/upload")
+    with TestClient(app) as client:
+        client.Session = Session
+        yield client
+    registry.shutdown()
+    engine.dispose()
+
+def _events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+def test_job_returns_placeholders_and_streams_progress(api, monkeypatch):
+    release = threading.Event()
+
+    def fake_run(item, **kwargs):
+        assert release.wait(5)
+        if item["filename"] == "los.pdf":
+            return {"filename": item["filename"], "status": "FAILED", "error": "OCR error"}
+        return {"id": item["document_id"], "filename": item["filename"], "status": "OK"}
+
+    monkeypatch.setattr(upload, "run_ingest_item", fake_run)
+    files = [("files", (name, content, "application/pdf")) for name, content in
+             [("a.pdf", b"%PDF a"), ("los.pdf", b"%PDF b"), ("a-kopija.pdf", b"%PDF a")]]
+    created = api.post("/api/upload/jobs", files=files, data={"document_type": "URA"}).json()
+
+    assert [d["filename"] for d in created["documents"]] == ["a.pdf", "los.pdf"]
+    assert [s["status"] for s in created["skipped"]] == ["DUPLICATE"]
+    db = api.Session()
+    ids = [d["id"] for d in created["documents"]]
+    assert {doc.document_type for doc in db.query(Document).filter(Document.id.in_(ids))} == {PROCESSING_DOCUMENT_TYPE}
+    db.close()
+
+    job_url = f"/api/upload/jobs/{created['job_id']}"
+    assert api.get(f"{job_url}/result").status_code == 409
+    release.set()
+    events = _events(api.get(f"{job_url}/events"))
+    assert [name for name, _ in events[:-1]] == ["progress"] * (len(events) - 1)
+    name, final = events[-1]
+    assert (name, final["status"], final["completed"]) == ("done", "done_with_errors", 2)
+
+    result = api.get(f"{job_url}/result").json()
+    assert [r["status"] for r in result["processed"]] == ["DUPLICATE", "OK", "FAILED"]
+    assert api.get("/api/upload/jobs/nepostojeci").status_code == 404
+
+def test_raw_upload_is_streamed_to_disk(api, monkeypatch, tmp_path):
+    monkeypatch.setattr(upload, "run_ingest_item", lambda item, **kwargs: {"filename": item["filename"], "status": "OK"})
+    body = b"%PDF-1.4 " + bytes(range(256)) * 5000
+
+    def chunks():
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start:start + 64 * 1024]
+
+    url = "/api/upload/raw?filename=../racun.pdf&document_type=URA"
+    created = api.post(url, content=chunks()).json()
+    assert [d["filename"] for d in created["documents"]] == ["racun.pdf"]
+
+    db = api.Session()
+    doc = db.get(Document, created["documents"][0]["id"])
+    assert doc.hash == hashlib.sha256(body).hexdigest()
+    assert (tmp_path / doc.filename).read_bytes() == body
+    db.close()
+    # Privremeni fileovi ne ostaju
+    assert list((tmp_path / ".incoming").iterdir()) == []
+
+    duplicate = api.post(url, content=body).json()
+    assert duplicate["documents"] == [] and duplicate["skipped"][0]["status"] == "DUPLICATE"
+    assert api.post(url, content=b"").status_code == 400
+
+def test_known_hashes_in_one_request(api, monkeypatch):
+    known = hashlib.sha256(b"racun").hexdigest()
+    unknown = hashlib.sha256(b"novi").hexdigest()
+    db = api.Session()
+    doc = Document(filename="1.pdf", hash=known, document_type="URA", archived_at=datetime.utcnow(), date=datetime.utcnow())
+    db.add(doc)
+    db.commit()
+    doc_id = doc.id
+    db.close()
+
+    response = api.post("/api/upload/known-hashes", json={"hashes": [known.upper(), unknown, f" {unknown} "]})
+    assert response.json() == {
+        "known": {known: {"document_id": doc_id, "document_type": "URA"}},
+        "unknown": [unknown],
+    }
+    assert api.post("/api/upload/known-hashes", json={"hashes": []}).json() == {"known": {}, "unknown": []}
+
+    invalid = api.post("/api/upload/known-hashes", json={"hashes": [known, "nije-hash"]})
+    assert invalid.status_code == 422 and invalid.json()["detail"]["invalid"] == ["nije-hash"]
+    monkeypatch.setattr(upload, "KNOWN_HASHES_MAX", 2)
+    too_many = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(3)]
+    assert api.post("/api/upload/known-hashes", json={"hashes": too_many}).status_code == 413
+
+def test_stale_placeholders_are_removed_at_startup(api, tmp_path):
+    from core.database.models import IngestQueueItem
+    started = datetime.utcnow()
+    db = api.Session()
+    orphan = Document(filename="orphan.pdf", hash="a" * 64, document_type=PROCESSING_DOCUMENT_TYPE, archived_at=started)
+    queued = Document(filename="queued.pdf", hash="b" * 64, document_type=PROCESSING_DOCUMENT_TYPE, archived_at=started)
+    done = Document(filename="done.pdf", hash="c" * 64, document_type="URA", archived_at=started)
+    db.add_all([orphan, queued, done])
+    db.commit()
+    db.add(IngestQueueItem(
+        job_id="j" * 32, document_id=queued.id, filename="queued.pdf", file_path=str(tmp_path / "queued.pdf"),
+        file_hash="b" * 64, document_type="URA", status="queued",
+    ))
+    db.commit()
+    (tmp_path / "orphan.pdf").write_bytes(b"%PDF")
+    orphan_id = orphan.id
+
+    assert upload.cleanup_stale_placeholders(datetime.utcnow()) == 1
+    db.expire_all()
+    assert db.get(Document, orphan_id) is None
+    assert not (tmp_path / "orphan.pdf").exists()
+    assert {d.filename for d in db.query(Document)} == {"queued.pdf", "done.pdf"}
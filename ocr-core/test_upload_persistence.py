@@ -0,0 +1,83 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from core.database.models import Base, Partner, Document, DocumentAnnotation
+from core.routes import upload
+
+PARTNER_OIB = "12345678903"
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'persist.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Partner(naziv="Dobavljač d.o.o.", oib=PARTNER_OIB, adresa="Ilica 1, Zagreb", vies_response={"valid": True}))
+    session.commit()
+    session.commits = []
+    event.listen(engine, "commit", lambda conn: session.commits.append(1))
+    session.indexed = []
+    monkeypatch.setattr(upload, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(upload, "index_to_elasticsearch", lambda doc: session.indexed.append(doc.id))
+    upload.reference_cache.invalidate()
+    yield session
+    session.close()
+    engine.dispose()
+
+def _process(db, n, commit=True):
+    # Kao bench_upload_persistence.py: gotov OCR rezultat, partner već u bazi
+    lines = ["RAČUN br. R-%05d" % n, f"Dobavljač d.o.o., OIB: {PARTNER_OIB}", "Ukupno za platiti: 1.250,00 EUR"]
+    file_path = os.path.join(upload.UPLOAD_DIR, f"upload-{n}.pdf")
+    with open(file_path, "wb") as f:
+        f.write(b"%PDF-1.4 test")
+    checkpoint = {"ocr_result": {"text": "\n".join(lines), "lines": lines, "pages": []}, "ai_classify_result": {}}
+    return upload.process_document_file(
+        db, file_path, f"racun-{n}.pdf", "%064x" % n, "URA",
+        all_owner_oibs=set(), all_owner_hrvats=set(), checkpoint=checkpoint, commit=commit,
+    )
+
+def test_document_is_saved_with_one_commit(db):
+    result = _process(db, 1)
+    assert result["status"] == "OK"
+    assert len(db.commits) == 1
+    assert db.indexed == [result["id"]]
+    doc = db.get(Document, result["id"])
+    assert doc.filename == f"{doc.id}.pdf" and os.path.isfile(os.path.join(upload.UPLOAD_DIR, doc.filename))
+    assert db.query(DocumentAnnotation).filter(DocumentAnnotation.document_id == doc.id).count() == 1
+
+def test_failed_commit_leaves_no_rows_files_or_index(db, monkeypatch):
+    def failing_commit():
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    result = _process(db, 2)
+    assert result["status"] == "FAILED" and "disk full" in result["error"]
+    assert db.query(Document).count() == 0 and db.query(DocumentAnnotation).count() == 0
+    assert db.indexed == []
+    assert [f for f in os.listdir(upload.UPLOAD_DIR) if f.endswith(".pdf")] == []
+
+def test_batch_commits_several_documents_at_once(db):
+    results = [_process(db, n, commit=False) for n in range(3)]
+    assert db.commits == [] and db.indexed == []
+    upload.commit_upload_batch(db, results)
+    assert len(db.commits) == 1
+    assert sorted(db.indexed) == sorted(r["id"] for r in results)
+    assert db.query(Document).count() == 3
+
+def test_failure_after_rename_discards_renamed_file(db, monkeypatch):
+    def failing_training_mode():
+        raise RuntimeError("settings nedostupni")
+
+    monkeypatch.setattr(upload, "is_training_mode_enabled", failing_training_mode)
+    file_path = os.path.join(upload.UPLOAD_DIR, "upload-3.pdf")
+    lines = ["RAČUN br. R-00003", f"Dobavljač d.o.o., OIB: {PARTNER_OIB}"]
+    with open(file_path, "wb") as f:
+        f.write(b"%PDF-1.4 test")
+    checkpoint = {"ocr_result": {"text": "\n".join(lines), "lines": lines, "pages": []}, "ai_classify_result": {}}
+    stored = {"file_path": file_path, "file_hash": "%064x" % 3}
+    result = upload.persist_stage_task(db, "racun-3.pdf", stored, "URA", set(), set(), checkpoint, batch_mode=True)
+    assert result["status"] == "FAILED" and "settings nedostupni" in result["error"]
+    assert db.query(Document).count() == 0
+    assert [f for f in os.listdir(upload.UPLOAD_DIR) if f.endswith((".pdf", ".npz"))] == []
@@ -0,0 +1,110 @@
+import os
+import asyncio
+import threading
+
+from core.routes import upload
+
+def test_stages_overlap_and_results_keep_file_order(monkeypatch):
+    n = 6
+    lock = threading.Lock()
+    ocr_started = {i: threading.Event() for i in range(n)}
+    events = []
+
+    def fake_ocr(file_path, filename, file_hash, document_type):
+        i = int(file_hash)
+        with lock:
+            events.append(("ocr", i))
+        ocr_started[i].set()
+        if i == 0:
+            # OCR prvog filea čeka da drugi file počne OCR: dva filea su u OCR fazi istovremeno
+            assert ocr_started[1].wait(5)
+        return {"ocr_result": {"text": filename}, "ai_classify_result": {}}
+
+    def fake_process(db, file_path, filename, file_hash, document_type, *args, checkpoint=None, on_checkpoint=None, commit=True):
+        i = int(file_hash)
+        if i + 1 < n:
+            # Dok se file i sprema, OCR idućeg filea već radi (ili je gotov)
+            assert ocr_started[i + 1].wait(5)
+        with lock:
+            events.append(("persist", i))
+        return {"filename": filename, "status": "OK", "text": checkpoint["ocr_result"]["text"]}
+
+    monkeypatch.setattr(upload, "ocr_stage_task", fake_ocr)
+    monkeypatch.setattr(upload, "process_document_file", fake_process)
+    monkeypatch.setattr(upload, "UPLOAD_OCR_CONCURRENCY", 2)
+    monkeypatch.setattr(upload, "UPLOAD_COMMIT_BATCH", 1)
+
+    stored_items = [(f"racun-{i}.pdf", {"file_path": f"/tmp/{i}.pdf", "file_hash": str(i)}) for i in range(n)]
+    stored_items.insert(3, ("dup.pdf", {"filename": "dup.pdf", "status": "DUPLICATE", "existing_id": 1}))
+
+    results = asyncio.run(upload.run_upload_pipeline(None, stored_items, "URA", set(), set()))
+
+    assert [r["filename"] for r in results] == [name for name, _ in stored_items]
+    assert results[3]["status"] == "DUPLICATE"
+    assert all(r["text"] == r["filename"] for r in results if r["status"] == "OK")
+    # Spremanje je redom fileova, a OCR filea 1 počinje prije spremanja filea 0
+    assert [i for stage, i in events if stage == "persist"] == list(range(n))
+    assert events.index(("ocr", 1)) < events.index(("persist", 0))
+
+def test_duplicates_in_one_upload_and_failed_file_do_not_fail_the_batch(monkeypatch, tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.orm import sessionmaker
+    from core.database.models import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'upload.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    monkeypatch.setattr(upload, "UPLOAD_DIR", str(tmp_path))
+
+    def spooled(name, content):
+        path = tmp_path / f"{name}.part"
+        path.write_bytes(content)
+        return {"tmp_path": str(path), "sha256": str(hash(content)), "size": len(content)}
+
+    batch_hashes = {}
+    stored_items = [
+        (name, upload.store_spooled(db, spooled(name, content), name, batch_hashes))
+        for name, content in [("a.pdf", b"A"), ("b.pdf", b"B"), ("a-kopija.pdf", b"A"), ("c.pdf", b"C")]
+    ]
+    assert stored_items[2][1]["status"] == "DUPLICATE"
+    assert not (tmp_path / "a-kopija.pdf.part").exists()
+
+    def fake_ocr(file_path, filename, file_hash, document_type):
+        return {"ocr_result": {"text": filename}, "ai_classify_result": {}}
+
+    def fake_process(db, file_path, filename, file_hash, document_type, *args, checkpoint=None, on_checkpoint=None, commit=True):
+        if filename == "b.pdf":
+            raise IntegrityError("INSERT INTO documents", {}, Exception("UNIQUE constraint failed: documents.hash"))
+        return {"id": 10 + len(filename), "filename": filename, "status": "OK"}
+
+    monkeypatch.setattr(upload, "ocr_stage_task", fake_ocr)
+    monkeypatch.setattr(upload, "process_document_file", fake_process)
+    monkeypatch.setattr(upload, "UPLOAD_COMMIT_BATCH", 1)
+    try:
+        results = asyncio.run(upload.run_upload_pipeline(db, stored_items, "URA", set(), set()))
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert [r["status"] for r in results] == ["OK", "FAILED", "DUPLICATE", "OK"]
+    assert results[2]["existing_id"] == results[0]["id"] and "file_hash" not in results[2]
+    # Spremljeni file neuspjelog dokumenta se briše
+    assert not os.path.exists(stored_items[1][1]["file_path"])
+
+def test_oversized_image_fails_only_its_file(monkeypatch):
+    from modules.ocr_processing.workers.page_ocr import ImageTooLargeError
+
+    class HugeScan:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            raise ImageTooLargeError("sken.tif: 200000000 piksela")
+
+        def __exit__(self, *exc):
+            pass
+
+    monkeypatch.setattr(upload, "OcrPageStream", HugeScan)
+    result = upload.ocr_document_file(None, "/tmp/x.tif", "sken.tif", "abc", "URA")
+    assert result == {"filename": "sken.tif", "status": "FAILED", "error": "Image too large (DecompressionBombWarning)"}